@@ -0,0 +1,60 @@
+"""Measure the throughput of building and parsing messages.
+
+The throughput is measured with and without caching the ciphers per token,
+and for both Message and FastMessage codecs.
+"""
+import datetime
+import timeit
+
+import click
+
+from miio.protocol import JSON_BACKEND, FastMessage, Message, Utils
+
+TOKEN = bytes.fromhex(32 * "0")
+
+
+def build_message(codec, payload):
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": b"\x01\x02\x03\x04",
+        "ts": datetime.datetime.utcnow(),
+    }
+    msg = {"data": {"value": payload}, "header": {"value": header}, "checksum": 0}
+    return codec.build(msg, token=TOKEN)
+
+
+def measure(codec, count, payload):
+    data = build_message(codec, payload)
+    build = timeit.timeit(lambda: build_message(codec, payload), number=count)
+    parse = timeit.timeit(lambda: codec.parse(data, token=TOKEN), number=count)
+
+    return count / build, count / parse
+
+
+@click.command()
+@click.option("--count", default=5000, help="Number of messages per measurement")
+@click.option("--properties", default=15, help="Number of properties per payload")
+def cli(count, properties):
+    """Measure messages built and parsed per second."""
+    payload = {"id": 1, "result": ["value%s" % i for i in range(properties)]}
+    click.echo("json backend: %s" % JSON_BACKEND.name)
+    cached = Utils.cipher
+    modes = [
+        ("uncached", Message, cached.__wrapped__),
+        ("cached", Message, cached),
+        ("fast", FastMessage, cached),
+    ]
+    try:
+        for name, codec, cipher in modes:
+            Utils.cipher = staticmethod(cipher)
+            build, parse = measure(codec, count, payload)
+            click.echo(f"{name:>8}: build {build:8.0f} msg/s, parse {parse:8.0f} msg/s")
+    finally:
+        Utils.cipher = staticmethod(cached)
+
+    click.echo("cache: %s" % Utils.cipher_cache_info())
+
+
+if __name__ == "__main__":
+    cli()
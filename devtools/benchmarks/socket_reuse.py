@@ -0,0 +1,65 @@
+"""Compare persistent and per-request sockets against a simulated device.
+
+The persistent socket is the default behavior of MiIOProtocol, the per-request
+mode emulates the previous behavior by closing the socket after every request.
+"""
+import os
+import time
+
+import click
+
+from miio.miioprotocol import MiIOProtocol
+from miio.simulator import SimulatedDevice, Simulator
+
+TOKEN = 32 * "0"
+
+
+def open_fds() -> int:
+    """Return the number of open file descriptors, if available."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def run(proto: MiIOProtocol, count: int, reconnect: bool):
+    sockets = 0
+    last = None
+    start = time.perf_counter()
+    for _ in range(count):
+        proto.send("get_prop", ["power"])
+        if proto._socket is not last:
+            sockets += 1
+            last = proto._socket
+        if reconnect:
+            proto.close()
+    elapsed = time.perf_counter() - start
+
+    return elapsed / count, sockets
+
+
+@click.command()
+@click.option("--count", default=2000, help="Number of requests per mode")
+def cli(count):
+    """Measure per-request latency and socket usage."""
+    with Simulator() as simulator:
+        host, port = simulator.add(SimulatedDevice(TOKEN, {"power": "on"}), port=0)
+        for name, reconnect in [("persistent", False), ("per-request", True)]:
+            proto = MiIOProtocol(host, TOKEN)
+            proto.port = port
+            proto.send_handshake()
+
+            fds_before = open_fds()
+            latency, sockets = run(proto, count, reconnect)
+            fds_after = open_fds()
+            proto.close()
+
+            click.echo(
+                f"{name:>12}: {latency * 1e6:8.1f} us/request, "
+                f"{sockets} sockets opened, "
+                f"open fds {fds_before} -> {fds_after}"
+            )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,364 @@
+"""Benchmark suite for the protocol, the status containers and the CLI startup.
+
+The suite measures:
+
+* building and parsing messages, and the encryption, per payload size,
+* `get_properties` round trips against a device simulated on the loopback
+  interface,
+* creating the big status containers and their `__repr__` and `__json__`,
+* the cold start of `import miio` and `miiocli --help`.
+
+The results are written as JSON, and can be compared to the results of an
+earlier run::
+
+    python devtools/benchmarks/suite.py --output before.json
+    # apply changes
+    python devtools/benchmarks/suite.py --output after.json --compare before.json
+
+The suite is also available as the `benchmark` environment of tox.
+"""
+import datetime
+import functools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional  # noqa: F401
+
+import click
+
+from miio.protocol import JSON_BACKEND, FastMessage, Message, Utils
+
+TOKEN = bytes.fromhex(32 * "0")
+
+# number of properties in the payloads
+PAYLOAD_SIZES = [1, 15, 100]
+
+RESULTS_VERSION = 1
+
+AIRPURIFIER_STATE = {
+    "power": "on",
+    "aqi": 10,
+    "average_aqi": 8,
+    "humidity": 62,
+    "temp_dec": 186,
+    "mode": "auto",
+    "favorite_level": 10,
+    "filter1_life": 80,
+    "f1_hour_used": 682,
+    "use_time": 2457000,
+    "motor1_speed": 354,
+    "motor2_speed": 800,
+    "purify_volume": 25262,
+    "f1_hour": 3500,
+    "led": "off",
+    "led_b": 2,
+    "bright": 83,
+    "buzzer": "off",
+    "child_lock": "off",
+    "volume": 50,
+    "rfid_product_id": "0:0:41:30",
+    "rfid_tag": "10:20:30:40:50:60:7",
+    "act_sleep": "close",
+    "sleep_mode": "idle",
+    "sleep_time": 83890,
+    "sleep_data_num": 22,
+    "app_extra": 1,
+    "act_det": "off",
+    "button_pressed": "power",
+}
+
+COOKER_STATE = {
+    "func": "running",
+    "menu": "0001",
+    "stage": "03000000ff",
+    "temp": "31",
+    "t_func": "39",
+    "t_precook": "-1",
+    "t_cook": "60",
+    "setting": "0607",
+    "delay": "05040f",
+    "version": "00030017",
+    "favorite": "0100",
+    "custom": "ffffffffffff011effff010003055332",
+}
+
+VACUUM_STATE = {
+    "state": 8,
+    "dnd_enabled": 1,
+    "clean_time": 0,
+    "msg_ver": 4,
+    "map_present": 1,
+    "error_code": 0,
+    "in_cleaning": 0,
+    "clean_area": 0,
+    "battery": 100,
+    "fan_power": 20,
+    "msg_seq": 320,
+    "water_box_status": 1,
+}
+
+
+class Benchmark:
+    """Function to measure, called `number` times per round.
+
+    If `number` is None, it is chosen so that a round takes at least 0.2 s.
+    """
+
+    def __init__(
+        self, name: str, func: Callable[[], Any], number: int = None, **info: Any
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.number = number
+        self.info = info
+
+    def run(self, rounds: int) -> Dict[str, Any]:
+        """Return the seconds per call of the rounds and their statistics."""
+        timer = timeit.Timer(self.func)
+        number = self.number
+        if number is None:
+            number, _ = timer.autorange()
+        times = [t / number for t in timer.repeat(rounds, number)]
+        result = OrderedDict(
+            [
+                ("min", min(times)),
+                ("mean", statistics.mean(times)),
+                ("stdev", statistics.stdev(times) if len(times) > 1 else 0.0),
+                ("rounds", rounds),
+                ("number", number),
+            ]
+        )
+        result.update(self.info)
+        return result
+
+
+def build_message(codec, payload):
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": b"\x01\x02\x03\x04",
+        "ts": datetime.datetime.utcnow(),
+    }
+    msg = {"data": {"value": payload}, "header": {"value": header}, "checksum": 0}
+    return codec.build(msg, token=TOKEN)
+
+
+def codec_benchmarks() -> List[Benchmark]:
+    benchmarks = []
+    for size in PAYLOAD_SIZES:
+        payload = {"id": 1, "result": ["value%s" % i for i in range(size)]}
+        plaintext = JSON_BACKEND.dumps(payload)
+        ciphertext = Utils.encrypt(plaintext, TOKEN)
+        info = {"payload_bytes": len(plaintext)}
+        for codec_name, codec in (("Message", Message), ("FastMessage", FastMessage)):
+            data = build_message(codec, payload)
+            benchmarks += [
+                Benchmark(
+                    "codec.%s.build.%s" % (codec_name, size),
+                    functools.partial(build_message, codec, payload),
+                    **info,
+                ),
+                Benchmark(
+                    "codec.%s.parse.%s" % (codec_name, size),
+                    functools.partial(codec.parse, data, token=TOKEN),
+                    **info,
+                ),
+            ]
+        benchmarks += [
+            Benchmark(
+                "crypto.encrypt.%s" % size,
+                functools.partial(Utils.encrypt, plaintext, TOKEN),
+                **info,
+            ),
+            Benchmark(
+                "crypto.decrypt.%s" % size,
+                functools.partial(Utils.decrypt, ciphertext, TOKEN),
+                **info,
+            ),
+        ]
+    return benchmarks
+
+
+def _json_default(value):
+    return value.__json__()
+
+
+def status_benchmarks() -> List[Benchmark]:
+    from miio.airpurifier import AirPurifierStatus
+    from miio.cooker import CookerStatus
+    from miio.vacuumcontainers import VacuumStatus
+
+    benchmarks = []
+    containers = [
+        (AirPurifierStatus, AIRPURIFIER_STATE),
+        (CookerStatus, COOKER_STATE),
+        (VacuumStatus, VACUUM_STATE),
+    ]
+    for cls, data in containers:
+        status = cls(dict(data))
+        benchmarks += [
+            Benchmark(
+                "status.%s.create" % cls.__name__, functools.partial(cls, dict(data))
+            ),
+            Benchmark("status.%s.repr" % cls.__name__, functools.partial(repr, status)),
+        ]
+        # not all containers implement __json__
+        if hasattr(status, "__json__"):
+            benchmarks.append(
+                Benchmark(
+                    "status.%s.json" % cls.__name__,
+                    functools.partial(json.dumps, status, default=_json_default),
+                )
+            )
+    return benchmarks
+
+
+def roundtrip_benchmarks(simulator) -> List[Benchmark]:
+    from miio.airpurifier import AirPurifier
+    from miio.simulator import SimulatedDevice
+
+    host, port = simulator.add(
+        SimulatedDevice(TOKEN.hex(), AIRPURIFIER_STATE), "127.0.0.1", 0
+    )
+    device = AirPurifier(host, TOKEN.hex())
+    device._protocol.port = port
+    device.send_handshake()
+
+    properties = list(AIRPURIFIER_STATE)
+    benchmarks = []
+    for size in PAYLOAD_SIZES:
+        requested = (properties * (size // len(properties) + 1))[:size]
+        benchmarks.append(
+            Benchmark(
+                "roundtrip.get_properties.%s" % size,
+                functools.partial(device.get_properties, requested),
+            )
+        )
+    benchmarks.append(Benchmark("roundtrip.AirPurifier.status", device.status))
+    return benchmarks
+
+
+def startup_benchmarks() -> List[Benchmark]:
+    commands = [
+        ("startup.import_miio", [sys.executable, "-c", "import miio"]),
+        ("startup.miiocli_help", [sys.executable, "-m", "miio.cli", "--help"]),
+    ]
+    benchmarks = []
+    for name, args in commands:
+        run = functools.partial(
+            subprocess.run, args, check=True, stdout=subprocess.DEVNULL
+        )
+        # build the command index and warm the file system caches
+        run()
+        benchmarks.append(Benchmark(name, run, number=1))
+    return benchmarks
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float):
+    """Print the changes of the fastest rounds relative to the baseline."""
+    click.echo("\n%-45s %12s %12s %8s" % ("benchmark", "baseline", "current", "change"))
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            click.echo("%-45s %12s %12s" % (name, "-", format_time(result["min"])))
+            continue
+        change = result["min"] / base["min"] - 1
+        line = "%-45s %12s %12s %+7.1f%%" % (
+            name,
+            format_time(base["min"]),
+            format_time(result["min"]),
+            change * 100,
+        )
+        if abs(change) >= threshold:
+            line = click.style(line, fg="red" if change > 0 else "green")
+        click.echo(line)
+
+
+def format_time(seconds: float) -> str:
+    for unit, factor in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * factor >= 1:
+            return "%.2f %s" % (seconds * factor, unit)
+    return "%.0f ns" % (seconds * 1e9)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.command()
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="JSON file")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.File(),
+    help="JSON file of an earlier run to compare to",
+)
+@click.option("--rounds", default=5, help="Number of rounds per benchmark")
+@click.option("--filter", "-k", "pattern", help="Only run benchmarks containing this")
+@click.option(
+    "--threshold",
+    default=0.1,
+    help="Relative change highlighted in the comparison",
+)
+def cli(output, baseline, rounds, pattern, threshold):
+    """Run the benchmarks and print the time per call."""
+    from miio.simulator import Simulator
+
+    results = OrderedDict(
+        [
+            ("version", RESULTS_VERSION),
+            ("created", datetime.datetime.utcnow().isoformat() + "Z"),
+            ("revision", git_revision()),
+            ("python", platform.python_version()),
+            ("implementation", platform.python_implementation()),
+            ("platform", platform.platform()),
+            ("json_backend", JSON_BACKEND.name),
+            ("results", OrderedDict()),
+        ]
+    )  # type: Dict[str, Any]
+
+    with Simulator() as simulator:
+        benchmarks = (
+            codec_benchmarks()
+            + status_benchmarks()
+            + roundtrip_benchmarks(simulator)
+            + startup_benchmarks()
+        )
+        for benchmark in benchmarks:
+            if pattern and pattern not in benchmark.name:
+                continue
+            result = benchmark.run(rounds)
+            results["results"][benchmark.name] = result
+            click.echo(
+                "%-45s %12s +- %s"
+                % (
+                    benchmark.name,
+                    format_time(result["mean"]),
+                    format_time(result["stdev"]),
+                )
+            )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        click.echo("Results written to %s" % output)
+
+    if baseline:
+        compare(results, json.load(baseline), threshold)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,53 +1,121 @@
 # flake8: noqa
-from importlib_metadata import version  # type: ignore
-from miio.airconditioningcompanion import (
-    AirConditioningCompanion,
-    AirConditioningCompanionV3,
-)
-from miio.airdehumidifier import AirDehumidifier
-from miio.airfresh import AirFresh, AirFreshVA4
-from miio.airfresh_t2017 import AirFreshT2017
-from miio.airhumidifier import AirHumidifier, AirHumidifierCA1, AirHumidifierCB1
-from miio.airhumidifier_jsq import AirHumidifierJsq
-from miio.airhumidifier_miot import AirHumidifierMiot
-from miio.airhumidifier_mjjsq import AirHumidifierMjjsq
-from miio.airpurifier import AirPurifier
-from miio.airpurifier_miot import AirPurifierMiot
-from miio.airqualitymonitor import AirQualityMonitor
-from miio.aqaracamera import AqaraCamera
-from miio.ceil import Ceil
-from miio.chuangmi_camera import ChuangmiCamera
-from miio.chuangmi_ir import ChuangmiIr
-from miio.chuangmi_plug import ChuangmiPlug, Plug, PlugV1, PlugV3
-from miio.cooker import Cooker
-from miio.device import Device
-from miio.exceptions import DeviceError, DeviceException
-from miio.fan import Fan, FanP5, FanSA1, FanV2, FanZA1, FanZA4
-from miio.gateway import Gateway
-from miio.heater import Heater
-from miio.philips_bulb import PhilipsBulb, PhilipsWhiteBulb
-from miio.philips_eyecare import PhilipsEyecare
-from miio.philips_moonlight import PhilipsMoonlight
-from miio.philips_rwread import PhilipsRwread
-from miio.powerstrip import PowerStrip
-from miio.protocol import Message, Utils
-from miio.pwzn_relay import PwznRelay
-from miio.toiletlid import Toiletlid
-from miio.vacuum import Vacuum, VacuumException
-from miio.vacuumcontainers import (
-    CleaningDetails,
-    CleaningSummary,
-    ConsumableStatus,
-    DNDStatus,
-    Timer,
-    VacuumStatus,
-)
-from miio.viomivacuum import ViomiVacuum
-from miio.waterpurifier import WaterPurifier
-from miio.wifirepeater import WifiRepeater
-from miio.wifispeaker import WifiSpeaker
-from miio.yeelight import Yeelight
-
-from miio.discovery import Discovery
-
-__version__ = version("python-miio")
+"""Library for interfacing with Xiaomi smart appliances.
+
+The device classes and other public names are imported lazily on first access,
+so that importing the package only loads the modules which are actually used.
+"""
+import importlib
+import sys
+
+# public names and the modules defining them
+_LAZY_IMPORTS = {
+    "AirConditioningCompanion": "miio.airconditioningcompanion",
+    "AirConditioningCompanionV3": "miio.airconditioningcompanion",
+    "AirDehumidifier": "miio.airdehumidifier",
+    "AirFresh": "miio.airfresh",
+    "AirFreshVA4": "miio.airfresh",
+    "AirFreshT2017": "miio.airfresh_t2017",
+    "AirHumidifier": "miio.airhumidifier",
+    "AirHumidifierCA1": "miio.airhumidifier",
+    "AirHumidifierCB1": "miio.airhumidifier",
+    "AirHumidifierJsq": "miio.airhumidifier_jsq",
+    "AirHumidifierMiot": "miio.airhumidifier_miot",
+    "AirHumidifierMjjsq": "miio.airhumidifier_mjjsq",
+    "AirPurifier": "miio.airpurifier",
+    "AirPurifierMiot": "miio.airpurifier_miot",
+    "AirQualityMonitor": "miio.airqualitymonitor",
+    "AqaraCamera": "miio.aqaracamera",
+    "Ceil": "miio.ceil",
+    "ChuangmiCamera": "miio.chuangmi_camera",
+    "ChuangmiIr": "miio.chuangmi_ir",
+    "ChuangmiPlug": "miio.chuangmi_plug",
+    "Plug": "miio.chuangmi_plug",
+    "PlugV1": "miio.chuangmi_plug",
+    "PlugV3": "miio.chuangmi_plug",
+    "Cooker": "miio.cooker",
+    "AsyncDevice": "miio.device",
+    "Device": "miio.device",
+    "MaxPropertiesTable": "miio.device",
+    "DeviceError": "miio.exceptions",
+    "DeviceException": "miio.exceptions",
+    "DeviceUnavailableException": "miio.exceptions",
+    "Fan": "miio.fan",
+    "FanP5": "miio.fan",
+    "FanSA1": "miio.fan",
+    "FanV2": "miio.fan",
+    "FanZA1": "miio.fan",
+    "FanZA4": "miio.fan",
+    "Gateway": "miio.gateway",
+    "Heater": "miio.heater",
+    "CircuitBreaker": "miio.miioprotocol",
+    "HandshakeCache": "miio.miioprotocol",
+    "RetryPolicy": "miio.miioprotocol",
+    "SharedEndpoint": "miio.miioprotocol",
+    "PhilipsBulb": "miio.philips_bulb",
+    "PhilipsWhiteBulb": "miio.philips_bulb",
+    "PhilipsEyecare": "miio.philips_eyecare",
+    "PhilipsMoonlight": "miio.philips_moonlight",
+    "PhilipsRwread": "miio.philips_rwread",
+    "PowerStrip": "miio.powerstrip",
+    "Message": "miio.protocol",
+    "Utils": "miio.protocol",
+    "PwznRelay": "miio.pwzn_relay",
+    "Toiletlid": "miio.toiletlid",
+    "Vacuum": "miio.vacuum",
+    "VacuumException": "miio.vacuum",
+    "CleaningDetails": "miio.vacuumcontainers",
+    "CleaningSummary": "miio.vacuumcontainers",
+    "ConsumableStatus": "miio.vacuumcontainers",
+    "DNDStatus": "miio.vacuumcontainers",
+    "Timer": "miio.vacuumcontainers",
+    "VacuumStatus": "miio.vacuumcontainers",
+    "ViomiVacuum": "miio.viomivacuum",
+    "WaterPurifier": "miio.waterpurifier",
+    "WifiRepeater": "miio.wifirepeater",
+    "WifiSpeaker": "miio.wifispeaker",
+    "Yeelight": "miio.yeelight",
+    "Discovery": "miio.discovery",
+}
+
+__all__ = sorted(_LAZY_IMPORTS) + ["__version__"]
+
+
+def __getattr__(name):
+    """Import the public names and the submodules on first access (PEP 562)."""
+    if name.startswith("__") and name != "__version__":
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    if name == "__version__":
+        from importlib_metadata import version  # type: ignore
+
+        value = version("python-miio")
+    elif name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    else:
+        try:
+            # submodules used to be available as attributes after importing miio
+            return importlib.import_module("%s.%s" % (__name__, name))
+        except ModuleNotFoundError as ex:
+            if ex.name != "%s.%s" % (__name__, name):
+                raise
+            raise AttributeError(
+                "module %r has no attribute %r" % (__name__, name)
+            ) from None
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+def _load_all():
+    """Import all public names."""
+    for name in __all__:
+        __getattr__(name)
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported
+    _load_all()
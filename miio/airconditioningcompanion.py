@@ -4,6 +4,7 @@ from typing import Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -304,6 +305,7 @@ class AirConditioningCompanion(Device):
             "Mode: {result.mode}\n",
         )
     )
+    @cached()
     def status(self) -> AirConditioningCompanionStatus:
         """Return device status."""
         status = self.send("get_model_and_state")
@@ -498,6 +500,7 @@ class AirConditioningCompanionV3(AirConditioningCompanion):
             "Mode: {result.mode}\n",
         )
     )
+    @cached()
     def status(self) -> AirConditioningCompanionStatus:
         """Return device status."""
         status = self.send("get_model_and_state")
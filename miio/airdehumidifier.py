@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device, DeviceInfo
 from .exceptions import DeviceError, DeviceException
@@ -32,6 +33,9 @@ AVAILABLE_PROPERTIES = {
     ]
 }
 
+# The properties are requested one at a time, so several requests are pipelined
+MAX_IN_FLIGHT = {MODEL_DEHUMIDIFIER_V1: 4}
+
 
 class AirDehumidifierException(DeviceException):
     pass
@@ -228,6 +232,7 @@ class AirDehumidifier(Device):
             "Alarm: {result.alarm}\n",
         )
     )
+    @cached()
     def status(self) -> AirDehumidifierStatus:
         """Retrieve properties."""
 
@@ -236,7 +241,9 @@ class AirDehumidifier(Device):
 
         properties = AVAILABLE_PROPERTIES[self.model]
 
-        values = self.get_properties(properties, max_properties=1)
+        values = self.get_properties(
+            properties, max_properties=1, max_in_flight=MAX_IN_FLIGHT.get(self.model, 1)
+        )
 
         return AirDehumidifierStatus(
             defaultdict(lambda: None, zip(properties, values)), self.device_info
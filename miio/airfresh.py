@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -302,6 +303,7 @@ class AirFresh(Device):
             "Motor speed: {result.motor_speed} rpm\n",
         )
     )
+    @cached()
     def status(self) -> AirFreshStatus:
         """Retrieve properties."""
 
@@ -5,6 +5,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -276,6 +277,7 @@ class AirFreshT2017(Device):
             "Display orientation: {result.display_orientation}\n",
         )
     )
+    @cached()
     def status(self) -> AirFreshStatus:
         """Retrieve properties."""
 
@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device, DeviceInfo
 from .exceptions import DeviceError, DeviceException
@@ -36,6 +37,10 @@ AVAILABLE_PROPERTIES = {
     + ["temperature", "speed", "depth", "dry"],
 }
 
+# The CA1 and CB1 accept a single property per request,
+# so several requests are pipelined
+MAX_IN_FLIGHT = {MODEL_HUMIDIFIER_CA1: 4, MODEL_HUMIDIFIER_CB1: 4}
+
 
 class AirHumidifierException(DeviceException):
     pass
@@ -293,6 +298,7 @@ class AirHumidifier(Device):
             "Button pressed: {result.button_pressed}\n",
         )
     )
+    @cached()
     def status(self) -> AirHumidifierStatus:
         """Retrieve properties."""
 
@@ -309,7 +315,11 @@ class AirHumidifier(Device):
         if self.model in [MODEL_HUMIDIFIER_CA1, MODEL_HUMIDIFIER_CB1]:
             _props_per_request = 1
 
-        values = self.get_properties(properties, max_properties=_props_per_request)
+        values = self.get_properties(
+            properties,
+            max_properties=_props_per_request,
+            max_in_flight=MAX_IN_FLIGHT.get(self.model, 1),
+        )
 
         return AirHumidifierStatus(
             defaultdict(lambda: None, zip(properties, values)), self.device_info
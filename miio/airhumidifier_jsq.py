@@ -5,6 +5,7 @@ from typing import Any, Dict
 import click
 
 from .airhumidifier import AirHumidifierException
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 
@@ -187,6 +188,7 @@ class AirHumidifierJsq(Device):
             "Lid opened: {result.lid_opened}\n",
         )
     )
+    @cached()
     def status(self) -> AirHumidifierStatus:
         """Retrieve properties."""
 
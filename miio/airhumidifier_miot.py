@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .exceptions import DeviceException
 from .miot_device import MiotDevice
@@ -280,6 +281,7 @@ class AirHumidifierMiot(MiotDevice):
             "Power time: {result.power_time} s\n",
         )
     )
+    @cached()
     def status(self) -> AirHumidifierMiotStatus:
         """Retrieve properties."""
 
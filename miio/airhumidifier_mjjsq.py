@@ -5,6 +5,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -27,6 +28,9 @@ AVAILABLE_PROPERTIES = {
     ]
 }
 
+# The properties are requested one at a time, so several requests are pipelined
+MAX_IN_FLIGHT = {MODEL_HUMIDIFIER_MJJSQ: 4}
+
 
 class AirHumidifierException(DeviceException):
     pass
@@ -163,11 +167,14 @@ class AirHumidifierMjjsq(Device):
             "Water tank detached: {result.water_tank_detached}\n",
         )
     )
+    @cached()
     def status(self) -> AirHumidifierStatus:
         """Retrieve properties."""
 
         properties = AVAILABLE_PROPERTIES[self.model]
-        values = self.get_properties(properties, max_properties=1)
+        values = self.get_properties(
+            properties, max_properties=1, max_in_flight=MAX_IN_FLIGHT.get(self.model, 1)
+        )
 
         return AirHumidifierStatus(defaultdict(lambda: None, zip(properties, values)))
 
@@ -6,6 +6,7 @@ from typing import Any, Dict, Optional
 import click
 
 from .airfilter_util import FilterType, FilterTypeUtil
+from .cache import cached, updates
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -373,6 +374,7 @@ class AirPurifier(Device):
             "AQI sensor enabled on power off: {result.auto_detect}\n",
         )
     )
+    @cached()
     def status(self) -> AirPurifierStatus:
         """Retrieve properties."""
 
@@ -414,11 +416,13 @@ class AirPurifier(Device):
         return AirPurifierStatus(defaultdict(lambda: None, zip(properties, values)))
 
     @command(default_output=format_output("Powering on"))
+    @updates(power="on")
     def on(self):
         """Power on."""
         return self.send("set_power", ["on"])
 
     @command(default_output=format_output("Powering off"))
+    @updates(power="off")
     def off(self):
         """Power off."""
         return self.send("set_power", ["off"])
@@ -427,6 +431,7 @@ class AirPurifier(Device):
         click.argument("mode", type=EnumType(OperationMode)),
         default_output=format_output("Setting mode to '{mode.value}'"),
     )
+    @updates(mode=lambda mode: mode.value)
     def set_mode(self, mode: OperationMode):
         """Set mode."""
         return self.send("set_mode", [mode.value])
@@ -435,6 +440,7 @@ class AirPurifier(Device):
         click.argument("level", type=int),
         default_output=format_output("Setting favorite level to {level}"),
     )
+    @updates(favorite_level=lambda level: level)
     def set_favorite_level(self, level: int):
         """Set favorite level."""
         if level < 0 or level > 17:
@@ -450,6 +456,7 @@ class AirPurifier(Device):
         click.argument("brightness", type=EnumType(LedBrightness)),
         default_output=format_output("Setting LED brightness to {brightness}"),
     )
+    @updates(led_b=lambda brightness: brightness.value)
     def set_led_brightness(self, brightness: LedBrightness):
         """Set led brightness."""
         return self.send("set_led_b", [brightness.value])
@@ -460,6 +467,7 @@ class AirPurifier(Device):
             lambda led: "Turning on LED" if led else "Turning off LED"
         ),
     )
+    @updates(led=lambda led: "on" if led else "off")
     def set_led(self, led: bool):
         """Turn led on/off."""
         if led:
@@ -473,6 +481,7 @@ class AirPurifier(Device):
             lambda buzzer: "Turning on buzzer" if buzzer else "Turning off buzzer"
         ),
     )
+    @updates(buzzer=lambda buzzer: "on" if buzzer else "off")
     def set_buzzer(self, buzzer: bool):
         """Set buzzer on/off."""
         if buzzer:
@@ -486,6 +495,7 @@ class AirPurifier(Device):
             lambda lock: "Turning on child lock" if lock else "Turning off child lock"
         ),
     )
+    @updates(child_lock=lambda lock: "on" if lock else "off")
     def set_child_lock(self, lock: bool):
         """Set child lock on/off."""
         if lock:
@@ -497,6 +507,7 @@ class AirPurifier(Device):
         click.argument("volume", type=int),
         default_output=format_output("Setting sound volume to {volume}"),
     )
+    @updates(volume=lambda volume: volume)
     def set_volume(self, volume: int):
         """Set volume of sound notifications [0-100]."""
         if volume < 0 or volume > 100:
@@ -512,6 +523,7 @@ class AirPurifier(Device):
             else "Turning off learn mode"
         ),
     )
+    @updates(act_sleep=lambda learn_mode: "single" if learn_mode else "close")
     def set_learn_mode(self, learn_mode: bool):
         """Set the Learn Mode on/off."""
         if learn_mode:
@@ -527,6 +539,7 @@ class AirPurifier(Device):
             else "Turning off auto detect"
         ),
     )
+    @updates(act_det=lambda auto_detect: "on" if auto_detect else "off")
     def set_auto_detect(self, auto_detect: bool):
         """Set auto detect on/off. It's a feature of the AirPurifier V1 & V3"""
         if auto_detect:
@@ -538,6 +551,7 @@ class AirPurifier(Device):
         click.argument("value", type=int),
         default_output=format_output("Setting extra to {value}"),
     )
+    @updates(app_extra=lambda value: value)
     def set_extra_features(self, value: int):
         """Storage register to enable extra features at the app.
 
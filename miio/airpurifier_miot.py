@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 import click
 
 from .airfilter_util import FilterType, FilterTypeUtil
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .exceptions import DeviceException
 from .miot_device import MiotDevice
@@ -291,6 +292,7 @@ class AirPurifierMiot(MiotDevice):
             "Filter type: {result.filter_type}\n",
         )
     )
+    @cached()
     def status(self) -> AirPurifierMiotStatus:
         """Retrieve properties."""
 
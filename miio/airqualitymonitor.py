@@ -4,6 +4,7 @@ from typing import Optional
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -222,6 +223,7 @@ class AirQualityMonitor(Device):
             "Display clock: {result.display_clock}\n",
         )
     )
+    @cached()
     def status(self) -> AirQualityMonitorStatus:
         """Return device status."""
 
@@ -14,6 +14,7 @@ from typing import Any, Dict
 import attr
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -201,6 +202,7 @@ class AqaraCamera(Device):
             "\n",
         )
     )
+    @cached()
     def status(self) -> CameraStatus:
         """Camera status."""
         return CameraStatus(self.send("get_ipcprop", ["all"]))
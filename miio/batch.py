@@ -0,0 +1,169 @@
+"""Run a list of commands on many devices in parallel.
+
+The devices are read from an inventory file, and the commands from a command
+file, both either in JSON, newline-delimited JSON or YAML (if PyYAML is
+installed), chosen by the file extension::
+
+    # devices.ndjson
+    {"class": "airpurifier", "ip": "192.168.1.2", "token": "..."}
+    {"class": "airhumidifier", "ip": "192.168.1.3", "token": "..."}
+
+    # commands.yaml
+    - set_led on
+    - set_buzzer off
+
+The commands are given as in the shell, or as lists of the command name
+and its arguments. They are run in the given order on each device, while
+the devices are handled concurrently. A JSON line is printed for each
+command and device once the command has finished.
+"""
+import json
+import logging
+import os
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List  # noqa: F401
+
+import click
+
+from .click_common import get_device_class, validate_ip, validate_token
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def read_file(path: str) -> Any:
+    """Return the contents of a JSON, newline-delimited JSON or YAML file."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path) as f:
+        if extension in (".ndjson", ".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise click.UsageError("PyYAML is required for reading %s" % path)
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def parse_commands(commands: List[Any]) -> List[List[str]]:
+    """Return the commands split into the name and the arguments."""
+    parsed = []
+    for command in commands:
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if not isinstance(command, list) or not command:
+            raise click.UsageError("Invalid command: %r" % (command,))
+        parsed.append([str(arg) for arg in command])
+    return parsed
+
+
+def parse_inventory(devices: Any) -> List[Dict[str, str]]:
+    """Return the devices of the inventory, checking their class, ip and token."""
+    if not isinstance(devices, list):
+        raise click.UsageError("The inventory must be a list of devices")
+    for device in devices:
+        if not isinstance(device, dict) or not all(
+            isinstance(device.get(key), str) for key in ("class", "ip", "token")
+        ):
+            raise click.UsageError("Invalid device: %r" % (device,))
+    return devices
+
+
+def _error_message(ex: Exception) -> str:
+    if isinstance(ex, click.ClickException):
+        return ex.format_message()
+    return str(ex) or type(ex).__name__
+
+
+def _params(command, name: str, args: List[str]) -> Dict[str, Any]:
+    """Convert the arguments using the click parameters of the command."""
+    func = lambda **kwargs: kwargs  # noqa: E731
+    for decorator in command.decorators:
+        func = decorator(func)
+    parser = click.command(name, **command.kwargs)(func)
+    with parser.make_context(name, list(args)) as ctx:
+        return ctx.params
+
+
+def _json_default(value: Any) -> Any:
+    get_json_data_func = getattr(value, "__json__", None)
+    if get_json_data_func is not None:
+        return get_json_data_func()
+    return str(value)
+
+
+class BatchRunner:
+    """Run the commands on the devices using a pool of worker threads.
+
+    :param devices: Dicts with the class, the ip and the token of the devices
+    :param commands: Commands with their arguments as strings
+    :param workers: Number of devices handled concurrently
+    """
+
+    def __init__(
+        self, devices: List[Dict[str, str]], commands: List[List[str]], workers: int
+    ) -> None:
+        self.devices = devices
+        self.commands = commands
+        self.workers = workers
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _emit(self, line: Dict[str, Any]) -> None:
+        with self._lock:
+            self.failures += "error" in line
+            click.echo(json.dumps(line, default=_json_default))
+
+    def _run_device(self, entry: Dict[str, str]) -> None:
+        ip = entry.get("ip")
+        try:
+            device_class = get_device_class(entry.get("class", ""))
+            device = device_class(
+                validate_ip(None, None, ip),
+                validate_token(None, None, entry.get("token")),
+            )
+            group_commands = device.get_device_group().commands
+        except Exception as ex:
+            _LOGGER.debug("Unable to create the device %s", ip, exc_info=True)
+            for name, *_ in self.commands:
+                self._emit({"ip": ip, "command": name, "error": _error_message(ex)})
+            return
+
+        try:
+            for name, *args in self.commands:
+                line = {"ip": ip, "command": name, "args": args}  # type: Dict[str, Any]
+                try:
+                    command = group_commands.get(name)
+                    if command is None:
+                        raise click.UsageError("Unknown command (%s)" % name)
+                    line["result"] = command.call(
+                        device, **_params(command, name, args)
+                    )
+                except Exception as ex:
+                    if not isinstance(ex, click.ClickException):
+                        _LOGGER.debug("%s failed on %s", name, ip, exc_info=True)
+                    line["error"] = _error_message(ex)
+                self._emit(line)
+        finally:
+            device.close()
+
+    def run(self) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self._run_device, d) for d in self.devices]:
+                future.result()
+
+
+@click.command()
+@click.argument("inventory", type=click.Path(exists=True, dir_okay=False))
+@click.argument("commands", type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", default=8, help="Number of devices handled concurrently")
+@click.pass_context
+def batch(ctx, inventory: str, commands: str, workers: int):
+    """Run the commands of a file on the devices of an inventory file."""
+    devices = parse_inventory(read_file(inventory))
+    runner = BatchRunner(devices, parse_commands(read_file(commands)), workers)
+    runner.run()
+    if runner.failures:
+        ctx.exit(1)
@@ -0,0 +1,239 @@
+"""Caching of device method results.
+
+Methods decorated with :func:`cached` return their last result for a given
+time, once caching has been enabled for the device instance with
+:func:`miio.Device.enable_cache`:
+
+.. code-block::
+    dev = AirPurifier(ip, token)
+    dev.enable_cache({"status": 5})
+    dev.status()  # sends the request
+    dev.status()  # returns the same status object
+    dev.on()  # invalidates the cache
+
+Concurrent calls of a cached method are coalesced, so that only a single
+request is sent to the device. Any request sent outside of a cached method,
+i.e., by a setter, invalidates all cached results of the device.
+
+Setters decorated with :func:`updates` patch the cached status instead,
+if the device confirms the request. The patched fields are listed in the
+`unconfirmed` attribute of the status object until the status is requested
+from the device again.
+"""
+import copy
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Set, Tuple  # noqa: F401
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL = 1.0
+
+
+class _Flight:
+    """Call of a cached method in progress, awaited by concurrent callers."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value = None  # type: Any
+        self.exception = None  # type: Optional[BaseException]
+
+
+class DeviceCache:
+    """Cached method results of a single device.
+
+    :param ttls: Time to live in seconds per method name, overriding the
+        ttl given to :func:`cached`
+    """
+
+    def __init__(self, ttls: Dict[str, float] = None) -> None:
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # type: Dict[Tuple, Tuple[float, Any]]
+        self._flights = {}  # type: Dict[Tuple, _Flight]
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def active(self) -> bool:
+        """Return True if the current thread is executing a cached method,
+        or a setter updating the cache."""
+        return getattr(self._local, "depth", 0) > 0
+
+    def _enter(self) -> None:
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+
+    def _exit(self) -> None:
+        self._local.depth -= 1
+
+    def call(self, name: str, key: Tuple, ttl: float, func: Callable) -> Any:
+        """Return the cached result for the key, calling func if necessary."""
+        ttl = self.ttls.get(name, ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            _LOGGER.debug("Waiting for the pending call of %s", name)
+            flight.event.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.value
+
+        self._enter()
+        try:
+            flight.value = func()
+        except BaseException as ex:
+            flight.exception = ex
+            raise
+        finally:
+            self._exit()
+            with self._lock:
+                del self._flights[key]
+                # results of calls overlapping with an invalidation may be stale
+                if flight.exception is None and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + ttl, flight.value)
+            flight.event.set()
+
+        return flight.value
+
+    def get(self, key: Tuple) -> Any:
+        """Return the cached result for the key, regardless of its age."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def patch(self, name: str, fields: Dict[str, Any]) -> None:
+        """Update the given fields in the cached results of the given method.
+
+        The results are expected to keep the raw values in their `data` dict.
+        Results not matching that are dropped instead, like all results
+        of other methods. The cached results are replaced by patched copies,
+        so that results returned earlier are left unchanged.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                expires, value = self._entries[key]
+                data = getattr(value, "data", None)
+                if key[0] != name or not isinstance(data, dict):
+                    del self._entries[key]
+                    continue
+
+                patched = copy.copy(value)
+                # keeps the mapping type, e.g. defaultdicts of partial responses
+                patched.data = copy.copy(data)
+                patched.data.update(fields)
+                patched.unconfirmed = getattr(value, "unconfirmed", set()) | set(fields)
+                self._entries[key] = (expires, patched)
+
+    def invalidate(self, name: str = None) -> None:
+        """Drop the cached results of the given method, or of all methods."""
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == name]:
+                    del self._entries[key]
+
+
+def cached(ttl: float = DEFAULT_TTL):
+    """Cache the results of a read-only device method for `ttl` seconds.
+
+    The results are only cached if caching is enabled for the device instance,
+    see :func:`miio.Device.enable_cache`.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrap(self, *args, **kwargs):
+            cache = getattr(self, "_cache", None)
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(self, *args, **kwargs)
+
+            return cache.call(
+                func.__name__, key, ttl, lambda: func(self, *args, **kwargs)
+            )
+
+        wrap._cache_ttl = ttl
+        return wrap
+
+    return decorator
+
+
+def _confirmed(result: Any) -> bool:
+    """Return True if the response of a setter confirms the change."""
+    if result is None or result == "ok" or result == ["ok"]:
+        return True
+    if isinstance(result, list) and result:
+        # miot responses contain a code per property
+        return all(isinstance(r, dict) and r.get("code") == 0 for r in result)
+    return False
+
+
+def updates(method: str = "status", **fields: Any):
+    """Declare the fields of the cached status changed by a setter.
+
+    The field values are either constants or callables, which are called with
+    the arguments given to the setter:
+
+    .. code-block::
+        @command(...)
+        @updates(mode=lambda mode: mode.value)
+        def set_mode(self, mode: OperationMode):
+
+    If caching is enabled and the device confirms the request, the cached
+    results of `method` are patched instead of being dropped.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrap(self, *args, **kwargs):
+            cache = getattr(self, "_cache", None)
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            cache._enter()
+            try:
+                result = func(self, *args, **kwargs)
+            except BaseException:
+                cache.invalidate()
+                raise
+            finally:
+                cache._exit()
+
+            if not _confirmed(result):
+                cache.invalidate()
+                return result
+
+            values = {
+                field: value(*args, **kwargs) if callable(value) else value
+                for field, value in fields.items()
+            }
+            cache.patch(method, values)
+            return result
+
+        wrap._cache_updates = (method, fields)
+        return wrap
+
+    return decorator
@@ -4,6 +4,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -109,6 +110,7 @@ class Ceil(Device):
             "Automatic color temperature: {result.automatic_color_temperature}\n",
         )
     )
+    @cached()
     def status(self) -> CeilStatus:
         """Retrieve properties."""
         properties = ["power", "bright", "cct", "snm", "dv", "bl", "ac"]
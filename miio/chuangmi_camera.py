@@ -6,6 +6,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 
@@ -204,6 +205,7 @@ class ChuangmiCamera(Device):
             "\n",
         )
     )
+    @cached()
     def status(self) -> CameraStatus:
         """Retrieve properties."""
         properties = [
@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .utils import deprecated
@@ -133,6 +134,7 @@ class ChuangmiPlug(Device):
             "WiFi LED: {result.wifi_led}\n",
         )
     )
+    @cached()
     def status(self) -> ChuangmiPlugStatus:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model].copy()
@@ -1,18 +1,19 @@
+import json
 import logging
+import os
 
 import click
+from appdirs import user_cache_dir
 
-from miio.click_common import (
-    DeviceGroupMeta,
-    ExceptionHandlerGroup,
-    GlobalContextObject,
-    json_output,
-)
+from miio.cli_index import IndexedGroup, load_index
+from miio.click_common import GlobalContextObject, json_output
 
 _LOGGER = logging.getLogger(__name__)
 
+INDEX_PATH = os.path.join(user_cache_dir("python-miio"), "cli_index.json")
+
 
-@click.group(cls=ExceptionHandlerGroup)
+@click.group(cls=IndexedGroup, index=lambda: load_index(INDEX_PATH))
 @click.option("-d", "--debug", default=False, count=True)
 @click.option(
     "-o",
@@ -20,15 +21,43 @@ _LOGGER = logging.getLogger(__name__)
     type=click.Choice(["default", "json", "json_pretty"]),
     default="default",
 )
+@click.option(
+    "--handshake-cache/--no-handshake-cache",
+    default=False,
+    help="Store handshakes on disk to skip them on subsequent invocations",
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Print the latencies, traffic, retries and errors per device and "
+    "method to stderr when done",
+)
 @click.version_option()
 @click.pass_context
-def cli(ctx, debug: int, output: str):
+def cli(ctx, debug: int, output: str, handshake_cache: bool, stats: bool):
     if debug:
+        from miio.protocol import JSON_BACKEND
+
         logging.basicConfig(level=logging.DEBUG)
         _LOGGER.info("Debug mode active")
+        _LOGGER.debug("Using %s for encoding payloads", JSON_BACKEND.name)
     else:
         logging.basicConfig(level=logging.INFO)
 
+    if handshake_cache:
+        from miio import miioprotocol
+
+        miioprotocol.HANDSHAKE_CACHE.path = os.path.join(
+            user_cache_dir("python-miio"), "handshakes.json"
+        )
+
+    if stats:
+        from miio.instrumentation import Collector, attach
+
+        collector = Collector()
+        attach(collector)
+        ctx.call_on_close(lambda: print_stats(collector, output))
+
     if output in ("json", "json_pretty"):
         output_func = json_output(pretty=output == "json_pretty")
     else:
@@ -37,8 +66,12 @@ def cli(ctx, debug: int, output: str):
     ctx.obj = GlobalContextObject(debug=debug, output=output_func)
 
 
-for device_class in DeviceGroupMeta.device_classes:
-    cli.add_command(device_class.get_device_group())
+def print_stats(collector, output: str) -> None:
+    if output in ("json", "json_pretty"):
+        indent = 2 if output == "json_pretty" else None
+        click.echo(json.dumps(collector.__json__(), indent=indent), err=True)
+    else:
+        click.echo(collector.format(), err=True)
 
 
 def create_cli():
@@ -0,0 +1,153 @@
+"""Index of the miiocli commands for loading them on demand.
+
+Building the command groups of all device classes requires importing every
+device module. The index maps the command names to the modules defining them
+and their help texts, so that only the module of the invoked command is
+imported. The help and the shell completion of the top-level commands are
+served from the index as well.
+
+The index is built on the first run and cached in the user cache directory.
+It is rebuilt whenever the modules of the library change.
+"""
+import hashlib
+import importlib
+import json
+import logging
+import os
+from typing import Dict, Optional  # noqa: F401
+
+import click
+
+from .click_common import ExceptionHandlerGroup
+from .utils import write_json
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# commands not belonging to a device class, and the modules defining them
+EXTRA_COMMANDS = {
+    "batch": "miio.batch",
+    "exporter": "miio.exporter",
+    "simulator": "miio.simulator",
+}
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fingerprint() -> str:
+    """Return a hash of the names, sizes and modification times of the modules."""
+    digest = hashlib.sha1(str(INDEX_VERSION).encode())
+    for name in sorted(os.listdir(_PACKAGE_DIR)):
+        if name.endswith(".py"):
+            stat = os.stat(os.path.join(_PACKAGE_DIR, name))
+            digest.update(("%s:%s:%s;" % (name, stat.st_size, stat.st_mtime)).encode())
+    return digest.hexdigest()
+
+
+def build_index() -> Dict[str, Dict[str, str]]:
+    """Import all device modules and return the index of their commands."""
+    import miio
+    from miio.click_common import DeviceGroupMeta
+
+    def _entry(module, attr, command):
+        return {"module": module, "attr": attr, "help": command.get_short_help_str()}
+
+    miio._load_all()
+    index = {}
+    for device_class in DeviceGroupMeta.device_classes:
+        group = device_class.get_device_group()
+        index[group.name] = _entry(
+            device_class.__module__, device_class.__name__, group
+        )
+
+    for name, module in EXTRA_COMMANDS.items():
+        command = getattr(importlib.import_module(module), name)
+        index[name] = _entry(module, name, command)
+
+    return index
+
+
+def load_index(path: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """Return the cached index, rebuilding it if it is missing or outdated."""
+    current = fingerprint()
+    if path is not None:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("fingerprint") == current:
+                return data["commands"]
+        except (OSError, ValueError, AttributeError) as ex:
+            _LOGGER.debug("Unable to read the command index %s: %s", path, ex)
+
+    _LOGGER.debug("Building the command index")
+    index = build_index()
+    if path is not None:
+        write_json(path, {"fingerprint": current, "commands": index})
+    return index
+
+
+class IndexedGroup(ExceptionHandlerGroup):
+    """Group loading the indexed commands on demand.
+
+    :param index: Index of the commands, or a callable returning it
+    """
+
+    def __init__(self, *args, index=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index = index
+        self._loaded = {}  # type: Dict[str, click.Command]
+        self._resolving = False
+
+    @property
+    def index(self) -> Dict[str, Dict[str, str]]:
+        if callable(self._index):
+            self._index = self._index()
+        return self._index or {}
+
+    def _load(self, name: str) -> click.Command:
+        command = self._loaded.get(name)
+        if command is None:
+            entry = self.index[name]
+            obj = getattr(importlib.import_module(entry["module"]), entry["attr"])
+            if not isinstance(obj, click.Command):
+                obj = obj.get_device_group()
+            command = self._loaded[name] = obj
+        return command
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.index))
+
+    def get_command(self, ctx, cmd_name):
+        command = super().get_command(ctx, cmd_name)
+        if command is not None or cmd_name not in self.index:
+            return command
+
+        if ctx.resilient_parsing and not self._resolving:
+            # listing the commands for the shell completion
+            entry = self.index[cmd_name]
+            return click.Command(cmd_name, short_help=entry["help"])
+
+        return self._load(cmd_name)
+
+    def resolve_command(self, ctx, args):
+        self._resolving = True
+        try:
+            return super().resolve_command(ctx, args)
+        finally:
+            self._resolving = False
+
+    def format_commands(self, ctx, formatter):
+        rows = []
+        for name in self.list_commands(ctx):
+            command = self.commands.get(name)
+            if command is not None:
+                if command.hidden:
+                    continue
+                rows.append((name, command.get_short_help_str()))
+            else:
+                rows.append((name, self.index[name]["help"]))
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
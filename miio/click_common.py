@@ -7,6 +7,7 @@ import ipaddress
 import json
 import logging
 import re
+import shlex
 import sys
 from functools import partial, wraps
 from typing import Union
@@ -154,6 +155,16 @@ class DeviceGroupMeta(type):
         return cls
 
 
+def get_device_class(name: str) -> type:
+    """Return the device class of the given command group name."""
+    # import the device modules to register their classes
+    miio._load_all()
+    for device_class in list(DeviceGroupMeta.device_classes):
+        if device_class.__name__.lower() == name.lower():
+            return device_class
+    raise click.BadParameter("Unknown device class: %s" % name)
+
+
 class DeviceGroup(click.MultiCommand):
     class Command:
         def __init__(self, name, decorators, *, default_output=None, **kwargs):
@@ -245,6 +256,12 @@ class DeviceGroup(click.MultiCommand):
         return miio_command.call(miio_device, *args, **kwargs)
 
     def get_command(self, ctx, cmd_name):
+        if cmd_name == "shell" and cmd_name not in self.commands:
+            return click.Command(
+                "shell",
+                callback=click.pass_context(self.shell),
+                help="Run commands read from the standard input.",
+            )
         if cmd_name not in self.commands:
             ctx.fail("Unknown command (%s)" % cmd_name)
 
@@ -254,7 +271,65 @@ class DeviceGroup(click.MultiCommand):
         )
 
     def list_commands(self, ctx):
-        return sorted(self.commands.keys())
+        return sorted(set(self.commands.keys()) | {"shell"})
+
+    def shell(self, ctx):
+        """Run the commands read from the standard input on the same device.
+
+        The device instance, and thus its handshake and socket, is kept between
+        the commands. Lines are split like in a shell, `exit` or the end of
+        the input ends the session.
+        """
+        group_ctx = ctx.parent
+        interactive = sys.stdin.isatty()
+        if interactive:
+            try:
+                import readline  # noqa: F401
+            except ImportError:
+                pass
+            click.echo("Type 'help' for the available commands, 'exit' to quit.")
+
+        while True:
+            try:
+                line = input("%s> " % self.name if interactive else "")
+            except EOFError:
+                break
+            except KeyboardInterrupt:
+                click.echo()
+                continue
+
+            try:
+                args = shlex.split(line, comments=True)
+            except ValueError as ex:
+                click.echo("Error: %s" % ex, err=True)
+                continue
+
+            if not args:
+                continue
+            if args[0] in ("exit", "quit"):
+                break
+            if args[0] == "help":
+                click.echo(" ".join(sorted(self.commands.keys())))
+                continue
+
+            self._run_shell_command(group_ctx, args)
+
+    def _run_shell_command(self, ctx, args):
+        name, args = args[0], args[1:]
+        try:
+            if name not in self.commands:
+                raise click.UsageError("Unknown command (%s)" % name, ctx)
+
+            cmd = self.get_command(ctx, name)
+            with cmd.make_context(name, args, parent=ctx) as cmd_ctx:
+                cmd.invoke(cmd_ctx)
+        except click.ClickException as ex:
+            ex.show()
+        except (click.exceptions.Exit, click.Abort):
+            pass
+        except miio.DeviceException as ex:
+            _LOGGER.debug("Exception: %s", ex, exc_info=True)
+            click.echo(click.style("Error: %s" % ex, fg="red", bold=True))
 
 
 def command(*decorators, name=None, default_output=None, **kwargs):
@@ -7,6 +7,7 @@ from typing import List, Optional
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -741,6 +742,7 @@ class Cooker(Device):
             "Custom: {result.custom}\n",
         )
     )
+    @cached()
     def status(self) -> CookerStatus:
         """Retrieve properties."""
         properties = [
@@ -1,12 +1,27 @@
+import asyncio
+import copy
+import json
 import logging
+import os
+import threading
+from concurrent.futures import Executor
 from enum import Enum
-from typing import Any, Optional  # noqa: F401
+from functools import partial, wraps
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
 
 import click
+from appdirs import user_cache_dir
 
+from .cache import DeviceCache
 from .click_common import DeviceGroupMeta, LiteralParamType, command, format_output
-from .exceptions import DeviceInfoUnavailableException, PayloadDecodeException
-from .miioprotocol import MiIOProtocol
+from .exceptions import (
+    DeviceException,
+    DeviceInfoUnavailableException,
+    DeviceUnavailableException,
+    PayloadDecodeException,
+)
+from .miioprotocol import AsyncMiIOProtocol, MiIOProtocol
+from .utils import write_json
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -102,12 +117,101 @@ class DeviceInfo:
         return self.data
 
 
+class MaxPropertiesTable:
+    """Number of properties accepted per request, keyed by model and firmware.
+
+    Each entry holds the largest number of properties accepted by the device
+    in a single request, and whether a larger request has been rejected.
+    If a path is given, the table is persisted to that file.
+    The default table :data:`MAX_PROPERTIES_TABLE` is stored in the user cache
+    directory, a table kept only in memory can be used instead:
+
+    .. code-block::
+        dev.max_properties_table = MaxPropertiesTable()
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self._entries = None  # type: Optional[Dict[str, Dict[str, List]]]
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, List]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None and os.path.isfile(self.path):
+                try:
+                    with open(self.path) as f:
+                        self._entries = dict(json.load(f))
+                except (OSError, ValueError, TypeError) as ex:
+                    _LOGGER.warning("Unable to read %s: %s", self.path, ex)
+
+        return self._entries
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+
+        write_json(self.path, self._entries, indent=2, sort_keys=True)
+
+    def get(self, model: str, fw_ver: str) -> Optional[Tuple[int, bool]]:
+        """Return the accepted number of properties and whether it is the limit."""
+        with self._lock:
+            entry = self._load().get(model, {}).get(fw_ver)
+
+        if entry is None:
+            return None
+        return int(entry[0]), bool(entry[1])
+
+    def set(self, model: str, fw_ver: str, accepted: int, limited: bool) -> None:
+        """Store the accepted number of properties for the given model and firmware.
+
+        :param limited: True if a request with more properties has been rejected."""
+        with self._lock:
+            self._load().setdefault(model, {})[fw_ver] = [accepted, limited]
+            self._save()
+
+
+def _slice_properties(properties: List, max_properties: Optional[int]) -> List[List]:
+    """Split the properties into slices of at most `max_properties` properties."""
+    if max_properties is None:
+        return [properties.copy()] if properties else []
+    return [
+        properties[i : i + max_properties]
+        for i in range(0, len(properties), max_properties)
+    ]
+
+
+def _check_values_count(properties: List, values: List) -> None:
+    properties_count = len(properties)
+    values_count = len(values)
+    if properties_count != values_count:
+        _LOGGER.debug(
+            "Count (%s) of requested properties does not match the "
+            "count (%s) of received values.",
+            properties_count,
+            values_count,
+        )
+
+
+MAX_PROPERTIES_TABLE = MaxPropertiesTable(
+    os.path.join(user_cache_dir("python-miio"), "max_properties.json")
+)
+
+
 class Device(metaclass=DeviceGroupMeta):
     """Base class for all device implementations.
     This is the main class providing the basic protocol handling for devices using
     the ``miIO`` protocol.
     This class should not be initialized directly but a device-specific class inheriting
-    it should be used instead of it."""
+    it should be used instead of it.
+
+    If :attr:`probe_max_properties` is set, :func:`get_properties` finds out how
+    many properties the device accepts per request, see :class:`MaxPropertiesTable`.
+    """
+
+    probe_max_properties = False
+    max_properties_table = MAX_PROPERTIES_TABLE
+    _cache = None  # type: Optional[DeviceCache]
 
     def __init__(
         self,
@@ -120,6 +224,7 @@ class Device(metaclass=DeviceGroupMeta):
         self.ip = ip
         self.token = token
         self._protocol = MiIOProtocol(ip, token, start_id, debug, lazy_discover)
+        self._info = None  # type: Optional[DeviceInfo]
 
     def send(
         self,
@@ -143,14 +248,54 @@ class Device(metaclass=DeviceGroupMeta):
         :param int retry_count: How many times to retry on error
         :param dict extra_parameters: Extra top-level parameters
         """
-        return self._protocol.send(
-            command, parameters, retry_count, extra_parameters=extra_parameters
-        )
+        cache = self._cache
+        if cache is None or cache.active:
+            return self._protocol.send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+
+        # requests outside of cached methods may change the state of the device
+        cache.invalidate()
+        try:
+            return self._protocol.send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+        finally:
+            cache.invalidate()
+
+    def enable_cache(self, ttls: Dict[str, float] = None) -> None:
+        """Enable caching the results of methods decorated with :func:`cached`.
+
+        :param dict ttls: Time to live in seconds per method name,
+            overriding the defaults of the decorated methods
+        """
+        self._cache = DeviceCache(ttls)
+
+    def disable_cache(self) -> None:
+        """Disable caching and drop all cached results."""
+        self._cache = None
+
+    def invalidate_cache(self, method: str = None) -> None:
+        """Drop the cached results of the given method, or of all methods."""
+        if self._cache is not None:
+            self._cache.invalidate(method)
 
     def send_handshake(self):
         """Send initial handshake to the device."""
         return self._protocol.send_handshake()
 
+    def close(self):
+        """Close the connection to the device.
+
+        The connection is reopened automatically on the next request."""
+        self._protocol.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @command(
         click.argument("command", type=str, required=True),
         click.argument("parameters", type=LiteralParamType(), required=False),
@@ -190,6 +335,20 @@ class Device(metaclass=DeviceGroupMeta):
         """Return the last used protocol sequence id."""
         return self._protocol.raw_id
 
+    @property
+    def health(self) -> Optional[Dict[str, Any]]:
+        """Return the health state of the device as tracked by its circuit breaker.
+
+        Returns None if the circuit breaker of the protocol is disabled."""
+        if self._protocol.circuit_breaker is None:
+            return None
+        return self._protocol.circuit_breaker.as_dict()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the numbers of requests, retries, timeouts and handshakes."""
+        return dict(getattr(self._protocol, "stats", {}))
+
     def update(self, url: str, md5: str):
         """Start an OTA update."""
         payload = {
@@ -218,7 +377,12 @@ class Device(metaclass=DeviceGroupMeta):
         return self.send("miIO.config_router", params)[0]
 
     def get_properties(
-        self, properties, *, property_getter="get_prop", max_properties=None
+        self,
+        properties,
+        *,
+        property_getter="get_prop",
+        max_properties=None,
+        max_in_flight=1
     ):
         """Request properties in slices based on given max_properties.
 
@@ -226,28 +390,291 @@ class Device(metaclass=DeviceGroupMeta):
         properties can be queried at once.
 
         If `max_properties` is None, all properties are requested at once.
+        If `max_in_flight` is larger than one, the requests for the slices are
+        pipelined, see :func:`MiIOProtocol.send_many`.
+
+        If :attr:`probe_max_properties` is set, `max_properties` is replaced by
+        the number of properties the device has been found to accept.
 
         :param list properties: List of properties to query from the device.
         :param int max_properties: Number of properties that can be requested at once.
+        :param int max_in_flight: Number of requests awaiting a response at once.
         :return List of property values.
         """
-        _props = properties.copy()
         values = []
-        while _props:
-            values.extend(self.send(property_getter, _props[:max_properties]))
-            if max_properties is None:
-                break
-
-            _props[:] = _props[max_properties:]
-
-        properties_count = len(properties)
-        values_count = len(values)
-        if properties_count != values_count:
-            _LOGGER.debug(
-                "Count (%s) of requested properties does not match the "
-                "count (%s) of received values.",
-                properties_count,
-                values_count,
+        if self.probe_max_properties and max_properties is not None:
+            values, max_properties = self._probe_max_properties(
+                properties, property_getter, max_properties
+            )
+
+        slices = _slice_properties(properties[len(values) :], max_properties)
+
+        if max_in_flight > 1 and len(slices) > 1:
+            responses = self._protocol.send_many(
+                property_getter, slices, max_in_flight=max_in_flight
+            )
+        else:
+            responses = [self.send(property_getter, props) for props in slices]
+
+        for response in responses:
+            values.extend(response)
+
+        _check_values_count(properties, values)
+        return values
+
+    def _probe_max_properties(
+        self, properties: List, property_getter: str, max_properties: int
+    ) -> Tuple[List, int]:
+        """Find the number of properties the device accepts in a single request.
+
+        Requests for all given properties are halved until the device responds
+        with a value for each of them. Errors and truncated responses count as
+        rejections, while the probing is skipped if the device does not respond.
+        The result is stored in :attr:`max_properties_table`.
+
+        :return: Values of the accepted request for the first properties,
+            and the number of properties to request at once.
+        """
+        try:
+            if self._info is None:
+                self._info = self.info()
+            model, fw_ver = self._info.model, self._info.firmware_version
+        except (DeviceException, KeyError) as ex:
+            _LOGGER.debug("Unable to probe the number of properties: %s", ex)
+            return [], max_properties
+        if model is None or fw_ver is None:
+            _LOGGER.debug("Unable to probe the number of properties of unknown models")
+            return [], max_properties
+
+        accepted, limited = self.max_properties_table.get(model, fw_ver) or (0, False)
+        if accepted and (limited or len(properties) <= accepted):
+            return [], accepted
+
+        size = len(properties)
+        while size > accepted:
+            try:
+                values = self.send(property_getter, properties[:size])
+            except DeviceUnavailableException:
+                raise
+            except DeviceException as ex:
+                if isinstance(ex.__cause__, (OSError, asyncio.TimeoutError)):
+                    _LOGGER.debug("Skipping the probe for %s properties: %s", size, ex)
+                    return [], max_properties
+                _LOGGER.debug("Request for %s properties failed: %s", size, ex)
+            else:
+                if len(values) == size:
+                    _LOGGER.debug("%s %s accepts %s properties", model, fw_ver, size)
+                    limited = size < len(properties)
+                    self.max_properties_table.set(model, fw_ver, size, limited)
+                    return values, size
+
+                _LOGGER.debug("Got %s values for %s properties", len(values), size)
+
+            size //= 2
+
+        if accepted:
+            self.max_properties_table.set(model, fw_ver, accepted, True)
+            return [], accepted
+
+        return [], max_properties
+
+
+class _ProtocolBridge:
+    """Blocking protocol interface on top of :class:`AsyncMiIOProtocol`.
+
+    Used by the device methods executed by :class:`AsyncDevice` in worker threads,
+    the requests themselves are performed on the event loop."""
+
+    def __init__(
+        self, protocol: AsyncMiIOProtocol, loop: asyncio.AbstractEventLoop
+    ) -> None:
+        self._protocol = protocol
+        self._loop = loop
+
+    def _run(self, coro) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def send(self, *args, **kwargs) -> Any:
+        return self._run(self._protocol.send(*args, **kwargs))
+
+    def send_many(self, *args, **kwargs) -> List[Any]:
+        return self._run(self._protocol.send_many(*args, **kwargs))
+
+    def send_handshake(self, *args, **kwargs) -> Any:
+        return self._run(self._protocol.send_handshake(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._protocol, name)
+
+
+class AsyncDevice:
+    """Awaitable interface for a device instance.
+
+    All methods of the wrapped device are exposed as coroutines, which perform
+    the communication using :class:`AsyncMiIOProtocol`:
+
+    .. code-block::
+        purifier = AsyncDevice(AirPurifier(ip, token))
+        status = await purifier.status()
+
+    :func:`send`, :func:`send_handshake`, :func:`raw_command`, :func:`info` and
+    :func:`get_properties` are native coroutines, so any number of them can be
+    awaited concurrently on a single event loop.
+
+    The other device methods, e.g. `status()`, are executed in a worker thread
+    on a shallow copy of the wrapped device, which sends its requests through
+    the asyncio protocol. Each of them occupies a thread of the executor until
+    it returns, so the executor limits the number of such calls awaited
+    concurrently. For polling many devices, pass an executor sized for
+    the number of devices, or share one between the devices.
+    The wrapped device itself is left unchanged.
+
+    All calls must be awaited on the same event loop.
+    """
+
+    def __init__(self, device: Device, executor: Executor = None) -> None:
+        """
+        :param device: Device to wrap
+        :param executor: Executor for the methods of the device which are not
+            native coroutines, defaults to the default executor of the event loop
+        """
+        protocol = device._protocol
+        self.device = device
+        self.executor = executor
+        self._protocol = AsyncMiIOProtocol(
+            device.ip,
+            device.token,
+            start_id=protocol.raw_id,
+            debug=protocol.debug,
+            lazy_discover=protocol.lazy_discover,
+            codec=protocol.codec,
+        )
+        self._protocol.port = protocol.port
+        self._protocol.quirks = protocol.quirks
+        self._protocol.handshake_cache = protocol.handshake_cache
+        self._device = None  # type: Optional[Device]
+
+    def _bridged_device(self) -> Device:
+        """Return the copy of the device using the asyncio protocol."""
+        if self._device is None:
+            self._device = copy.copy(self.device)
+            self._device._protocol = _ProtocolBridge(  # type: ignore
+                self._protocol, asyncio.get_event_loop()
+            )
+
+        return self._device
+
+    def _overridden(self, name: str) -> bool:
+        """Return True if the device class overrides the given method of Device."""
+        return getattr(type(self.device), name) is not getattr(Device, name)
+
+    async def _run_in_executor(self, name: str, *args, **kwargs) -> Any:
+        method = getattr(self._bridged_device(), name)
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, partial(method, *args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self.device, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        async def _call(*args, **kwargs):
+            return await self._run_in_executor(name, *args, **kwargs)
+
+        return _call
+
+    async def send(
+        self,
+        command: str,
+        parameters: Any = None,
+        retry_count=3,
+        *,
+        extra_parameters=None
+    ) -> Any:
+        """Send a command to the device, see :func:`Device.send`."""
+        if self._overridden("send"):
+            return await self._run_in_executor(
+                "send",
+                command,
+                parameters,
+                retry_count,
+                extra_parameters=extra_parameters,
+            )
+
+        cache = self.device._cache
+        if cache is not None:
+            cache.invalidate()
+        try:
+            return await self._protocol.send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+        finally:
+            if cache is not None:
+                cache.invalidate()
+
+    async def send_handshake(self):
+        """Send initial handshake to the device."""
+        return await self._protocol.send_handshake()
+
+    async def raw_command(self, command, parameters):
+        """Send a raw command to the device, see :func:`Device.raw_command`."""
+        if self._overridden("raw_command"):
+            return await self._run_in_executor("raw_command", command, parameters)
+        return await self.send(command, parameters)
+
+    async def info(self) -> DeviceInfo:
+        """Get miIO protocol information from the device, see :func:`Device.info`."""
+        if self._overridden("info"):
+            return await self._run_in_executor("info")
+        try:
+            return DeviceInfo(await self.send("miIO.info"))
+        except PayloadDecodeException as ex:
+            raise DeviceInfoUnavailableException(
+                "Unable to request miIO.info from the device"
+            ) from ex
+
+    async def get_properties(
+        self,
+        properties,
+        *,
+        property_getter="get_prop",
+        max_properties=None,
+        max_in_flight=1
+    ):
+        """Request properties in slices, see :func:`Device.get_properties`.
+
+        Probing the number of accepted properties is done in the executor."""
+        if self._overridden("get_properties") or (
+            self.device.probe_max_properties and max_properties is not None
+        ):
+            return await self._run_in_executor(
+                "get_properties",
+                properties,
+                property_getter=property_getter,
+                max_properties=max_properties,
+                max_in_flight=max_in_flight,
+            )
+
+        slices = _slice_properties(properties, max_properties)
+        if max_in_flight > 1 and len(slices) > 1:
+            responses = await self._protocol.send_many(
+                property_getter, slices, max_in_flight=max_in_flight
             )
+        else:
+            responses = [await self.send(property_getter, props) for props in slices]
 
+        values = [value for response in responses for value in response]
+        _check_values_count(properties, values)
         return values
+
+    def close(self) -> None:
+        """Close the connection to the device."""
+        self._protocol.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
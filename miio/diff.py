@@ -0,0 +1,175 @@
+"""Detection of changed status fields.
+
+The :class:`ChangeDetector` keeps the last reported values of the `data` dict
+wrapped by the status containers, and returns only the fields that changed
+since the previous update:
+
+.. code-block::
+    detector = ChangeDetector(deadbands={"aqi": 5, "temp_dec": 5})
+
+    def on_result(result):
+        if result.error is None:
+            for change in detector.update(result.device.ip, result.value):
+                publish(change.__json__())
+
+    poller = Poller(callback=on_result)
+
+Changes of noisy numeric fields can be suppressed with deadbands, which report
+a field only when it deviates by at least the given amount from the value
+reported last, or with arbitrary filters such as :func:`crossing`.
+The field names are the keys of the `data` dict, not the property names.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional  # noqa: F401
+
+_LOGGER = logging.getLogger(__name__)
+
+Filter = Callable[[Any, Any], bool]
+
+
+class Change:
+    """Change of a single status field.
+
+    :param key: Key of the device, as given to :func:`ChangeDetector.update`
+    :param field: Name of the changed field
+    :param old: Previously reported value, None for the first update
+    :param new: New value, None if the field is no longer reported
+    :param timestamp: Time of the update in seconds since the epoch
+    """
+
+    __slots__ = ("key", "field", "old", "new", "timestamp")
+
+    def __init__(
+        self, key: Hashable, field: str, old: Any, new: Any, timestamp: float
+    ) -> None:
+        self.key = key
+        self.field = field
+        self.old = old
+        self.new = new
+        self.timestamp = timestamp
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Change):
+            return NotImplemented
+        return all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "<Change %s %s: %r -> %r>" % (self.key, self.field, self.old, self.new)
+
+    def __json__(self):
+        return {
+            "field": self.field,
+            "old": self.old,
+            "new": self.new,
+            "timestamp": self.timestamp,
+        }
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def deadband(width: float) -> Filter:
+    """Report a numeric field only if it changes by at least `width`."""
+
+    def _filter(old, new):
+        if _is_number(old) and _is_number(new):
+            return abs(new - old) >= width
+        return old != new
+
+    return _filter
+
+
+def crossing(*levels: float) -> Filter:
+    """Report a numeric field only if it crosses one of the given levels.
+
+    .. code-block::
+        # report aqi changes between the good, moderate and unhealthy ranges
+        ChangeDetector(filters={"aqi": crossing(50, 100)})
+    """
+
+    def _filter(old, new):
+        if _is_number(old) and _is_number(new):
+            return any((old < level) != (new < level) for level in levels)
+        return old != new
+
+    return _filter
+
+
+class ChangeDetector:
+    """Report the changed fields of status containers per device.
+
+    :param deadbands: Minimum change per numeric field to be reported
+    :param filters: Callables per field deciding whether a change from the
+        reported to the new value is reported, overriding the deadbands
+    """
+
+    def __init__(
+        self,
+        deadbands: Dict[str, float] = None,
+        filters: Dict[str, Filter] = None,
+    ) -> None:
+        self.filters = {field: deadband(w) for field, w in (deadbands or {}).items()}
+        self.filters.update(filters or {})
+        self._snapshots = {}  # type: Dict[Hashable, Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def update(
+        self, key: Hashable, status: Any, timestamp: float = None
+    ) -> List[Change]:
+        """Store the status of the device and return the changed fields.
+
+        All fields are reported on the first update of a device.
+
+        :param key: Key identifying the device, e.g., its IP address
+        :param status: Status container with a `data` dict, or a dict
+        :param timestamp: Time of the status, defaults to the current time
+        """
+        data = getattr(status, "data", status)
+        if not isinstance(data, dict):
+            raise TypeError("Status %r has no data dict" % type(status).__name__)
+        if timestamp is None:
+            timestamp = time.time()
+
+        changes = []
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                self._snapshots[key] = dict(data)
+                return [
+                    Change(key, field, None, value, timestamp)
+                    for field, value in data.items()
+                ]
+
+            removed = [field for field in snapshot if field not in data]
+            for field in list(data) + removed:
+                old = snapshot.get(field)
+                new = data.get(field)
+                if old == new:
+                    continue
+                check = self.filters.get(field)
+                if check is not None and not check(old, new):
+                    continue
+                # suppressed changes are compared against the reported value,
+                # so that slow drifts are reported eventually
+                snapshot[field] = new
+                changes.append(Change(key, field, old, new, timestamp))
+
+        _LOGGER.debug("%s changed fields of %s", len(changes), key)
+        return changes
+
+    def snapshot(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Return the last reported values of the device."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            return dict(snapshot) if snapshot is not None else None
+
+    def reset(self, key: Hashable = None) -> None:
+        """Forget the reported values of the device, or of all devices."""
+        with self._lock:
+            if key is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(key, None)
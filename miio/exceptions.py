@@ -18,6 +18,14 @@ class DeviceInfoUnavailableException(DeviceException):
     """
 
 
+class DeviceUnavailableException(DeviceException):
+    """Exception raised when a device is known to be unreachable.
+
+    Requests to a device fail fast with this exception after repeated failures,
+    until a probe shows that the device has recovered.
+    """
+
+
 class DeviceError(DeviceException):
     """Exception communicating an error delivered by the target device.
 
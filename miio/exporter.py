@@ -0,0 +1,294 @@
+"""Export polled device statuses in the OpenMetrics text format.
+
+:class:`MetricsExporter` renders the numeric and boolean properties of the
+status containers reported to it, together with the protocol counters of
+the devices. The properties are named after the container class, e.g.,
+`miio_air_purifier_aqi` for :attr:`AirPurifierStatus.aqi`, and labelled with
+the model, the IP address and the id of the device:
+
+.. code-block::
+    exporter = MetricsExporter()
+    poller = Poller(callback=exporter.poll_callback)
+    poller.add(purifier, interval=30)
+    poller.start()
+    start_http_server(exporter, port=9100)
+
+The metrics of a device are rendered when its status is reported, and the
+response is cached until the next report, so scrapes never cause requests
+to the devices. The `miiocli exporter` command runs the above for the devices
+given on the command line.
+"""
+import binascii
+import datetime
+import enum
+import inspect
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
+
+import click
+
+from .click_common import get_device_class, validate_ip, validate_token
+from .device import Device
+from .poller import Poller, PollResult
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# protocol counters with their descriptions
+PROTOCOL_COUNTERS = {
+    "requests": "Requests sent to the device",
+    "retries": "Retried requests and handshakes",
+    "timeouts": "Requests and handshakes without a response in time",
+    "handshakes": "Successful handshakes",
+}
+
+# names of the numeric properties per status class
+_properties = {}  # type: Dict[type, List[Tuple[str, str]]]
+
+
+def _snake_case(name: str) -> str:
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).lower()
+
+
+def _class_prefix(cls: type) -> str:
+    name = cls.__name__
+    if name.endswith("Status") and name != "Status":
+        name = name[: -len("Status")]
+    return _snake_case(name)
+
+
+def _status_properties(cls: type) -> List[Tuple[str, str]]:
+    """Return the names and the first docstring lines of the properties."""
+    properties = _properties.get(cls)
+    if properties is None:
+        properties = []
+        for name, member in inspect.getmembers(cls, inspect.isdatadescriptor):
+            if name.startswith("_") or not isinstance(member, property):
+                continue
+            doc = (member.__doc__ or "").strip().split("\n")[0]
+            properties.append((name, doc))
+        _properties[cls] = properties
+    return properties
+
+
+def _sample_value(value: Any) -> Optional[str]:
+    """Format the value of a sample, or return None if it is not numeric."""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, enum.Enum):
+        return None
+    if isinstance(value, datetime.timedelta):
+        value = value.total_seconds()
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(device: Device) -> str:
+    info = getattr(device, "_info", None)
+    model = getattr(device, "model", None) or (info.model if info else None)
+    device_id = getattr(getattr(device, "_protocol", None), "_device_id", None)
+    labels = {
+        "model": model or "",
+        "ip": device.ip or "",
+        "device_id": str(int(binascii.hexlify(device_id), 16)) if device_id else "",
+    }
+    return ",".join('%s="%s"' % (k, _escape(v)) for k, v in labels.items())
+
+
+class MetricsExporter:
+    """Render the latest reported statuses of devices as OpenMetrics.
+
+    :param namespace: Prefix of the metric names
+    """
+
+    def __init__(self, namespace: str = "miio") -> None:
+        self.namespace = namespace
+        # metric family name -> (type, help)
+        self._families = {}  # type: Dict[str, Tuple[str, str]]
+        # device -> metric family name -> sample lines
+        self._samples = {}  # type: Dict[int, Dict[str, List[str]]]
+        self._rendered = None  # type: Optional[bytes]
+        self._lock = threading.Lock()
+
+    def update(self, device: Device, status: Any = None) -> None:
+        """Render the metrics of the device.
+
+        :param device: Device the status belongs to
+        :param status: Status container, None if the device did not respond
+        """
+        # (name, type, help, suffix, value) of the samples
+        metrics = [("up", "gauge", "Whether the last poll succeeded", "", "0")]
+        if status is not None:
+            metrics = [
+                ("up", "gauge", "Whether the last poll succeeded", "", "1"),
+                (
+                    "last_poll_timestamp_seconds",
+                    "gauge",
+                    "Time of the last successful poll",
+                    "",
+                    repr(time.time()),
+                ),
+            ]
+
+        stats = device.stats
+        for counter, help_ in PROTOCOL_COUNTERS.items():
+            value = str(stats.get(counter, 0))
+            metrics.append(("protocol_%s" % counter, "counter", help_, "_total", value))
+
+        getter = None  # type: Any
+        if isinstance(status, dict):
+            prefix = _class_prefix(type(device))
+            properties = [(key, "") for key in status]
+            getter = status.get
+        elif status is not None:
+            prefix = _class_prefix(type(status))
+            properties = _status_properties(type(status))
+            getter = lambda name: getattr(status, name)  # noqa: E731
+        else:
+            properties = []
+
+        for name, doc in properties:
+            try:
+                sample = _sample_value(getter(name))
+            except Exception as ex:
+                _LOGGER.debug("Unable to read %s of %s: %s", name, device.ip, ex)
+                continue
+            if sample is not None:
+                metrics.append(("%s_%s" % (prefix, name), "gauge", doc, "", sample))
+
+        labels = _labels(device)
+        with self._lock:
+            samples = {}  # type: Dict[str, List[str]]
+            for name, type_, help_, suffix, value in metrics:
+                family = "%s_%s" % (self.namespace, name)
+                self._families.setdefault(family, (type_, help_))
+                samples[family] = ["%s%s{%s} %s" % (family, suffix, labels, value)]
+
+            self._samples[id(device)] = samples
+            self._rendered = None
+
+    def remove(self, device: Device) -> None:
+        """Drop the metrics of the device."""
+        with self._lock:
+            if self._samples.pop(id(device), None) is not None:
+                self._rendered = None
+
+    def poll_callback(self, result: PollResult) -> None:
+        """Update the metrics from a :class:`miio.poller.Poller` result."""
+        self.update(result.device, result.value if result.error is None else None)
+
+    def render(self) -> bytes:
+        """Return the metrics of all devices in the OpenMetrics text format."""
+        with self._lock:
+            if self._rendered is None:
+                lines = []
+                for family in sorted(self._families):
+                    samples = [
+                        line
+                        for device in self._samples.values()
+                        for line in device.get(family, ())
+                    ]
+                    if not samples:
+                        continue
+                    type_, help_ = self._families[family]
+                    if help_:
+                        lines.append("# HELP %s %s" % (family, _escape(help_)))
+                    lines.append("# TYPE %s %s" % (family, type_))
+                    lines.extend(samples)
+                lines.append("# EOF\n")
+                self._rendered = "\n".join(lines).encode()
+            return self._rendered
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """HTTP server serving the metrics of an exporter."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], exporter: MetricsExporter) -> None:
+        super().__init__(address, _MetricsHandler)
+        self.exporter = exporter
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _LOGGER.debug("%s %s", self.address_string(), format % args)
+
+
+def start_http_server(
+    exporter: MetricsExporter, port: int = 9100, host: str = ""
+) -> MetricsServer:
+    """Serve the metrics on /metrics in a background thread.
+
+    :return: The server, call its `shutdown()` to stop it
+    """
+    server = MetricsServer((host, port), exporter)
+    thread = threading.Thread(
+        target=server.serve_forever, name="miio-exporter", daemon=True
+    )
+    thread.start()
+    _LOGGER.info("Serving metrics on %s:%s", host or "0.0.0.0", server.server_port)
+    return server
+
+
+@click.command()
+@click.option(
+    "--device",
+    "devices",
+    type=(str, str, str),
+    multiple=True,
+    required=True,
+    metavar="CLASS IP TOKEN",
+    help="Device to poll, e.g., airpurifier 192.168.1.2 <token>",
+)
+@click.option("--port", default=9100, help="Port to serve the metrics on")
+@click.option("--host", default="", help="Address to serve the metrics on")
+@click.option("--interval", default=30.0, help="Polling interval in seconds")
+def exporter(devices, port: int, host: str, interval: float):
+    """Serve the statuses of the given devices in the OpenMetrics format."""
+    metrics = MetricsExporter()
+    poller = Poller(callback=metrics.poll_callback)
+    for name, ip, token in devices:
+        device = get_device_class(name)(
+            validate_ip(None, None, ip), validate_token(None, None, token)
+        )
+        poller.add(device, interval)
+
+    server = start_http_server(metrics, port, host)
+    try:
+        with poller:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
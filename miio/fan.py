@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -406,6 +407,7 @@ class Fan(Device):
             "Angle: {result.angle}\n",
         )
     )
+    @cached()
     def status(self) -> FanStatus:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model]
@@ -645,6 +647,7 @@ class FanP5(Device):
             "Power-off time: {result.delay_off_countdown}\n",
         )
     )
+    @cached()
     def status(self) -> FanStatusP5:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model]
@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -184,6 +185,7 @@ class Heater(Device):
             "Power-off time: {result.delay_off_countdown}\n",
         )
     )
+    @cached()
     def status(self) -> HeaterStatus:
         """Retrieve properties."""
         properties = SUPPORTED_MODELS[self.model]["available_properties"]
@@ -0,0 +1,411 @@
+"""Instrumentation of the protocol for finding out where the time goes.
+
+An :class:`Instrument` attached to the protocol is called at the following
+points of the communication with the devices:
+
+* before and after a handshake,
+* when a request is sent and its response received,
+* when a response has been decoded,
+* before a request or a handshake is retried,
+* when a request or a handshake fails.
+
+The :class:`Collector` keeps latency histograms, byte counters and the numbers
+of retries and errors in memory, per device and per method:
+
+.. code-block::
+    collector = Collector()
+    attach(collector)  # all devices, or attach(collector, device)
+    ...
+    print(collector.stats(method="get_prop").latency.percentile(0.99))
+    print(collector.format())
+
+Without an attached instrument, the protocol only checks the attribute
+for None at these points.
+"""
+
+import bisect
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
+
+# method name used for handshakes
+HANDSHAKE = "handshake"
+
+# upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Instrument:
+    """Base class of instruments, all hooks do nothing by default.
+
+    The hooks are called with the :class:`miio.miioprotocol.MiIOProtocol`
+    instance communicating with the device. They may be called from multiple
+    threads, and must not raise exceptions.
+    """
+
+    def handshake_start(self, protocol) -> None:
+        """Called before a hello is sent to the device."""
+
+    def handshake_end(
+        self, protocol, duration: float, error: Optional[Exception]
+    ) -> None:
+        """Called after the response to a hello, or if it was not received."""
+
+    def send(self, protocol, method: str, size: int) -> None:
+        """Called before a request of `size` bytes is sent."""
+
+    def receive(self, protocol, method: str, size: int, duration: float) -> None:
+        """Called after the response to a request was received and decoded.
+
+        :param duration: Seconds from sending the request to the response
+        """
+
+    def decode(self, protocol, size: int, duration: float) -> None:
+        """Called after a message of `size` bytes was decrypted and parsed."""
+
+    def retry(
+        self, protocol, method: Optional[str], attempt: int, error: Optional[Exception]
+    ) -> None:
+        """Called before a request is retried, the method is None for handshakes.
+
+        :param error: Error of the failed attempt, None for handshake timeouts
+        """
+
+    def error(self, protocol, method: Optional[str], error: Exception) -> None:
+        """Called when a request fails, the method is None for handshakes."""
+
+
+class Histogram:
+    """Histogram of values counted in buckets with fixed upper bounds."""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.bounds = bounds
+        # the last bucket counts the values above the largest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None  # type: Optional[float]
+        self.max = None  # type: Optional[float]
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the values of another histogram with the same bounds."""
+        if other.bounds != self.bounds:
+            raise ValueError("Unable to merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the upper bound of the bucket containing the given quantile.
+
+        The result is limited to the largest value, so that it is exact for
+        values above the largest bound.
+
+        :param q: Quantile between 0 and 1
+        """
+        maximum = self.max
+        if not self.count or maximum is None:
+            return None
+
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= rank and count:
+                return min(bound, maximum)
+        return maximum
+
+    def __repr__(self) -> str:
+        return "<Histogram count=%s mean=%s max=%s>" % (self.count, self.mean, self.max)
+
+    def __json__(self):
+        return OrderedDict(
+            [
+                ("count", self.count),
+                ("sum", self.sum),
+                ("min", self.min),
+                ("max", self.max),
+                ("buckets", OrderedDict(zip(self.bounds, self.counts))),
+                ("overflow", self.counts[-1]),
+            ]
+        )
+
+
+class MethodStats:
+    """Counters and latency histogram of a method, or of an aggregate of methods."""
+
+    __slots__ = (
+        "requests",
+        "bytes_sent",
+        "bytes_received",
+        "retries",
+        "errors",
+        "error_types",
+        "latency",
+    )
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.errors = 0
+        self.error_types = Counter()  # type: Counter
+        self.latency = Histogram(bounds)
+
+    def merge(self, other: "MethodStats") -> None:
+        self.requests += other.requests
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.retries += other.retries
+        self.errors += other.errors
+        self.error_types.update(other.error_types)
+        self.latency.merge(other.latency)
+
+    def __repr__(self) -> str:
+        return (
+            "<MethodStats requests=%s retries=%s errors=%s "
+            "bytes_sent=%s bytes_received=%s latency=%r>"
+            % (
+                self.requests,
+                self.retries,
+                self.errors,
+                self.bytes_sent,
+                self.bytes_received,
+                self.latency,
+            )
+        )
+
+    def __json__(self):
+        return OrderedDict(
+            [
+                ("requests", self.requests),
+                ("bytes_sent", self.bytes_sent),
+                ("bytes_received", self.bytes_received),
+                ("retries", self.retries),
+                ("errors", self.errors),
+                ("error_types", dict(self.error_types)),
+                ("latency", self.latency.__json__()),
+            ]
+        )
+
+
+class Collector(Instrument):
+    """Instrument keeping the statistics per device and method in memory.
+
+    The devices are identified by their address and port. Handshakes are
+    counted as the method :data:`HANDSHAKE`, and the decoding times are kept
+    in a separate histogram per device.
+
+    :param buckets: Upper bounds of the latency buckets in seconds
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._methods = {}  # type: Dict[Tuple[str, str], MethodStats]
+        self._decode = {}  # type: Dict[str, Histogram]
+        self._lock = threading.Lock()
+
+    def _get(self, protocol, method: Optional[str]) -> MethodStats:
+        key = (protocol._handshake_key, method or HANDSHAKE)
+        stats = self._methods.get(key)
+        if stats is None:
+            stats = self._methods[key] = MethodStats(self.buckets)
+        return stats
+
+    def handshake_start(self, protocol) -> None:
+        with self._lock:
+            stats = self._get(protocol, None)
+            stats.requests += 1
+            stats.bytes_sent += 32
+
+    def handshake_end(
+        self, protocol, duration: float, error: Optional[Exception]
+    ) -> None:
+        if error is not None:
+            return
+        with self._lock:
+            stats = self._get(protocol, None)
+            stats.bytes_received += 32
+            stats.latency.add(duration)
+
+    def send(self, protocol, method: str, size: int) -> None:
+        with self._lock:
+            stats = self._get(protocol, method)
+            stats.requests += 1
+            stats.bytes_sent += size
+
+    def receive(self, protocol, method: str, size: int, duration: float) -> None:
+        with self._lock:
+            stats = self._get(protocol, method)
+            stats.bytes_received += size
+            stats.latency.add(duration)
+
+    def decode(self, protocol, size: int, duration: float) -> None:
+        key = protocol._handshake_key
+        with self._lock:
+            histogram = self._decode.get(key)
+            if histogram is None:
+                histogram = self._decode[key] = Histogram(self.buckets)
+            histogram.add(duration)
+
+    def retry(
+        self, protocol, method: Optional[str], attempt: int, error: Optional[Exception]
+    ) -> None:
+        with self._lock:
+            self._get(protocol, method).retries += 1
+
+    def error(self, protocol, method: Optional[str], error: Exception) -> None:
+        with self._lock:
+            stats = self._get(protocol, method)
+            stats.errors += 1
+            stats.error_types[type(error).__name__] += 1
+
+    def devices(self) -> List[str]:
+        """Return the addresses of the devices with collected statistics."""
+        with self._lock:
+            return sorted({device for device, _ in self._methods})
+
+    def methods(self, device: str = None) -> List[str]:
+        """Return the methods sent to the given device, or to any device."""
+        with self._lock:
+            return sorted({m for d, m in self._methods if device in (None, d)})
+
+    def stats(self, device: str = None, method: str = None) -> MethodStats:
+        """Return the statistics of a device and a method.
+
+        If the device or the method is not given, the statistics of all
+        devices or all methods are added up.
+        """
+        result = MethodStats(self.buckets)
+        with self._lock:
+            for (d, m), stats in self._methods.items():
+                if device in (None, d) and method in (None, m):
+                    result.merge(stats)
+        return result
+
+    def decode_latency(self, device: str = None) -> Histogram:
+        """Return the histogram of the decoding times of a device, or of all."""
+        result = Histogram(self.buckets)
+        with self._lock:
+            for d, histogram in self._decode.items():
+                if device in (None, d):
+                    result.merge(histogram)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._methods.clear()
+            self._decode.clear()
+
+    def __json__(self):
+        devices = OrderedDict()  # type: Dict[str, Any]
+        for device in self.devices():
+            devices[device] = OrderedDict(
+                [
+                    (
+                        "methods",
+                        OrderedDict(
+                            (method, self.stats(device, method).__json__())
+                            for method in self.methods(device)
+                        ),
+                    ),
+                    ("decode", self.decode_latency(device).__json__()),
+                ]
+            )
+        return devices
+
+    def format(self) -> str:
+        """Return a table of the statistics per device and method."""
+
+        def _ms(value: Optional[float]) -> str:
+            return "-" if value is None else "%.1f" % (value * 1000)
+
+        columns = "%-21s %-24s %8s %7s %6s %9s %9s %8s %8s %8s %8s"
+        lines = [
+            columns
+            % (
+                "device",
+                "method",
+                "requests",
+                "retries",
+                "errors",
+                "sent",
+                "received",
+                "p50 ms",
+                "p90 ms",
+                "p99 ms",
+                "max ms",
+            )
+        ]
+        for device in self.devices():
+            for method in self.methods(device):
+                stats = self.stats(device, method)
+                latency = stats.latency
+                lines.append(
+                    columns
+                    % (
+                        device,
+                        method,
+                        stats.requests,
+                        stats.retries,
+                        stats.errors,
+                        stats.bytes_sent,
+                        stats.bytes_received,
+                        _ms(latency.percentile(0.5)),
+                        _ms(latency.percentile(0.9)),
+                        _ms(latency.percentile(0.99)),
+                        _ms(latency.max),
+                    )
+                )
+        return "\n".join(lines)
+
+
+def attach(instrument: Optional[Instrument], device=None) -> None:
+    """Attach the instrument to the given device, or to all devices.
+
+    The instrument of a device takes precedence over the one attached
+    to all devices. None detaches the instrument.
+    """
+    if device is None:
+        from .miioprotocol import _BaseMiIOProtocol
+
+        _BaseMiIOProtocol.instrument = instrument
+    elif instrument is None:
+        vars(device._protocol).pop("instrument", None)
+    else:
+        device._protocol.instrument = instrument
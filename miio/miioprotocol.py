@@ -3,22 +3,308 @@
 This module contains the implementation of routines to send handshakes, send
 commands and discover devices (MiIOProtocol).
 """
+import asyncio
 import binascii
+import calendar
 import codecs
 import datetime
+import enum
+import json
 import logging
+import os
+import random
 import socket
-from typing import Any, Dict, List
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, NoReturn, Optional, Tuple
 
 import construct
 
-from .exceptions import DeviceError, DeviceException, RecoverableError
+from .exceptions import (
+    DeviceError,
+    DeviceException,
+    DeviceUnavailableException,
+    RecoverableError,
+)
 from .protocol import Message
+from .utils import write_json
 
 _LOGGER = logging.getLogger(__name__)
 
+# magic, length 32
+HELLO_BYTES = bytes.fromhex(
+    "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
+)
+
+
+class HandshakeCache:
+    """Cache for the results of handshakes, shared between protocol instances.
+
+    For each device, the device id and the offset between the device clock
+    and the local monotonic clock are stored, which allows extrapolating
+    the device timestamp without sending a new hello.
+
+    If a path is given, the entries are also persisted to that file,
+    so that short-lived processes (like miiocli) can skip the handshake.
+    As the monotonic clock is not shared between processes, the offsets
+    are stored relative to the wall clock on disk.
+
+    .. code-block::
+        cache = HandshakeCache(os.path.join(user_cache_dir("python-miio"), "hs.json"))
+        dev._protocol.handshake_cache = cache
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self._entries = {}  # type: Dict[str, Tuple[bytes, float]]
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wall_offset() -> float:
+        """Return the offset between the wall clock and the monotonic clock."""
+        return time.time() - time.monotonic()
+
+    def _load(self) -> None:
+        self._loaded = True
+        if self.path is None or not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+            wall_offset = self._wall_offset()
+            for key, entry in stored.items():
+                self._entries.setdefault(
+                    key,
+                    (bytes.fromhex(entry["device_id"]), entry["offset"] - wall_offset),
+                )
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as ex:
+            _LOGGER.warning("Unable to read handshake cache %s: %s", self.path, ex)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+
+        wall_offset = self._wall_offset()
+        stored = {
+            key: {"device_id": device_id.hex(), "offset": offset + wall_offset}
+            for key, (device_id, offset) in self._entries.items()
+        }
+        write_json(self.path, stored)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Return the device id and the clock offset for the given device."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return self._entries.get(key)
+
+    def update(self, key: str, device_id: bytes, offset: float, persist=True) -> None:
+        """Store the device id and the clock offset for the given device.
+
+        :param persist: Write the entry to disk, if a path is set."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = (device_id, offset)
+            if persist:
+                self._save()
+
+    def invalidate(self, key: str) -> None:
+        """Remove the entry of the given device."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._loaded = True
+            self._entries.clear()
+            self._save()
+
+
+# shared by all protocol instances, set a path on it to persist the handshakes
+HANDSHAKE_CACHE = HandshakeCache()
+
+
+class RttEstimator:
+    """Smoothed round-trip time estimate of a device, as described in RFC 6298."""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self) -> None:
+        self.srtt = None  # type: Optional[float]
+        self.rttvar = None  # type: Optional[float]
+
+    def update(self, rtt: float) -> None:
+        """Add a measured round-trip time in seconds."""
+        srtt, rttvar = self.srtt, self.rttvar
+        if srtt is None or rttvar is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = rttvar + self.BETA * (abs(srtt - rtt) - rttvar)
+            self.srtt = srtt + self.ALPHA * (rtt - srtt)
+
+    def timeout(self, default: float) -> float:
+        """Return the retransmission timeout, or the default without measurements."""
+        srtt, rttvar = self.srtt, self.rttvar
+        if srtt is None or rttvar is None:
+            return default
+        return srtt + 4 * rttvar
+
+
+class RetryPolicy:
+    """Timeouts and delays for retrying requests.
+
+    All attempts of a request have to be done before the overall deadline,
+    which by default leaves room for `retry_count` retries using the full
+    timeout of the protocol.
+    The timeout of the first attempt is derived from the round-trip times
+    measured for the device and doubled for each retry, bound by
+    `min_timeout` and the timeout of the protocol. Until the first round-trip
+    time has been measured, the timeout of the protocol is used.
+    Retries are delayed using exponential backoff with full jitter.
+
+    :param deadline: Time in seconds for all attempts of a request,
+        None to derive it from the timeout of the protocol and `retry_count`
+    :param initial_timeout: Timeout for devices without measured round-trip times,
+        None to use the timeout of the protocol
+    :param min_timeout: Lower bound for the timeout of an attempt
+    :param backoff: Base delay in seconds before a retry
+    :param max_backoff: Upper bound for the delay before a retry
+    """
+
+    def __init__(
+        self,
+        deadline: float = None,
+        initial_timeout: float = None,
+        min_timeout: float = 0.5,
+        backoff: float = 0.05,
+        max_backoff: float = 1.0,
+    ) -> None:
+        self.deadline = deadline
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def total_time(self, max_timeout: float, retry_count: int) -> float:
+        """Return the time in seconds for all attempts of a request."""
+        if self.deadline is not None:
+            return self.deadline
+        return max_timeout * (retry_count + 1) + self.max_backoff * retry_count
+
+    def timeout(self, rtt: RttEstimator, attempt: int, max_timeout: float) -> float:
+        """Return the timeout for the given attempt, starting from zero."""
+        initial_timeout = self.initial_timeout
+        if initial_timeout is None:
+            initial_timeout = max_timeout
+        timeout = rtt.timeout(initial_timeout) * 2 ** attempt
+        return min(max(timeout, self.min_timeout), max_timeout)
+
+    def delay(self, attempt: int) -> float:
+        """Return the delay before the given retry, starting from one."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitState(enum.Enum):
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half_open"
+
+
+class CircuitBreaker:
+    """Health state of a device.
+
+    While closed, requests are sent normally. After `failure_threshold`
+    consecutive failed requests the circuit opens and requests fail immediately
+    with :class:`DeviceUnavailableException`. After `reset_timeout` seconds the
+    circuit becomes half-open and a single hello is let through to probe the
+    device, closing the circuit on success and opening it again on failure.
+
+    The number of transitions between the states is counted in `transitions`,
+    keyed by the (old, new) state tuples.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.transitions = Counter()  # type: Counter
+        self._state = CircuitState.Closed
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            if (
+                self._state is CircuitState.Open
+                and time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                self._transition(CircuitState.HalfOpen)
+            return self._state
+
+    def _transition(self, state: CircuitState) -> None:
+        _LOGGER.debug("Circuit %s -> %s", self._state.value, state.value)
+        self.transitions[(self._state, state)] += 1
+        self._state = state
+        self._probing = False
+        if state is CircuitState.Open:
+            self._opened_at = time.monotonic()
+
+    def try_probe(self) -> bool:
+        """Return True if the caller is allowed to probe the half-open circuit."""
+        with self._lock:
+            if self._state is CircuitState.HalfOpen and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self._state is not CircuitState.Closed:
+                self._transition(CircuitState.Closed)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._state is CircuitState.HalfOpen or (
+                self._state is CircuitState.Closed
+                and self.failures >= self.failure_threshold
+            ):
+                self._transition(CircuitState.Open)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the state, consecutive failures and transition counts."""
+        state = self.state
+        with self._lock:
+            return {
+                "state": state.value,
+                "failures": self.failures,
+                "transitions": {
+                    "%s->%s" % (old.value, new.value): count
+                    for (old, new), count in self.transitions.items()
+                },
+            }
+
+
+class _BaseMiIOProtocol:
+    """State and message handling shared by :class:`MiIOProtocol`
+    and :class:`AsyncMiIOProtocol`, which implement the transport."""
+
+    # instrument notified about the communication, see miio.instrumentation
+    instrument = None  # type: Any
 
-class MiIOProtocol:
     def __init__(
         self,
         ip: str = None,
@@ -26,6 +312,8 @@ class MiIOProtocol:
         start_id: int = 0,
         debug: int = 0,
         lazy_discover: bool = True,
+        codec: Any = Message,
+        handshake_cache: HandshakeCache = None,
     ) -> None:
         """
         Create a :class:`Device` instance.
@@ -33,6 +321,21 @@ class MiIOProtocol:
         :param token: Token used for encryption
         :param start_id: Running message id sent to the device
         :param debug: Wanted debug level
+        :param codec: Codec for building and parsing messages,
+            :data:`Message` or :class:`miio.protocol.FastMessage`
+        :param handshake_cache: Cache for the results of handshakes,
+            defaults to the module-wide :data:`HANDSHAKE_CACHE`
+
+        The results of handshakes are stored in :attr:`handshake_cache`,
+        which can be set to None to disable caching them.
+        Failed requests are retried according to :attr:`retry_policy`,
+        with :attr:`_timeout` as the upper bound for a single attempt.
+        Requests to unreachable devices fail fast as tracked by
+        :attr:`circuit_breaker`, which can be set to None to disable it.
+        The numbers of requests, retries, timeouts and handshakes are
+        counted in :attr:`stats`. For more detailed statistics,
+        an :class:`miio.instrumentation.Instrument` can be set as
+        :attr:`instrument` of the instance or of the class.
         """
         self.ip = ip
         self.port = 54321
@@ -42,12 +345,380 @@ class MiIOProtocol:
             self.token = bytes.fromhex(token)
         self.debug = debug
         self.lazy_discover = lazy_discover
+        self.codec = codec
+        # names of the payload quirks to check for, None for all quirks,
+        # narrowed by the devices knowing their model, see Utils.quirks_for_model
+        self.quirks = None  # type: Optional[List[str]]
+        if handshake_cache is None:
+            handshake_cache = HANDSHAKE_CACHE
+        self.handshake_cache = handshake_cache  # type: Optional[HandshakeCache]
+        self.retry_policy = RetryPolicy()
+        self.rtt = RttEstimator()
+        self.circuit_breaker = CircuitBreaker()  # type: Optional[CircuitBreaker]
+        self.stats = Counter()  # type: Counter
 
-        self._timeout = 5
+        self._timeout = 5  # type: float
         self._discovered = False
-        self._device_ts = None  # type: datetime.datetime
+        self._device_ts = None  # type: Optional[datetime.datetime]
+        # device clock minus the local monotonic clock, in seconds
+        self._ts_offset = None  # type: Optional[float]
+        self._session_failed = False
         self.__id = start_id
-        self._device_id = None
+        self._id_lock = threading.Lock()
+        self._device_id = None  # type: Optional[bytes]
+
+    def _record_failure(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
+
+    def _check_circuit(self) -> bool:
+        """Check whether requests to the device are allowed.
+
+        :return: True if the device should be probed before sending the request.
+        :raises DeviceUnavailableException: if the device is known to be unreachable.
+        """
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return False
+
+        state = breaker.state
+        if state is CircuitState.Closed:
+            return False
+        if state is CircuitState.HalfOpen and breaker.try_probe():
+            return True
+
+        raise DeviceUnavailableException(
+            "Device %s is unavailable after %s failed requests"
+            % (self.ip, breaker.failures)
+        )
+
+    def _handle_probe(self, m: Optional[Message]) -> None:
+        """Close the circuit if the device responded to the probe."""
+        if m is None:
+            self._record_failure()
+            raise DeviceUnavailableException(
+                "Device %s did not respond to the probe" % self.ip
+            )
+
+        self._handle_handshake(m)
+
+    def _deadline(self, retry_count: int) -> float:
+        """Return the time by which all attempts of a request have to be done."""
+        return time.monotonic() + self.retry_policy.total_time(
+            self._timeout, retry_count
+        )
+
+    def _attempt_timeout(self, attempt: int, deadline: float) -> float:
+        """Return the timeout for the given attempt, bound by the deadline."""
+        timeout = self.retry_policy.timeout(self.rtt, attempt, self._timeout)
+        return max(min(timeout, deadline - time.monotonic()), 0)
+
+    def _retry_delay(
+        self, attempt: int, retry_count: int, deadline: float
+    ) -> Optional[float]:
+        """Return the delay before the given retry, or None if no retries are left."""
+        if attempt > retry_count:
+            return None
+
+        delay = self.retry_policy.delay(attempt)
+        min_timeout = min(self.retry_policy.min_timeout, self._timeout)
+        if time.monotonic() + delay + min_timeout > deadline:
+            _LOGGER.debug("%s:%s retry deadline exceeded", self.ip, self.port)
+            return None
+
+        return delay
+
+    def _handle_handshake(self, m: Optional[Message]) -> Message:
+        """Store the device id and timestamp from the handshake response."""
+        if m is None:
+            _LOGGER.debug("Unable to discover a device at address %s", self.ip)
+            raise DeviceException("Unable to discover the device %s" % self.ip)
+
+        header = m.header.value
+        device_id = header.device_id
+        self._device_id = device_id
+        offset = self._set_device_ts(header.ts)
+        self._discovered = True
+        self.stats["handshakes"] += 1
+        self._session_failed = False
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        if self.handshake_cache is not None:
+            self.handshake_cache.update(self._handshake_key, device_id, offset)
+
+        if self.debug > 1:
+            _LOGGER.debug(m)
+        _LOGGER.debug(
+            "Discovered %s with ts: %s, token: %s",
+            binascii.hexlify(device_id).decode(),
+            self._device_ts,
+            codecs.encode(m.checksum, "hex"),
+        )
+
+        return m
+
+    @property
+    def _handshake_key(self) -> str:
+        return "%s:%s" % (self.ip, self.port)
+
+    def _set_device_ts(self, ts: datetime.datetime) -> float:
+        """Store the device timestamp and return its offset to the monotonic clock."""
+        offset = calendar.timegm(ts.timetuple()) - time.monotonic()
+        self._device_ts = ts
+        self._ts_offset = offset
+        return offset
+
+    def _device_clock(self) -> datetime.datetime:
+        """Return the current device time extrapolated from the last timestamp."""
+        offset = self._ts_offset
+        if offset is None:
+            raise DeviceException("The device %s has not been discovered" % self.ip)
+        return datetime.datetime.utcfromtimestamp(time.monotonic() + offset)
+
+    def _restore_handshake(self) -> bool:
+        """Restore the device id and clock offset from the handshake cache.
+
+        :return: True if the handshake was found in the cache."""
+        if self.handshake_cache is None:
+            return False
+
+        entry = self.handshake_cache.get(self._handshake_key)
+        if entry is None:
+            return False
+
+        device_id, self._ts_offset = entry
+        self._device_id = device_id
+        self._device_ts = self._device_clock()
+        self._discovered = True
+        _LOGGER.debug(
+            "Using cached handshake for %s, device ts: %s",
+            binascii.hexlify(device_id).decode(),
+            self._device_ts,
+        )
+        return True
+
+    def _needs_handshake(self) -> bool:
+        if not self.lazy_discover:
+            return True
+        return not self._discovered and not self._restore_handshake()
+
+    def _build_request(
+        self, command: str, parameters: Any, extra_parameters: Dict = None
+    ) -> Tuple[Dict, bytes]:
+        """Create a request and return it together with the encrypted message."""
+        request = self._create_request(command, parameters, extra_parameters)
+        self.stats["requests"] += 1
+
+        send_ts = self._device_clock() + datetime.timedelta(seconds=1)
+        header = {
+            "length": 0,
+            "unknown": 0x00000000,
+            "device_id": self._device_id,
+            "ts": send_ts,
+        }
+
+        msg = {"data": {"value": request}, "header": {"value": header}, "checksum": 0}
+        m = self.codec.build(msg, token=self.token)
+        _LOGGER.debug("%s:%s >>: %s", self.ip, self.port, request)
+        if self.debug > 1:
+            _LOGGER.debug(
+                "send (timeout %s): %s",
+                self._timeout,
+                self.codec.parse(m, token=self.token),
+            )
+
+        return request, m
+
+    def _handle_response(self, m: Message) -> Any:
+        """Return the result of the given response.
+
+        :raises DeviceError: if the device responded with an error."""
+        header = m.header.value
+        payload = m.data.value
+
+        offset = self._set_device_ts(header.ts)
+        self._session_failed = False
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        if self.handshake_cache is not None and self._device_id is not None:
+            self.handshake_cache.update(
+                self._handshake_key, self._device_id, offset, persist=False
+            )
+
+        if self.debug > 1:
+            _LOGGER.debug("recv from %s: %s", self.ip, m)
+
+        _LOGGER.debug(
+            "%s:%s (ts: %s, id: %s) << %s",
+            self.ip,
+            self.port,
+            header.ts,
+            payload["id"],
+            payload,
+        )
+        if "error" in payload:
+            self._handle_error(payload["error"])
+
+        try:
+            return payload["result"]
+        except KeyError:
+            return payload
+
+    def _reset_session(self):
+        """Skip ahead in the sequence ids after a request has failed.
+
+        The handshake is kept on the first failure, as the request or its response
+        may simply have been lost, and is discarded when the next request fails too.
+        """
+        with self._id_lock:
+            self.__id += 100
+        if self._session_failed:
+            self._discovered = False
+            if self.handshake_cache is not None:
+                self.handshake_cache.invalidate(self._handshake_key)
+        self._session_failed = True
+
+    def _parse(self, data: bytes) -> Message:
+        """Parse the given response using the token and quirks of the device."""
+        instrument = self.instrument
+        if instrument is None:
+            return self.codec.parse(data, token=self.token, quirks=self.quirks)
+
+        start = time.perf_counter()
+        m = self.codec.parse(data, token=self.token, quirks=self.quirks)
+        instrument.decode(self, len(data), time.perf_counter() - start)
+        return m
+
+    def _instrument_error(self, method: Optional[str], error: Exception) -> None:
+        if self.instrument is not None:
+            self.instrument.error(self, method, error)
+
+    def _raise_invalid_token(self, method: str, error: Exception) -> NoReturn:
+        """Raise a DeviceException for a response with an invalid checksum."""
+        self._instrument_error(method, error)
+        raise DeviceException(
+            "Got checksum error which indicates use "
+            "of an invalid token. "
+            "Please check your token!"
+        ) from error
+
+    def _exchange_started(
+        self, instrument: Any, method: Optional[str], data: bytes
+    ) -> float:
+        """Notify the instrument about a hello or a request being sent.
+
+        The method is None for hellos.
+
+        :return: Start time of the exchange"""
+        if method is None:
+            instrument.handshake_start(self)
+        else:
+            instrument.send(self, method, len(data))
+        return time.monotonic()
+
+    def _exchange_finished(
+        self,
+        instrument: Any,
+        method: Optional[str],
+        start: float,
+        m: Optional[Message],
+        error: Exception = None,
+    ) -> None:
+        """Notify the instrument about the response to a hello or a request.
+
+        Failed requests are reported by the retry and error hooks."""
+        duration = time.monotonic() - start
+        if method is None:
+            instrument.handshake_end(self, duration, error)
+        elif m is not None:
+            instrument.receive(self, method, m.header.value.length, duration)
+
+    @property
+    def _id(self) -> int:
+        """Increment and return the sequence id."""
+        with self._id_lock:
+            self.__id += 1
+            if self.__id >= 9999:
+                self.__id = 1
+            return self.__id
+
+    @property
+    def raw_id(self):
+        return self.__id
+
+    def _handle_error(self, error):
+        """Raise exception based on the given error code."""
+        if "code" in error and error["code"] == -30001:
+            raise RecoverableError(error)
+        raise DeviceError(error)
+
+    def _create_request(
+        self, command: str, parameters: Any, extra_parameters: Dict = None
+    ):
+        """Create request payload."""
+        request = {"id": self._id, "method": command}
+
+        if parameters is not None:
+            request["params"] = parameters
+        else:
+            request["params"] = []
+
+        if extra_parameters is not None:
+            request = {**request, **extra_parameters}
+
+        return request
+
+
+class MiIOProtocol(_BaseMiIOProtocol):
+    """Blocking implementation of the miIO protocol.
+
+    An instance can be shared between threads, its requests are serialized,
+    as the responses are received from a single socket.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # held for a whole request, reentrant as send_many falls back to send
+        self._lock = threading.RLock()
+        self._socket = None  # type: Optional[socket.socket]
+        self.endpoint = None  # type: Optional[SharedEndpoint]
+
+    def _get_socket(self) -> socket.socket:
+        """Return the socket connected to the device, opening it if necessary."""
+        if self._socket is None:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                s.connect((self.ip, self.port))
+            except OSError:
+                s.close()
+                raise
+            self._socket = s
+
+        self._socket.settimeout(self._timeout)
+        return self._socket
+
+    def close(self) -> None:
+        """Close the socket used for communicating with the device.
+
+        A new socket is opened automatically on the next request."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _send_hello(self, timeout: float = None) -> Optional[Message]:
+        """Send a hello packet to the device and wait for its response.
+
+        :return: Parsed response, or None if the device did not respond in time.
+        :raises DeviceException: if the socket could not be used."""
+        try:
+            return self._exchange(HELLO_BYTES, None, timeout)
+        except socket.timeout:
+            self.stats["timeouts"] += 1
+            self.close()
+            return None
+        except OSError as ex:
+            self.close()
+            raise DeviceException("Unable to send hello to %s" % self.ip) from ex
 
     def send_handshake(self, *, retry_count=3) -> Message:
         """Send a handshake to the device.
@@ -60,33 +731,41 @@ class MiIOProtocol:
 
         :raises DeviceException: if the device could not be discovered after retries.
         """
-        try:
-            m = MiIOProtocol.discover(self.ip)
-        except DeviceException as ex:
-            if retry_count > 0:
-                return self.send_handshake(retry_count=retry_count - 1)
+        with self._lock:
+            deadline = self._deadline(retry_count)
+            attempt = 0
+            while True:
+                error = None
+                try:
+                    m = self._send_hello(self._attempt_timeout(attempt, deadline))
+                except DeviceException as ex:
+                    m, error = None, ex
 
-            raise ex
+                if m is not None:
+                    return self._handle_handshake(m)
 
-        if m is not None:
-            header = m.header.value
-            self._device_id = header.device_id
-            self._device_ts = header.ts
-            self._discovered = True
+                attempt += 1
+                delay = self._retry_delay(attempt, retry_count, deadline)
+                if delay is None:
+                    self._record_failure()
+                    self._instrument_error(None, error or socket.timeout("timed out"))
+                    if error is not None:
+                        raise error
+                    return self._handle_handshake(m)
 
-            if self.debug > 1:
-                _LOGGER.debug(m)
-            _LOGGER.debug(
-                "Discovered %s with ts: %s, token: %s",
-                binascii.hexlify(self._device_id).decode(),
-                self._device_ts,
-                codecs.encode(m.checksum, "hex"),
-            )
-        else:
-            _LOGGER.debug("Unable to discover a device at address %s", self.ip)
-            raise DeviceException("Unable to discover the device %s" % self.ip)
+                self.stats["retries"] += 1
+                if self.instrument is not None:
+                    self.instrument.retry(self, None, attempt, error)
+                time.sleep(delay)
 
-        return m
+    def _probe(self) -> None:
+        """Send a single hello to check whether the device has recovered."""
+        try:
+            m = self._send_hello(self._attempt_timeout(0, float("inf")))
+        except DeviceException:
+            m = None
+
+        self._handle_probe(m)
 
     @staticmethod
     def discover(addr: str = None) -> Any:
@@ -104,16 +783,11 @@ class MiIOProtocol:
             addr = "<broadcast>"
             is_broadcast = True
             _LOGGER.info("Sending discovery to %s with timeout of %ss..", addr, timeout)
-        # magic, length 32
-        helobytes = bytes.fromhex(
-            "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
-        )
-
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         s.settimeout(timeout)
         for _ in range(3):
-            s.sendto(helobytes, (addr, 54321))
+            s.sendto(HELLO_BYTES, (addr, 54321))
         while True:
             try:
                 data, addr = s.recvfrom(1024)
@@ -148,142 +822,734 @@ class MiIOProtocol:
     ) -> Any:
         """Build and send the given command.
         Note that this will implicitly call :func:`send_handshake` to do a handshake,
+        unless the handshake for the device is found in :attr:`handshake_cache`,
         and will re-try in case of errors while incrementing the `_id` by 100.
+        A new handshake is done only if the retried request fails as well.
+
+        The retries are limited by `retry_count` and the deadline of
+        :attr:`retry_policy`, see :class:`RetryPolicy`.
 
         :param str command: Command to send
         :param dict parameters: Parameters to send, or an empty list
         :param retry_count: How many times to retry in case of failure, how many handshakes to send
         :param dict extra_parameters: Extra top-level parameters
+        :raises DeviceUnavailableException: if the device is known to be unreachable.
         :raises DeviceException: if an error has occurred during communication."""
+        with self._lock:
+            if self._check_circuit():
+                self._probe()
 
-        if not self.lazy_discover or not self._discovered:
-            self.send_handshake()
+            deadline = self._deadline(retry_count)
+            attempt = 0
+            while True:
+                timeout = self._attempt_timeout(attempt, deadline)
+                try:
+                    if self._needs_handshake():
+                        self._handle_handshake(
+                            self._exchange(HELLO_BYTES, None, timeout)
+                        )
 
-        request = self._create_request(command, parameters, extra_parameters)
+                    request, m = self._build_request(
+                        command, parameters, extra_parameters
+                    )
+                    return self._handle_response(
+                        self._exchange(m, request["id"], timeout, command)
+                    )
+                except construct.core.ChecksumError as ex:
+                    self._raise_invalid_token(command, ex)
+                except OSError as ex:
+                    if isinstance(ex, socket.timeout):
+                        self.stats["timeouts"] += 1
+                    self.close()
+                    self._reset_session()
+                    error = ex  # type: Exception
+                    message = "No response from the device"
+                except RecoverableError as ex:
+                    error, message = ex, "Unable to recover failed command"
+                except DeviceException as ex:
+                    self._instrument_error(command, ex)
+                    raise
 
-        send_ts = self._device_ts + datetime.timedelta(seconds=1)
-        header = {
-            "length": 0,
-            "unknown": 0x00000000,
-            "device_id": self._device_id,
-            "ts": send_ts,
-        }
+                attempt += 1
+                delay = self._retry_delay(attempt, retry_count, deadline)
+                if delay is None:
+                    if not isinstance(error, DeviceError):
+                        self._record_failure()
+                    self._instrument_error(command, error)
+                    _LOGGER.error("Got error when receiving: %s", error)
+                    raise DeviceException(message) from error
 
-        msg = {"data": {"value": request}, "header": {"value": header}, "checksum": 0}
-        m = Message.build(msg, token=self.token)
-        _LOGGER.debug("%s:%s >>: %s", self.ip, self.port, request)
-        if self.debug > 1:
-            _LOGGER.debug(
-                "send (timeout %s): %s",
-                self._timeout,
-                Message.parse(m, token=self.token),
+                _LOGGER.debug(
+                    "Retrying after %r, retries left: %s",
+                    error,
+                    retry_count - attempt + 1,
+                )
+                self.stats["retries"] += 1
+                if self.instrument is not None:
+                    self.instrument.retry(self, command, attempt, error)
+                time.sleep(delay)
+
+    def send_many(
+        self,
+        command: str,
+        parameters: List[Any],
+        max_in_flight: int = 4,
+        retry_count: int = 3,
+    ) -> List[Any]:
+        """Send the given command once for each of the given parameters.
+
+        Up to `max_in_flight` requests are sent before waiting for the responses,
+        which are matched to the requests by their ids.
+        Requests left without a response are retried one by one using :func:`send`.
+
+        :param str command: Command to send
+        :param list parameters: Parameters for each of the requests
+        :param int max_in_flight: Maximum number of requests awaiting a response
+        :param retry_count: How many times to retry a request in case of failure
+        :return: Results in the order of the given parameters
+        :raises DeviceException: if an error has occurred during communication."""
+        with self._lock:
+            if max_in_flight <= 1 or len(parameters) <= 1 or self.endpoint is not None:
+                return [
+                    self.send(command, params, retry_count) for params in parameters
+                ]
+
+            if self._check_circuit():
+                self._probe()
+            if self._needs_handshake():
+                self.send_handshake()
+
+            results = [None] * len(parameters)  # type: List[Any]
+            done = set()
+            pending = {}  # type: Dict[int, Tuple[int, float]]
+            next_index = 0
+            try:
+                s = self._get_socket()
+                s.settimeout(self._attempt_timeout(0, float("inf")))
+                while next_index < len(parameters) or pending:
+                    while next_index < len(parameters) and len(pending) < max_in_flight:
+                        request, m = self._build_request(
+                            command, parameters[next_index]
+                        )
+                        if self.instrument is not None:
+                            self.instrument.send(self, command, len(m))
+                        s.send(m)
+                        pending[request["id"]] = (next_index, time.monotonic())
+                        next_index += 1
+
+                    data = s.recv(1024)
+                    if len(data) == 32:
+                        continue
+                    m = self._parse(data)
+                    payload = m.data.value
+                    if (
+                        not isinstance(payload, dict)
+                        or payload.get("id") not in pending
+                    ):
+                        _LOGGER.debug(
+                            "%s:%s ignoring unexpected response", self.ip, self.port
+                        )
+                        continue
+
+                    index, start = pending.pop(payload["id"])
+                    self.rtt.update(time.monotonic() - start)
+                    if self.instrument is not None:
+                        self.instrument.receive(
+                            self, command, len(data), time.monotonic() - start
+                        )
+                    try:
+                        results[index] = self._handle_response(m)
+                        done.add(index)
+                    except RecoverableError as ex:
+                        _LOGGER.debug(
+                            "Request %s failed, will be retried: %s", index, ex
+                        )
+            except construct.core.ChecksumError as ex:
+                self._raise_invalid_token(command, ex)
+            except OSError as ex:
+                if isinstance(ex, socket.timeout):
+                    self.stats["timeouts"] += 1
+                _LOGGER.debug("Retrying %s requests one by one: %s", len(pending), ex)
+                self.close()
+
+            for index, params in enumerate(parameters):
+                if index not in done:
+                    results[index] = self.send(command, params, retry_count)
+
+            return results
+
+    def _exchange(
+        self,
+        data: bytes,
+        request_id: Optional[int],
+        timeout: float = None,
+        method: Optional[str] = None,
+    ) -> Message:
+        """Send the given data and return the response to it.
+
+        The request id is None for hellos.
+        If the protocol is registered to a :class:`SharedEndpoint`,
+        its socket is used instead of the socket owned by this instance.
+        The round-trip time of the response is added to :attr:`rtt`.
+
+        :raises DeviceException: if the data could not be sent.
+        :raises OSError: if no response was received."""
+        instrument = self.instrument
+        if instrument is None:
+            return self._transfer(data, request_id, timeout)
+
+        if request_id is None:
+            method = None
+        start = self._exchange_started(instrument, method, data)
+        try:
+            m = self._transfer(data, request_id, timeout)
+        except Exception as ex:
+            self._exchange_finished(instrument, method, start, None, ex)
+            raise
+        self._exchange_finished(instrument, method, start, m)
+        return m
+
+    def _transfer(
+        self, data: bytes, request_id: Optional[int], timeout: float = None
+    ) -> Message:
+        """Send the given data and receive the response, see :func:`_exchange`."""
+        if timeout is None:
+            timeout = self._timeout
+        start = time.monotonic()
+
+        if self.endpoint is not None:
+            m = self.endpoint.exchange(self, data, request_id, timeout)
+        else:
+            try:
+                s = self._get_socket()
+                s.settimeout(timeout)
+                s.send(data)
+            except OSError as ex:
+                _LOGGER.error("failed to send msg: %s", ex)
+                self.close()
+                raise DeviceException from ex
+
+            m = self._receive(s, request_id)
+
+        self.rtt.update(time.monotonic() - start)
+        return m
+
+    def _receive(self, s: socket.socket, request_id: Optional[int]) -> Message:
+        """Receive the response for the given request id.
+
+        Late responses to earlier requests and hellos are skipped, as the socket
+        is kept open for the lifetime of the protocol instance."""
+        while True:
+            data = s.recv(1024)
+            if len(data) == 32:
+                if request_id is None:
+                    return self.codec.parse(data)
+                _LOGGER.debug("%s:%s ignoring late hello response", self.ip, self.port)
+                continue
+            if request_id is None:
+                _LOGGER.debug("%s:%s ignoring late response", self.ip, self.port)
+                continue
+
+            m = self._parse(data)
+            payload = m.data.value
+            if (
+                isinstance(payload, dict)
+                and payload.get("id", request_id) != request_id
+            ):
+                _LOGGER.debug(
+                    "%s:%s ignoring response with unexpected id %s (expected %s)",
+                    self.ip,
+                    self.port,
+                    payload["id"],
+                    request_id,
+                )
+                continue
+
+            return m
+
+
+class _AsyncDatagramProtocol(asyncio.DatagramProtocol):
+    """Forward datagrams received from a device to its protocol instance."""
+
+    def __init__(self, protocol: "AsyncMiIOProtocol") -> None:
+        self._protocol = protocol
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def datagram_received(self, data, addr):
+        self._protocol._datagram_received(data)
+
+    def error_received(self, exc):
+        if self._protocol._transport is self._transport:
+            self._protocol._fail_waiters(exc)
+
+    def connection_lost(self, exc):
+        if self._protocol._transport is self._transport:
+            self._protocol._connection_lost(exc)
+
+
+class AsyncMiIOProtocol(_BaseMiIOProtocol):
+    """asyncio implementation of :class:`MiIOProtocol`.
+
+    The handshake, retry and error handling semantics are the same as for
+    :class:`MiIOProtocol`, but :func:`send` and :func:`send_handshake`
+    are coroutines and do not block the event loop.
+    Responses are matched to requests by their ids, so multiple requests can
+    be awaited concurrently on a single instance. Concurrent requests needing
+    a handshake await the response to a single hello.
+    """
+
+    _HELLO = "hello"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._transport = None  # type: Optional[asyncio.DatagramTransport]
+        self._transport_lock = None  # type: Optional[asyncio.Lock]
+        self._waiters = {}  # type: Dict[Any, asyncio.Future]
+        self._hello = None  # type: Optional[asyncio.Future]
+
+    async def _get_transport(self) -> asyncio.DatagramTransport:
+        """Return the transport connected to the device, opening it if necessary."""
+        if self._transport_lock is None:
+            self._transport_lock = asyncio.Lock()
+
+        async with self._transport_lock:
+            if self._transport is None:
+                loop = asyncio.get_event_loop()
+                self._transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _AsyncDatagramProtocol(self),
+                    remote_addr=(self.ip, self.port),
+                )
+
+        return self._transport
+
+    def close(self) -> None:
+        """Close the transport used for communicating with the device.
+
+        A new transport is opened automatically on the next request."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _request(
+        self,
+        transport: asyncio.DatagramTransport,
+        key: Any,
+        data: bytes,
+        timeout: float = None,
+        method: Optional[str] = None,
+    ) -> Message:
+        """Send the given data and wait for the response matching the key."""
+        if timeout is None:
+            timeout = self._timeout
+        instrument = self.instrument
+        if instrument is not None:
+            if key == self._HELLO:
+                method = None
+            instrument_start = self._exchange_started(instrument, method, data)
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters[key] = waiter
+        try:
+            start = time.monotonic()
+            transport.sendto(data)
+            m = await asyncio.wait_for(waiter, timeout)
+            self.rtt.update(time.monotonic() - start)
+        except Exception as ex:
+            if instrument is not None:
+                self._exchange_finished(instrument, method, instrument_start, None, ex)
+            raise
+        finally:
+            if self._waiters.get(key) is waiter:
+                del self._waiters[key]
+
+        if instrument is not None:
+            self._exchange_finished(instrument, method, instrument_start, m)
+        return m
+
+    def _datagram_received(self, data: bytes) -> None:
+        if len(data) == 32:
+            waiter = self._waiters.get(self._HELLO)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(self.codec.parse(data))
+            return
+
+        try:
+            m = self._parse(data)
+        except Exception as ex:
+            self._fail_waiters(ex)
+            return
+
+        payload = m.data.value
+        if isinstance(payload, dict) and "id" in payload:
+            waiter = self._waiters.get(payload["id"])
+        else:
+            waiter = next(
+                (w for k, w in self._waiters.items() if k != self._HELLO), None
             )
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.settimeout(self._timeout)
+        if waiter is None or waiter.done():
+            _LOGGER.debug("%s:%s ignoring unexpected response", self.ip, self.port)
+            return
+
+        waiter.set_result(m)
+
+    def _fail_waiters(self, exc: Exception) -> None:
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc)
+
+    def _connection_lost(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        self._fail_waiters(exc or ConnectionError("Connection closed"))
+
+    async def _exchange_hello(self, timeout: float = None) -> Message:
+        transport = await self._get_transport()
+        m = await self._request(transport, self._HELLO, HELLO_BYTES, timeout)
+        return self._handle_handshake(m)
 
+    async def _handshake(self, timeout: float = None) -> Message:
+        """Send a hello to the device and handle its response.
+
+        If a hello is in flight already, its response is awaited instead.
+
+        :raises asyncio.TimeoutError: if the device did not respond in time."""
+        if self._hello is None or self._hello.done():
+            self._hello = asyncio.ensure_future(self._exchange_hello(timeout))
+        return await asyncio.shield(self._hello)
+
+    async def _send_hello(self, timeout: float = None) -> Optional[Message]:
+        """Send a hello packet to the device and handle its response.
+
+        :return: Parsed response, or None if the device did not respond in time.
+        :raises DeviceException: if the transport could not be used."""
         try:
-            s.sendto(m, (self.ip, self.port))
+            return await self._handshake(timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return None
         except OSError as ex:
-            _LOGGER.error("failed to send msg: %s", ex)
-            raise DeviceException from ex
+            self.close()
+            raise DeviceException("Unable to send hello to %s" % self.ip) from ex
 
+    async def _probe(self) -> None:
+        """Send a single hello to check whether the device has recovered."""
         try:
-            data, addr = s.recvfrom(1024)
-            m = Message.parse(data, token=self.token)
+            m = await self._send_hello(self._attempt_timeout(0, float("inf")))
+        except DeviceException:
+            m = None
 
-            header = m.header.value
-            payload = m.data.value
+        # a response has been handled as a handshake already
+        if m is None:
+            self._handle_probe(m)
+
+    async def send_handshake(self, *, retry_count=3) -> Message:
+        """Send a handshake to the device.
+
+        See :func:`MiIOProtocol.send_handshake`."""
+        deadline = self._deadline(retry_count)
+        attempt = 0
+        while True:
+            error = None
+            try:
+                m = await self._send_hello(self._attempt_timeout(attempt, deadline))
+            except DeviceException as ex:
+                m, error = None, ex
 
-            self.__id = payload["id"]
-            self._device_ts = header.ts
+            if m is not None:
+                return m
 
-            if self.debug > 1:
-                _LOGGER.debug("recv from %s: %s", addr[0], m)
+            attempt += 1
+            delay = self._retry_delay(attempt, retry_count, deadline)
+            if delay is None:
+                self._record_failure()
+                self._instrument_error(None, error or asyncio.TimeoutError("timed out"))
+                if error is not None:
+                    raise error
+                return self._handle_handshake(m)
+
+            self.stats["retries"] += 1
+            if self.instrument is not None:
+                self.instrument.retry(self, None, attempt, error)
+            await asyncio.sleep(delay)
+
+    async def send(
+        self,
+        command: str,
+        parameters: Any = None,
+        retry_count: int = 3,
+        *,
+        extra_parameters: Dict = None
+    ) -> Any:
+        """Build and send the given command.
+
+        See :func:`MiIOProtocol.send`."""
+        if self._check_circuit():
+            await self._probe()
+
+        deadline = self._deadline(retry_count)
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(attempt, deadline)
+            try:
+                transport = await self._get_transport()
+            except OSError as ex:
+                _LOGGER.error("failed to send msg: %s", ex)
+                raise DeviceException from ex
+
+            try:
+                if self._needs_handshake():
+                    await self._handshake(timeout)
+
+                request, m = self._build_request(command, parameters, extra_parameters)
+                m = await self._request(transport, request["id"], m, timeout, command)
+                return self._handle_response(m)
+            except construct.core.ChecksumError as ex:
+                self._raise_invalid_token(command, ex)
+            except (OSError, asyncio.TimeoutError) as ex:
+                # the transport is shared with the other requests in flight
+                if isinstance(ex, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                else:
+                    self.close()
+                self._reset_session()
+                error = ex  # type: Exception
+                message = "No response from the device"
+            except RecoverableError as ex:
+                error, message = ex, "Unable to recover failed command"
+            except DeviceException as ex:
+                self._instrument_error(command, ex)
+                raise
+
+            attempt += 1
+            delay = self._retry_delay(attempt, retry_count, deadline)
+            if delay is None:
+                if not isinstance(error, DeviceError):
+                    self._record_failure()
+                self._instrument_error(command, error)
+                _LOGGER.error("Got error when receiving: %s", error)
+                raise DeviceException(message) from error
 
             _LOGGER.debug(
-                "%s:%s (ts: %s, id: %s) << %s",
-                self.ip,
-                self.port,
-                header.ts,
-                payload["id"],
-                payload,
+                "Retrying after %r, retries left: %s", error, retry_count - attempt + 1
             )
-            if "error" in payload:
-                self._handle_error(payload["error"])
+            self.stats["retries"] += 1
+            if self.instrument is not None:
+                self.instrument.retry(self, command, attempt, error)
+            await asyncio.sleep(delay)
 
-            try:
-                return payload["result"]
-            except KeyError:
-                return payload
-        except construct.core.ChecksumError as ex:
-            raise DeviceException(
-                "Got checksum error which indicates use "
-                "of an invalid token. "
-                "Please check your token!"
-            ) from ex
-        except OSError as ex:
-            if retry_count > 0:
-                _LOGGER.debug(
-                    "Retrying with incremented id, retries left: %s", retry_count
-                )
-                self.__id += 100
-                self._discovered = False
-                return self.send(
-                    command,
-                    parameters,
-                    retry_count - 1,
-                    extra_parameters=extra_parameters,
-                )
+    async def send_many(
+        self,
+        command: str,
+        parameters: List[Any],
+        max_in_flight: int = 4,
+        retry_count: int = 3,
+    ) -> List[Any]:
+        """Send the given command once for each of the given parameters.
 
-            _LOGGER.error("Got error when receiving: %s", ex)
-            raise DeviceException("No response from the device") from ex
+        See :func:`MiIOProtocol.send_many`."""
+        if self._check_circuit():
+            await self._probe()
+        if self._needs_handshake():
+            await self.send_handshake()
 
-        except RecoverableError as ex:
-            if retry_count > 0:
-                _LOGGER.debug(
-                    "Retrying to send failed command, retries left: %s", retry_count
-                )
-                return self.send(
-                    command,
-                    parameters,
-                    retry_count - 1,
-                    extra_parameters=extra_parameters,
+        semaphore = asyncio.Semaphore(max(max_in_flight, 1))
+
+        async def _send(params):
+            async with semaphore:
+                return await self.send(command, params, retry_count)
+
+        return list(await asyncio.gather(*[_send(params) for params in parameters]))
+
+
+class _Waiter:
+    """Pending request of a :class:`SharedEndpoint`."""
+
+    def __init__(self, protocol: MiIOProtocol) -> None:
+        self.protocol = protocol
+        self.event = threading.Event()
+        self.response = None  # type: Optional[Message]
+        self.exception = None  # type: Optional[Exception]
+
+    def set_response(self, response: Message) -> None:
+        self.response = response
+        self.event.set()
+
+    def set_exception(self, exception: Exception) -> None:
+        self.exception = exception
+        self.event.set()
+
+
+class SharedEndpoint:
+    """UDP socket shared by multiple devices.
+
+    By default every device owns a socket for communicating with it.
+    When managing a large number of devices, the devices can be registered to
+    a shared endpoint instead, which sends all requests through a single socket.
+    A single thread receives all responses and hands them over to the waiting
+    requests based on the source address and the message id of the response.
+
+    .. code-block::
+        endpoint = SharedEndpoint()
+        for device in devices:
+            endpoint.register(device)
+
+    This is only supported for the synchronous :class:`MiIOProtocol`.
+    """
+
+    def __init__(self, address: Tuple[str, int] = ("0.0.0.0", 0)) -> None:
+        """
+        :param address: Local address to bind the socket to
+        """
+        self.address = address
+        self._socket = None  # type: Optional[socket.socket]
+        self._thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+        self._addresses = {}  # type: Dict[str, str]
+        self._waiters = {}  # type: Dict[Tuple, Dict[Optional[int], List[_Waiter]]]
+
+    def register(self, device) -> None:
+        """Use this endpoint for communicating with the given device."""
+        device._protocol.close()
+        device._protocol.endpoint = self
+
+    def unregister(self, device) -> None:
+        """Use a socket owned by the device for communicating with it."""
+        device._protocol.endpoint = None
+
+    def close(self) -> None:
+        """Stop receiving and close the socket.
+
+        The socket is opened again automatically on the next request."""
+        with self._lock:
+            sock, self._socket = self._socket, None
+            thread, self._thread = self._thread, None
+        if sock is not None:
+            sock.close()
+        if thread is not None:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_socket(self) -> socket.socket:
+        with self._lock:
+            if self._socket is None:
+                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                s.bind(self.address)
+                # allows the receiving thread to notice when the socket gets closed
+                s.settimeout(0.5)
+                self._socket = s
+                self._thread = threading.Thread(
+                    target=self._receive, args=(s,), daemon=True
                 )
+                self._thread.start()
 
-            _LOGGER.error("Got error when receiving: %s", ex)
-            raise DeviceException("Unable to recover failed command") from ex
+            return self._socket
 
-    @property
-    def _id(self) -> int:
-        """Increment and return the sequence id."""
-        self.__id += 1
-        if self.__id >= 9999:
-            self.__id = 1
-        return self.__id
+    def _resolve(self, host: str) -> str:
+        if host not in self._addresses:
+            self._addresses[host] = socket.gethostbyname(host)
 
-    @property
-    def raw_id(self):
-        return self.__id
+        return self._addresses[host]
 
-    def _handle_error(self, error):
-        """Raise exception based on the given error code."""
-        if "code" in error and error["code"] == -30001:
-            raise RecoverableError(error)
-        raise DeviceError(error)
+    def exchange(
+        self,
+        protocol: MiIOProtocol,
+        data: bytes,
+        request_id: Optional[int],
+        timeout: float = None,
+    ) -> Message:
+        """Send the given data and return the response to it.
 
-    def _create_request(
-        self, command: str, parameters: Any, extra_parameters: Dict = None
-    ):
-        """Create request payload."""
-        request = {"id": self._id, "method": command}
+        See :func:`MiIOProtocol._exchange`."""
+        try:
+            addr = (self._resolve(protocol.ip), protocol.port)
+            s = self._get_socket()
+        except OSError as ex:
+            _LOGGER.error("failed to send msg: %s", ex)
+            raise DeviceException from ex
 
-        if parameters is not None:
-            request["params"] = parameters
+        waiter = _Waiter(protocol)
+        with self._lock:
+            self._waiters.setdefault(addr, {}).setdefault(request_id, []).append(waiter)
+
+        try:
+            try:
+                s.sendto(data, addr)
+            except OSError as ex:
+                _LOGGER.error("failed to send msg: %s", ex)
+                raise DeviceException from ex
+
+            if timeout is None:
+                timeout = protocol._timeout
+            if not waiter.event.wait(timeout):
+                raise socket.timeout("timed out")
+            if waiter.exception is not None:
+                raise waiter.exception
+
+            return waiter.response
+        finally:
+            with self._lock:
+                waiters = self._waiters[addr]
+                waiters[request_id].remove(waiter)
+                if not waiters[request_id]:
+                    del waiters[request_id]
+                if not waiters:
+                    del self._waiters[addr]
+
+    def _receive(self, s: socket.socket) -> None:
+        while True:
+            try:
+                data, addr = s.recvfrom(1024)
+            except socket.timeout:
+                if self._socket is not s:
+                    return
+                continue
+            except OSError as ex:
+                if self._socket is s:
+                    _LOGGER.error("Unable to receive from the shared socket: %s", ex)
+                return
+
+            try:
+                self._dispatch(data, addr)
+            except Exception as ex:
+                _LOGGER.warning("Unable to handle response from %s: %s", addr, ex)
+
+    def _dispatch(self, data: bytes, addr: Tuple) -> None:
+        with self._lock:
+            waiters = {k: list(v) for k, v in self._waiters.get(addr, {}).items()}
+
+        if len(data) == 32:
+            for waiter in waiters.get(None, []):
+                waiter.set_response(waiter.protocol.codec.parse(data))
+            return
+
+        requests = [w for k, v in waiters.items() if k is not None for w in v]
+        if not requests:
+            _LOGGER.debug("%s:%s ignoring unexpected response", *addr)
+            return
+
+        try:
+            m = requests[0].protocol._parse(data)
+        except Exception as ex:
+            for waiter in requests:
+                waiter.set_exception(ex)
+            return
+
+        payload = m.data.value
+        if isinstance(payload, dict) and "id" in payload:
+            matching = waiters.get(payload["id"], [])
         else:
-            request["params"] = []
+            matching = requests[:1]
 
-        if extra_parameters is not None:
-            request = {**request, **extra_parameters}
+        if not matching:
+            _LOGGER.debug("%s:%s ignoring response to an unknown request", *addr)
+            return
 
-        return request
+        for waiter in matching:
+            waiter.set_response(m)
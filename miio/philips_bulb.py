@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -114,6 +115,7 @@ class PhilipsWhiteBulb(Device):
             "Scene: {result.scene}\n",
         )
     )
+    @cached()
     def status(self) -> PhilipsBulbStatus:
         """Retrieve properties."""
 
@@ -4,6 +4,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -120,6 +121,7 @@ class PhilipsEyecare(Device):
             "Delayed turn off: {result.delay_off_countdown}\n",
         )
     )
+    @cached()
     def status(self) -> PhilipsEyecareStatus:
         """Retrieve properties."""
         properties = [
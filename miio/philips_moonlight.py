@@ -4,6 +4,7 @@ from typing import Any, Dict, Tuple
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -147,6 +148,7 @@ class PhilipsMoonlight(Device):
             "Scene: {result.scene}\n",
         )
     )
+    @cached()
     def status(self) -> PhilipsMoonlightStatus:
         """Retrieve properties."""
         properties = [
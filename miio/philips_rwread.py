@@ -5,6 +5,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -136,6 +137,7 @@ class PhilipsRwread(Device):
             "Child lock: {result.child_lock}\n",
         )
     )
+    @cached()
     def status(self) -> PhilipsRwreadStatus:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model]
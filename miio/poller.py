@@ -0,0 +1,336 @@
+"""Scheduler for polling the status of many devices.
+
+The :class:`Poller` calls a read-only method (by default `status()`) of each
+added device at its interval, using a pool of worker threads:
+
+.. code-block::
+    def on_result(result):
+        if result.error is None:
+            print(result.device.ip, result.value)
+
+    with Poller(callback=on_result) as poller:
+        for dev in devices:
+            poller.add(dev, interval=10)
+        ...
+
+The first poll of each device is spread randomly over its interval, and the
+following polls are jittered, so that devices added at once are not polled
+in bursts. The number of concurrent polls per subnet is bound to avoid
+flooding the access points.
+
+Results can also be consumed from asyncio with :func:`Poller.stream`.
+"""
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (  # noqa: F401
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+)
+
+from .device import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PollResult:
+    """Result of a single poll.
+
+    :param device: Polled device
+    :param value: Return value of the polled method, None on errors
+    :param error: Raised exception, if any
+    :param scheduled: Monotonic time the poll was scheduled for
+    :param started: Monotonic time the poll was started at
+    :param finished: Monotonic time the poll finished at
+    """
+
+    def __init__(
+        self,
+        device: Device,
+        value: Any,
+        error: Optional[Exception],
+        scheduled: float,
+        started: float,
+        finished: float,
+    ) -> None:
+        self.device = device
+        self.value = value
+        self.error = error
+        self.scheduled = scheduled
+        self.started = started
+        self.finished = finished
+
+    @property
+    def lag(self) -> float:
+        """Delay between the scheduled and the actual start of the poll."""
+        return self.started - self.scheduled
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+    def __repr__(self) -> str:
+        return "<PollResult %s lag=%.3fs duration=%.3fs error=%r>" % (
+            self.device.ip,
+            self.lag,
+            self.duration,
+            self.error,
+        )
+
+
+class _Entry:
+    """Polling state of a single device."""
+
+    def __init__(self, device: Device, interval: float, method: str, subnet: str):
+        self.device = device
+        self.interval = interval
+        self.method = method
+        self.subnet = subnet
+        self.active = True
+
+
+class Poller:
+    """Poll devices periodically on a pool of worker threads.
+
+    :param callback: Called with each :class:`PollResult` from a worker thread
+    :param max_workers: Number of worker threads
+    :param max_per_subnet: Maximum number of concurrent polls per subnet
+    :param subnet_prefix: Prefix length of the subnets for IPv4 addresses
+    :param jitter: Relative random variation of the polling intervals
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[PollResult], None] = None,
+        *,
+        max_workers: int = 32,
+        max_per_subnet: int = 8,
+        subnet_prefix: int = 24,
+        jitter: float = 0.1,
+    ) -> None:
+        self.max_per_subnet = max_per_subnet
+        self.subnet_prefix = subnet_prefix
+        self.jitter = jitter
+        self._callbacks = [] if callback is None else [callback]
+        self._max_workers = max_workers
+        self._executor = None  # type: Optional[ThreadPoolExecutor]
+        self._thread = None  # type: Optional[threading.Thread]
+        self._running = False
+        self._entries = {}  # type: Dict[int, _Entry]
+        self._heap = []  # type: List
+        self._counter = itertools.count()
+        self._in_flight = {}  # type: Dict[str, int]
+        self._waiting = {}  # type: Dict[str, Deque]
+        self._cond = threading.Condition()
+
+        self.polls = 0
+        self.errors = 0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+    def _subnet(self, ip: Optional[str]) -> str:
+        try:
+            network = ipaddress.ip_network(
+                "%s/%s" % (ip, self.subnet_prefix), strict=False
+            )
+        except ValueError:
+            return str(ip)
+        return str(network)
+
+    def add(self, device: Device, interval: float, method: str = "status") -> None:
+        """Poll the given device every `interval` seconds.
+
+        :param device: Device to poll
+        :param interval: Polling interval in seconds
+        :param method: Name of the read-only method to call
+        """
+        entry = _Entry(device, interval, method, self._subnet(device.ip))
+        with self._cond:
+            old = self._entries.get(id(device))
+            if old is not None:
+                old.active = False
+            self._entries[id(device)] = entry
+            self._schedule(entry, time.monotonic() + random.uniform(0, interval))
+
+    def remove(self, device: Device) -> None:
+        """Stop polling the given device."""
+        with self._cond:
+            entry = self._entries.pop(id(device), None)
+            if entry is not None:
+                entry.active = False
+
+    @property
+    def devices(self) -> List[Device]:
+        with self._cond:
+            return [entry.device for entry in self._entries.values()]
+
+    def add_callback(self, callback: Callable[[PollResult], None]) -> None:
+        with self._cond:
+            self._callbacks = self._callbacks + [callback]
+
+    def remove_callback(self, callback: Callable[[PollResult], None]) -> None:
+        with self._cond:
+            self._callbacks = [c for c in self._callbacks if c is not callback]
+
+    def _schedule(self, entry: _Entry, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._counter), entry))
+        self._cond.notify()
+
+    def start(self) -> None:
+        """Start polling in the background."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="miio-poller"
+            )
+            self._thread = threading.Thread(
+                target=self._run, name="miio-poller-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop polling, waiting for the polls in progress if requested.
+
+        Polls waiting for a free slot of their subnet are scheduled again,
+        so that they are done once polling is restarted."""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+            for waiting in self._waiting.values():
+                for entry, due in waiting:
+                    heapq.heappush(self._heap, (due, next(self._counter), entry))
+            self._waiting.clear()
+            self._cond.notify()
+
+        if thread is not None:
+            thread.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self) -> None:
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, entry = heapq.heappop(self._heap)
+                    if entry.active:
+                        self._dispatch(entry, due)
+
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+
+    def _dispatch(self, entry: _Entry, due: float) -> None:
+        """Submit the poll, or queue it if the subnet is busy."""
+        executor = self._executor
+        if executor is None:
+            self._schedule(entry, due)
+            return
+
+        if self._in_flight.get(entry.subnet, 0) >= self.max_per_subnet:
+            self._waiting.setdefault(entry.subnet, deque()).append((entry, due))
+            return
+
+        self._in_flight[entry.subnet] = self._in_flight.get(entry.subnet, 0) + 1
+        executor.submit(self._poll, entry, due)
+
+    def _poll(self, entry: _Entry, due: float) -> None:
+        started = time.monotonic()
+        value, error = None, None
+        try:
+            value = getattr(entry.device, entry.method)()
+        except Exception as ex:
+            _LOGGER.debug("Polling %s failed: %s", entry.device.ip, ex)
+            error = ex
+        result = PollResult(entry.device, value, error, due, started, time.monotonic())
+
+        with self._cond:
+            self.polls += 1
+            self.errors += error is not None
+            self._total_lag += result.lag
+            self.max_lag = max(self.max_lag, result.lag)
+            callbacks = self._callbacks
+
+            self._in_flight[entry.subnet] -= 1
+            waiting = self._waiting.get(entry.subnet)
+            if waiting and self._running:
+                self._dispatch(*waiting.popleft())
+
+            if entry.active:
+                interval = entry.interval * random.uniform(
+                    1 - self.jitter, 1 + self.jitter
+                )
+                # skip the missed polls instead of catching up
+                self._schedule(entry, max(due + interval, result.finished))
+
+        for callback in callbacks:
+            try:
+                callback(result)
+            except Exception:
+                _LOGGER.exception("Error in poller callback")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of polls and errors, and the scheduling lag."""
+        with self._cond:
+            return {
+                "devices": len(self._entries),
+                "polls": self.polls,
+                "errors": self.errors,
+                "in_flight": sum(self._in_flight.values()),
+                "waiting": sum(len(w) for w in self._waiting.values()),
+                "mean_lag": self._total_lag / self.polls if self.polls else 0.0,
+                "max_lag": self.max_lag,
+            }
+
+    async def stream(self, maxsize: int = 0) -> AsyncIterator[PollResult]:
+        """Yield the poll results in the running event loop.
+
+        .. code-block::
+            async for result in poller.stream():
+                ...
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize)  # type: asyncio.Queue
+
+        def _put(result):
+            if queue.full():
+                _LOGGER.debug("Dropping result of %s", result.device.ip)
+                return
+            queue.put_nowait(result)
+
+        def _callback(result):
+            try:
+                loop.call_soon_threadsafe(_put, result)
+            except RuntimeError:
+                # the event loop has been closed without closing the generator
+                self.remove_callback(_callback)
+
+        self.add_callback(_callback)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.remove_callback(_callback)
@@ -5,9 +5,11 @@ from typing import Any, Dict, Optional
 
 import click
 
+from .cache import cached, updates
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .exceptions import DeviceException
+from .protocol import Utils
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -180,6 +182,8 @@ class PowerStrip(Device):
         else:
             self.model = MODEL_POWER_STRIP_V1
 
+        self._protocol.quirks = Utils.quirks_for_model(self.model)
+
     @command(
         default_output=format_output(
             "",
@@ -195,6 +199,7 @@ class PowerStrip(Device):
             "WiFi LED: {result.wifi_led}\n",
         )
     )
+    @cached()
     def status(self) -> PowerStripStatus:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model]
@@ -203,11 +208,13 @@ class PowerStrip(Device):
         return PowerStripStatus(defaultdict(lambda: None, zip(properties, values)))
 
     @command(default_output=format_output("Powering on"))
+    @updates(power="on")
     def on(self):
         """Power on."""
         return self.send("set_power", ["on"])
 
     @command(default_output=format_output("Powering off"))
+    @updates(power="off")
     def off(self):
         """Power off."""
         return self.send("set_power", ["off"])
@@ -216,6 +223,7 @@ class PowerStrip(Device):
         click.argument("mode", type=EnumType(PowerMode)),
         default_output=format_output("Setting mode to {mode}"),
     )
+    @updates(mode=lambda mode: mode.value)
     def set_power_mode(self, mode: PowerMode):
         """Set the power mode."""
 
@@ -228,6 +236,7 @@ class PowerStrip(Device):
             lambda led: "Turning on WiFi LED" if led else "Turning off WiFi LED"
         ),
     )
+    @updates(wifi_led=lambda led: "on" if led else "off")
     def set_wifi_led(self, led: bool):
         """Set the wifi led on/off."""
         if led:
@@ -239,6 +248,7 @@ class PowerStrip(Device):
         click.argument("price", type=int),
         default_output=format_output("Setting power price to {price}"),
     )
+    @updates(power_price=lambda price: price)
     def set_power_price(self, price: int):
         """Set the power price."""
         if price < 0 or price > 999:
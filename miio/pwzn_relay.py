@@ -4,6 +4,7 @@ from typing import Any, Dict
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 
@@ -126,6 +127,7 @@ class PwznRelay(Device):
             self.model = MODEL_PWZN_RELAY_APPLE
 
     @command(default_output=format_output("", "on_count: {result.on_count}\n"))
+    @cached()
     def status(self) -> PwznRelayStatus:
         """Retrieve properties."""
 
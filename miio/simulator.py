@@ -0,0 +1,388 @@
+"""Simulator of miIO devices for load testing and benchmarks.
+
+The :class:`Simulator` serves any number of :class:`SimulatedDevice` instances
+over UDP using the real wire format, so that the protocol, the device classes
+and the poller can be exercised without hardware:
+
+.. code-block::
+    with Simulator() as simulator:
+        for i in range(1, 1001):
+            device = SimulatedDevice(token, state={"power": "on", "aqi": 10})
+            simulator.add(device, host="127.0.1.%s" % i)
+        ...
+        AirPurifier("127.0.1.1", token).status()
+
+The devices answer hellos, ignore requests with invalid checksums, and
+dispatch the requests to handlers working on their state dict, e.g., the state
+dicts of the dummy devices used in the tests. Latency, packet loss, reordering
+and rate limits are simulated according to :class:`Impairments`.
+
+On Linux, all addresses of 127.0.0.0/8 can be used without further setup,
+so the devices can use the default port. Alternatively, the devices can be
+bound to different ports of the same address.
+"""
+import calendar
+import datetime
+import heapq
+import ipaddress
+import itertools
+import logging
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast  # noqa: F401
+
+import click
+from construct.core import ChecksumError, ConstructError
+
+from .exceptions import DeviceError
+from .protocol import Message
+
+_LOGGER = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Any]
+
+_device_ids = itertools.count(0x10000000)
+
+
+class Impairments:
+    """Network and device behavior to simulate.
+
+    :param latency: Delay of the responses in seconds
+    :param jitter: Maximum random delay added to the latency
+    :param loss: Probability of dropping a request
+    :param reorder: Probability of delaying a response by `reorder_delay`,
+        so that it arrives after the responses to subsequent requests
+    :param reorder_delay: Additional delay of reordered responses
+    :param rate_limit: Number of requests per second handled by a device,
+        further requests are dropped
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        reorder: float = 0.0,
+        reorder_delay: float = 0.05,
+        rate_limit: float = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.rate_limit = rate_limit
+
+    def delay(self) -> float:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if self.reorder and random.random() < self.reorder:
+            delay += self.reorder_delay
+        return delay
+
+
+class SimulatedDevice:
+    """Device answering requests from its state dict.
+
+    `get_prop` returns the values of the requested keys, and `set_<key>`
+    stores its first parameter as the value of the key. Other methods are
+    answered by the given handlers, which are called with the parameters of
+    the request and return the result, or raise :class:`DeviceError`.
+
+    :param token: Token of the device as a hex string
+    :param state: Initial state of the device
+    :param handlers: Handlers per method, overriding the default ones
+    :param model: Model reported by `miIO.info`
+    :param device_id: Id of the device, unique by default
+    :param impairments: Impairments of this device, overriding the ones
+        of the simulator
+    """
+
+    def __init__(
+        self,
+        token: str,
+        state: Dict[str, Any] = None,
+        handlers: Dict[str, Handler] = None,
+        model: str = "python-miio.simulated.v1",
+        device_id: int = None,
+        impairments: Impairments = None,
+    ) -> None:
+        self.token = bytes.fromhex(token)
+        self.state = dict(state or {})
+        self.model = model
+        self.device_id = next(_device_ids) if device_id is None else device_id
+        self.impairments = impairments
+        self.handlers = {
+            "get_prop": lambda params: [self.state.get(p) for p in params],
+            "miIO.info": lambda params: {
+                "model": self.model,
+                "fw_ver": "1.0.0",
+                "hw_ver": "simulated",
+            },
+        }  # type: Dict[str, Handler]
+        self.handlers.update(handlers or {})
+
+        self.hellos = 0
+        self.requests = 0
+        self.dropped = 0
+        self.checksum_errors = 0
+        self._allowance = 0.0
+        self._last_request = None  # type: Optional[float]
+
+    def __repr__(self) -> str:
+        return "<SimulatedDevice %s %08x>" % (self.model, self.device_id)
+
+    def handle(self, method: str, params: Any) -> Any:
+        """Return the result of the given method."""
+        handler = self.handlers.get(method)
+        if handler is not None:
+            return handler(params)
+
+        if method.startswith("set_") and isinstance(params, list) and params:
+            self.state[method[len("set_") :]] = params[0]
+            return ["ok"]
+
+        raise DeviceError({"code": -32601, "message": "Method not found."})
+
+    def handle_request(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the response payload to the given request payload.
+
+        Requests with handlers returning None are left unanswered."""
+        try:
+            result = self.handle(request["method"], request.get("params", []))
+        except DeviceError as ex:
+            return {"id": request["id"], "error": ex.args[0]}
+
+        if result is None:
+            return None
+        return {"id": request["id"], "result": result}
+
+    def _rate_limited(self, rate_limit: Optional[float]) -> bool:
+        """Return True if the request exceeds the rate limit (token bucket)."""
+        if not rate_limit:
+            return False
+
+        now = time.monotonic()
+        if self._last_request is None:
+            self._allowance = rate_limit
+        else:
+            elapsed = now - self._last_request
+            self._allowance = min(rate_limit, self._allowance + elapsed * rate_limit)
+        self._last_request = now
+
+        if self._allowance < 1:
+            return True
+        self._allowance -= 1
+        return False
+
+    def respond(self, data: bytes, rate_limit: float = None) -> Optional[bytes]:
+        """Return the response to the given packet, or None to leave it unanswered."""
+        now = datetime.datetime.utcnow()
+        device_id = self.device_id.to_bytes(4, "big")
+        if len(data) == 32:
+            self.hellos += 1
+            ts = calendar.timegm(now.timetuple())
+            hello = struct.pack(">HHI4sI", 0x2131, 32, 0, device_id, ts)
+            return hello + b"\xff" * 16
+
+        try:
+            request = Message.parse(data, token=self.token).data.value
+        except ChecksumError:
+            self.checksum_errors += 1
+            return None
+        except ConstructError as ex:
+            _LOGGER.debug("Unable to parse the request: %s", ex)
+            return None
+
+        if self._rate_limited(rate_limit):
+            self.dropped += 1
+            return None
+
+        self.requests += 1
+        response = self.handle_request(request)
+        if response is None:
+            return None
+
+        header = {"length": 0, "unknown": 0, "device_id": device_id, "ts": now}
+        msg = {"data": {"value": response}, "header": {"value": header}, "checksum": 0}
+        return Message.build(msg, token=self.token)
+
+
+class Simulator:
+    """UDP server for simulated devices, serving all of them from one thread.
+
+    :param impairments: Impairments applied to all devices
+    """
+
+    def __init__(self, impairments: Impairments = None) -> None:
+        self.impairments = impairments or Impairments()
+        self.devices = {}  # type: Dict[Tuple[str, int], SimulatedDevice]
+        self._selector = selectors.DefaultSelector()
+        self._sockets = []  # type: List[socket.socket]
+        # responses delayed until their due time
+        self._pending = []  # type: List[Tuple[float, int, socket.socket, bytes, Tuple]]
+        self._counter = itertools.count()
+        self._running = False
+        self._thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    def add(
+        self, device: SimulatedDevice, host: str = "127.0.0.1", port: int = 54321
+    ) -> Tuple[str, int]:
+        """Serve the device on the given address, port 0 picks a free port.
+
+        :return: The address the device is listening on
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((host, port))
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        address = sock.getsockname()
+        with self._lock:
+            self._sockets.append(sock)
+            self.devices[address] = device
+            self._selector.register(sock, selectors.EVENT_READ, device)
+        self._wakeup()
+        return address
+
+    def start(self) -> None:
+        """Start serving in a background thread."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._serve, name="miio-simulator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving and close the sockets of the devices."""
+        thread = self._thread
+        if self._running and thread is not None:
+            self._running = False
+            self._wakeup()
+            thread.join()
+        with self._lock:
+            for sock in self._sockets:
+                self._selector.unregister(sock)
+                sock.close()
+            self._sockets.clear()
+            self.devices.clear()
+            self._pending.clear()
+
+    def close(self) -> None:
+        """Stop serving and release all resources, the simulator cannot be reused."""
+        self.stop()
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _wakeup(self) -> None:
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _receive(self, sock: socket.socket, device: SimulatedDevice) -> None:
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as ex:
+                _LOGGER.debug("Receiving failed: %s", ex)
+                return
+
+            impairments = device.impairments or self.impairments
+
+            if impairments.loss and random.random() < impairments.loss:
+                device.dropped += 1
+                continue
+
+            try:
+                response = device.respond(data, impairments.rate_limit)
+            except Exception:
+                _LOGGER.exception("Error in the handler of %s", device)
+                continue
+            if response is None:
+                continue
+
+            delay = impairments.delay()
+            if delay <= 0:
+                self._send(sock, response, addr)
+            else:
+                due = time.monotonic() + delay
+                entry = (due, next(self._counter), sock, response, addr)
+                heapq.heappush(self._pending, entry)
+
+    @staticmethod
+    def _send(sock: socket.socket, data: bytes, addr: Tuple) -> None:
+        try:
+            sock.sendto(data, addr)
+        except OSError as ex:
+            _LOGGER.debug("Sending to %s failed: %s", addr, ex)
+
+    def _serve(self) -> None:
+        while self._running:
+            timeout = None
+            if self._pending:
+                timeout = max(self._pending[0][0] - time.monotonic(), 0)
+
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    self._wakeup_r.recv(4096)
+                else:
+                    self._receive(cast(socket.socket, key.fileobj), key.data)
+
+            now = time.monotonic()
+            while self._pending and self._pending[0][0] <= now:
+                _, _, sock, data, addr = heapq.heappop(self._pending)
+                self._send(sock, data, addr)
+
+
+@click.command()
+@click.option("--token", default=32 * "0", help="Token of the devices")
+@click.option("--count", default=1, help="Number of devices")
+@click.option("--host", default="127.0.0.1", help="Address of the first device")
+@click.option(
+    "--port",
+    default=54321,
+    help="Port of the devices, 0 for serving all of them on one address",
+)
+@click.option("--latency", default=0.0, help="Response delay in seconds")
+@click.option("--jitter", default=0.0, help="Maximum random additional delay")
+@click.option("--loss", default=0.0, help="Probability of dropping a request")
+@click.option("--reorder", default=0.0, help="Probability of reordering a response")
+@click.option("--rate-limit", type=float, help="Requests per second per device")
+def simulator(token, count, host, port, latency, jitter, loss, reorder, rate_limit):
+    """Simulate devices for testing without hardware.
+
+    The devices are served on consecutive addresses starting from the given
+    host, or on different ports of the host if the port is 0.
+    """
+    impairments = Impairments(latency, jitter, loss, reorder, rate_limit=rate_limit)
+    with Simulator(impairments) as server:
+        for i in range(count):
+            address = host if port == 0 else str(ipaddress.ip_address(host) + i)
+            device = SimulatedDevice(token, {"power": "on"})
+            click.echo("%s:%s" % server.add(device, address, port))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,37 @@
+import pytest
+
+from miio import Device, miioprotocol
+from miio.simulator import Simulator
+
+
+@pytest.fixture(autouse=True)
+def handshake_cache(monkeypatch) -> miioprotocol.HandshakeCache:
+    # simulated devices may reuse the ports of earlier tests
+    cache = miioprotocol.HandshakeCache()
+    monkeypatch.setattr(miioprotocol, "HANDSHAKE_CACHE", cache)
+    return cache
+
+
+@pytest.fixture
+def simulator():
+    with Simulator() as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def connect(simulator):
+    """Return a function creating a device for the given simulated address.
+
+    The token of the simulated device is used, unless a token is given."""
+
+    def _connect(address, cls=Device, token=None):
+        if token is None:
+            token = simulator.devices[address].token.hex()
+        device = cls(address[0], token)
+        device._protocol.port = address[1]
+        device._protocol._timeout = 0.2
+        device._protocol.retry_policy.deadline = 1
+        device._protocol.retry_policy.delay = lambda attempt: 0
+        return device
+
+    return _connect
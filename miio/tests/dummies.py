@@ -1,3 +1,8 @@
+from typing import Any, Dict, List  # noqa: F401
+
+from miio.simulator import SimulatedDevice, Simulator
+
+
 class DummyMiIOProtocol:
     """
     DummyProtocol allows you mock MiIOProtocol.
@@ -12,6 +17,13 @@ class DummyMiIOProtocol:
         """Overridden send() to return values from `self.return_values`."""
         return self.dummy_device.return_values[command](parameters)
 
+    def send_many(self, command: str, parameters, max_in_flight=4, retry_count=3):
+        """Overridden send_many() to return values from `self.return_values`."""
+        return [self.send(command, params) for params in parameters]
+
+    def close(self):
+        pass
+
 
 class DummyDevice:
     """DummyDevice base class, you should inherit from this and call
@@ -71,3 +83,43 @@ class DummyMiotDevice(DummyDevice):
             if prop["did"] == property_key:
                 prop["value"] = value
         return None
+
+
+class LoopbackDevice(SimulatedDevice):
+    """Simulated device served on a free port of the loopback interface.
+
+    Hellos are answered with the given device id, and requests are answered
+    with the return value of `handler(method, params)` as the result.
+    If the handler returns None, the request is left unanswered,
+    and if it raises a :class:`DeviceError`, an error response is sent.
+    The received request payloads are stored in `received`.
+
+    .. code-block::
+        with LoopbackDevice(token) as dev:
+            proto = MiIOProtocol("127.0.0.1", token.hex())
+            proto.port = dev.port
+    """
+
+    def __init__(self, token: bytes, handler=None, device_id=b"\x01\x02\x03\x04"):
+        super().__init__(token.hex(), device_id=int.from_bytes(device_id, "big"))
+        self.handler = handler or (lambda method, params: ["ok"])
+        self.received = []  # type: List[Dict[str, Any]]
+        self._simulator = Simulator()
+        self.port = self._simulator.add(self, port=0)[1]
+        self._simulator.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._simulator.close()
+
+    def handle(self, method, params):
+        return self.handler(method, params)
+
+    def handle_request(self, request):
+        self.received.append(request)
+        return super().handle_request(request)
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from miio.batch import BatchRunner, batch, parse_commands, parse_inventory, read_file
+
+from .test_airpurifier import DummyAirPurifier  # noqa: F401
+
+TOKEN = 32 * "0"
+
+
+def write(path, content):
+    path.write_text(content)
+    return str(path)
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    devices = [
+        {"class": "dummyairpurifier", "ip": "192.168.1.%s" % i, "token": TOKEN}
+        for i in range(1, 4)
+    ]
+    return write(
+        tmp_path / "devices.ndjson", "\n".join(json.dumps(d) for d in devices) + "\n"
+    )
+
+
+def run(inventory, commands):
+    result = CliRunner().invoke(batch, [inventory, commands, "--workers", "2"])
+    return result, [json.loads(line) for line in result.output.splitlines()]
+
+
+def test_batch(tmp_path, inventory):
+    commands = write(tmp_path / "commands.json", '["set_mode silent", ["status"]]')
+    result, lines = run(inventory, commands)
+    assert result.exit_code == 0
+    assert len(lines) == 6
+
+    for ip in ("192.168.1.1", "192.168.1.2", "192.168.1.3"):
+        device_lines = [line for line in lines if line["ip"] == ip]
+        assert [line["command"] for line in device_lines] == ["set_mode", "status"]
+        assert device_lines[0]["args"] == ["silent"]
+        assert device_lines[1]["result"]["mode"] == "silent"
+
+
+def test_batch_errors(tmp_path, inventory):
+    with open(inventory, "a") as f:
+        f.write(json.dumps({"class": "unknown", "ip": "192.168.1.9", "token": TOKEN}))
+    commands = write(tmp_path / "commands.json", '["set_mode invalid", "unknown"]')
+    result, lines = run(inventory, commands)
+    assert result.exit_code == 1
+    assert len(lines) == 8
+    assert all("error" in line for line in lines)
+    assert "invalid choice" in lines[0]["error"]
+    errors = {line["error"] for line in lines if line["ip"] == "192.168.1.9"}
+    assert errors == {"Invalid value: Unknown device class: unknown"}
+
+
+def test_read_file(tmp_path):
+    assert read_file(write(tmp_path / "a.json", '[{"ip": "x"}]')) == [{"ip": "x"}]
+    assert read_file(write(tmp_path / "a.jsonl", '{"ip": "x"}\n\n{"ip": "y"}')) == [
+        {"ip": "x"},
+        {"ip": "y"},
+    ]
+    pytest.importorskip("yaml")
+    assert read_file(write(tmp_path / "a.yaml", "- set_led on\n")) == ["set_led on"]
+
+
+def test_parse_commands():
+    assert parse_commands(["set_led on", ["set_mode", "auto"], ["status"]]) == [
+        ["set_led", "on"],
+        ["set_mode", "auto"],
+        ["status"],
+    ]
+    with pytest.raises(Exception):
+        parse_commands([{"command": "status"}])
+
+
+def test_parse_inventory():
+    device = {"class": "airpurifier", "ip": "192.168.1.2", "token": TOKEN}
+    assert parse_inventory([device]) == [device]
+    for invalid in [device, ["airpurifier"], [{"class": "airpurifier"}]]:
+        with pytest.raises(Exception):
+            parse_inventory(invalid)
+
+
+def test_batch_device_constructor_error(mocker, capsys):
+    mocker.patch("miio.batch.get_device_class", side_effect=RuntimeError("broken"))
+    device = {"class": "dummyairpurifier", "ip": "192.168.1.1", "token": TOKEN}
+    runner = BatchRunner([device, dict(device, ip="192.168.1.2")], [["status"]], 2)
+    runner.run()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["error"] for line in lines] == ["broken", "broken"]
+    assert runner.failures == 2
@@ -0,0 +1,199 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from miio import Device
+from miio.airpurifier import AirPurifierStatus, OperationMode
+from miio.cache import DeviceCache, cached
+from miio.exceptions import DeviceError
+
+from .dummies import DummyDevice
+from .test_airpurifier import DummyAirPurifier
+
+
+class CachedDevice(DummyDevice, Device):
+    def __init__(self, *args, **kwargs):
+        self.state = {"power": "on"}
+        self.requests = 0
+        self.return_values = {
+            "get_prop": self._get_prop,
+            "set_power": lambda x: self._set_state("power", x),
+        }
+        super().__init__(args, kwargs)
+
+    def _get_prop(self, props):
+        self.requests += 1
+        return self._get_state(props)
+
+    @cached()
+    def status(self):
+        return {"power": self.send("get_prop", ["power"])[0]}
+
+    def on(self):
+        return self.send("set_power", ["on"])
+
+    def off(self):
+        return self.send("set_power", ["off"])
+
+
+@pytest.fixture
+def device() -> CachedDevice:
+    device = CachedDevice()
+    device.enable_cache()
+    return device
+
+
+def test_cache_disabled():
+    device = CachedDevice()
+    device.status()
+    device.status()
+    assert device.requests == 2
+
+
+def test_cached_status(device):
+    status = device.status()
+    assert device.status() is status
+    assert device.requests == 1
+    assert device._cache.hits == 1
+    assert device._cache.misses == 1
+
+
+def test_cache_ttl(device):
+    device.enable_cache({"status": 0})
+    device.status()
+    device.status()
+    assert device.requests == 2
+
+
+def test_setter_invalidates_cache(device):
+    assert device.status() == {"power": "on"}
+    device.off()
+    assert device.status() == {"power": "off"}
+    assert device.requests == 2
+
+
+def test_explicit_invalidation(device):
+    device.status()
+    device.invalidate_cache("status")
+    device.status()
+    device.invalidate_cache()
+    device.status()
+    assert device.requests == 3
+
+
+def test_concurrent_calls_are_coalesced(device):
+    release = threading.Event()
+    get_prop = device.return_values["get_prop"]
+
+    def _slow_get_prop(props):
+        release.wait(1)
+        return get_prop(props)
+
+    device.return_values["get_prop"] = _slow_get_prop
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(device.status) for _ in range(5)]
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert device.requests == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_exceptions_are_not_cached(device):
+    calls = []
+
+    def _fail(props):
+        calls.append(props)
+        raise ValueError("failed")
+
+    device.return_values["get_prop"] = _fail
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            device.status()
+    assert len(calls) == 2
+
+
+def test_invalidation_during_call():
+    cache = DeviceCache()
+
+    def _call():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.call("status", ("status",), 10, _call) == "stale"
+    assert cache.get(("status",)) is None
+
+
+@pytest.fixture
+def purifier() -> DummyAirPurifier:
+    purifier = DummyAirPurifier()
+    purifier.enable_cache({"status": 60})
+    get_prop = purifier.return_values["get_prop"]
+    purifier.requests = 0
+
+    def _get_prop(props):
+        purifier.requests += 1
+        return get_prop(props)
+
+    purifier.return_values["get_prop"] = _get_prop
+    return purifier
+
+
+def test_setter_patches_cached_status(purifier):
+    status = purifier.status()
+    assert status.mode == OperationMode.Auto
+    requests = purifier.requests
+
+    purifier.set_mode(OperationMode.Silent)
+    purifier.set_led(True)
+    patched = purifier.status()
+    assert patched is not status
+    assert patched.mode == OperationMode.Silent
+    assert patched.led is True
+    assert patched.unconfirmed == {"mode", "led"}
+    assert purifier.requests == requests
+
+    assert status.mode == OperationMode.Auto
+    assert not hasattr(status, "unconfirmed")
+
+    purifier.invalidate_cache()
+    polled = purifier.status()
+    assert polled.mode == OperationMode.Silent
+    assert not hasattr(polled, "unconfirmed")
+
+
+def test_patch_partial_status():
+    data = {"power": "on", "aqi": 7, "mode": "auto"}
+    status = AirPurifierStatus(defaultdict(lambda: None, data))
+    cache = DeviceCache()
+    cache.call("status", ("status",), 60, lambda: status)
+
+    cache.patch("status", {"power": "off"})
+    patched = cache.get(("status",))
+    assert patched.power == "off"
+    assert patched.aqi == 7
+    assert patched.led_brightness is None
+    assert repr(patched) == repr(status).replace("power=on", "power=off")
+    assert status.power == "on"
+
+
+def test_failed_setter_invalidates_cached_status(purifier):
+    def _fail(params):
+        raise DeviceError({"code": -1, "message": "failed"})
+
+    purifier.return_values["set_mode"] = _fail
+    purifier.status()
+    with pytest.raises(DeviceError):
+        purifier.set_mode(OperationMode.Silent)
+
+    assert purifier.status().mode == OperationMode.Auto
+    assert purifier.requests == 4
+
+
+def test_unconfirmed_setter_invalidates_cached_status(purifier):
+    purifier.return_values["set_mode"] = lambda params: ["busy"]
+    status = purifier.status()
+    purifier.set_mode(OperationMode.Silent)
+    assert purifier.status() is not status
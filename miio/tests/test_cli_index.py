@@ -0,0 +1,71 @@
+import json
+
+import click
+import pytest
+from click._bashcomplete import get_choices
+from click.testing import CliRunner
+
+from miio import cli_index
+from miio.cli_index import IndexedGroup, build_index, load_index
+
+INDEX = {
+    "airpurifier": {"module": "miio.airpurifier", "attr": "AirPurifier", "help": ""},
+    "broken": {"module": "miio.nonexisting", "attr": "Broken", "help": "Not loaded"},
+}
+
+
+@pytest.fixture
+def cli():
+    @click.group(cls=IndexedGroup, index=INDEX)
+    def cli():
+        pass
+
+    @cli.command()
+    def static():
+        """Static command."""
+
+    return cli
+
+
+def test_build_index():
+    index = build_index()
+    assert index["airpurifier"] == INDEX["airpurifier"]
+    assert index["exporter"]["module"] == "miio.exporter"
+    assert index["exporter"]["help"].startswith("Serve the statuses")
+
+
+def test_load_index(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache" / "index.json")
+    monkeypatch.setattr(cli_index, "build_index", lambda: INDEX)
+    assert load_index(path) == INDEX
+
+    with open(path) as f:
+        assert json.load(f)["fingerprint"] == cli_index.fingerprint()
+
+    monkeypatch.setattr(cli_index, "build_index", lambda: {})
+    assert load_index(path) == INDEX
+
+    monkeypatch.setattr(cli_index, "fingerprint", lambda: "changed")
+    assert load_index(path) == {}
+
+
+def test_help_is_served_from_index(cli):
+    result = CliRunner().invoke(cli, ["--help"])
+    assert result.exit_code == 0
+    assert "airpurifier" in result.output
+    assert "broken       Not loaded" in result.output
+    assert "static       Static command." in result.output
+
+
+def test_command_is_loaded_on_demand(cli):
+    result = CliRunner().invoke(cli, ["airpurifier", "--help"])
+    assert result.exit_code == 0
+    assert "set_mode" in result.output
+
+    result = CliRunner().invoke(cli, ["broken", "--help"])
+    assert isinstance(result.exception, ImportError)
+
+
+def test_completion_is_served_from_index(cli):
+    assert get_choices(cli, "miiocli", [], "b") == [("broken", "Not loaded")]
+    assert ("set_mode", "Set mode.") in get_choices(cli, "miiocli", ["airpurifier"], "")
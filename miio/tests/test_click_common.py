@@ -1,4 +1,18 @@
-from miio.click_common import validate_ip, validate_token
+import json
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from miio.click_common import (
+    DeviceGroup,
+    GlobalContextObject,
+    json_output,
+    validate_ip,
+    validate_token,
+)
+
+from .test_airpurifier import DummyAirPurifier
 
 
 def test_validate_token_empty():
@@ -7,3 +21,49 @@ def test_validate_token_empty():
 
 def test_validate_ip_empty():
     assert validate_ip(None, None, None) is None
+
+
+@pytest.fixture
+def cli():
+    @click.group()
+    @click.option("--json", "use_json", is_flag=True)
+    @click.pass_context
+    def cli(ctx, use_json):
+        ctx.obj = GlobalContextObject(output=json_output() if use_json else None)
+
+    cli.add_command(DeviceGroup(DummyAirPurifier, name="airpurifier"))
+    return cli
+
+
+def invoke_shell(cli, input, *args):
+    params = ["airpurifier", "--ip", "127.0.0.1", "--token", 32 * "0", "shell"]
+    return CliRunner().invoke(cli, [*args, *params], input=input)
+
+
+def test_shell_keeps_device(cli):
+    script = "status  # comment\nset_mode silent\n\nstatus\nexit\nstatus\n"
+    result = invoke_shell(cli, script)
+    assert result.exit_code == 0
+    assert result.output.count("Mode: ") == 2
+    assert "Mode: auto" in result.output
+    assert "Setting mode to 'silent'" in result.output
+    assert "Mode: silent" in result.output
+
+
+def test_shell_json_output(cli):
+    result = invoke_shell(cli, "status\nstatus\n", "--json")
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["mode"] == "auto"
+
+
+def test_shell_errors(cli):
+    script = "unknown\nset_mode invalid\nset_mode 'unterminated\nhelp\nset_led --help\n"
+    result = invoke_shell(cli, script)
+    assert result.exit_code == 0
+    assert "Unknown command (unknown)" in result.output
+    assert "invalid choice: invalid" in result.output
+    assert "No closing quotation" in result.output
+    assert "set_mode" in result.output
+    assert "Usage: cli airpurifier set_led" in result.output
@@ -1,9 +1,20 @@
+import asyncio
 import math
+from concurrent.futures import Executor
 
 import pytest
 
-from miio import Device
-from miio.exceptions import DeviceInfoUnavailableException, PayloadDecodeException
+from miio import AsyncDevice, Device
+from miio.device import MaxPropertiesTable
+from miio.exceptions import (
+    DeviceError,
+    DeviceException,
+    DeviceInfoUnavailableException,
+    PayloadDecodeException,
+)
+from miio.miioprotocol import MiIOProtocol
+
+from .dummies import LoopbackDevice
 
 
 @pytest.mark.parametrize("max_properties", [None, 1, 15])
@@ -19,6 +30,75 @@ def test_get_properties_splitting(mocker, max_properties):
     assert send.call_count == math.ceil(len(properties) / max_properties)
 
 
+def _limited_send(limit, truncate=False):
+    def _send(command, parameters=None, retry_count=3):
+        if command == "miIO.info":
+            return {"model": "dummy.model", "fw_ver": "1.0.0"}
+        if len(parameters) > limit:
+            if truncate:
+                return parameters[:limit]
+            raise DeviceError({"code": -1, "message": "too many properties"})
+        return [p * 2 for p in parameters]
+
+    return _send
+
+
+@pytest.mark.parametrize("truncate", [False, True])
+def test_get_properties_probe_max_properties(mocker, truncate):
+    properties = [i for i in range(20)]
+    send = mocker.patch("miio.Device.send", side_effect=_limited_send(6, truncate))
+    d = Device("127.0.0.1", "68ffffffffffffffffffffffffffffff")
+    d.probe_max_properties = True
+    d.max_properties_table = MaxPropertiesTable()
+
+    assert d.get_properties(properties, max_properties=15) == [
+        p * 2 for p in properties
+    ]
+    # miIO.info, probes for 20, 10 and 5 properties, and the remaining slices
+    assert send.call_count == 1 + 3 + 3
+    assert d.max_properties_table.get("dummy.model", "1.0.0") == (5, True)
+
+    send.reset_mock()
+    assert d.get_properties(properties, max_properties=15) == [
+        p * 2 for p in properties
+    ]
+    assert send.call_count == 4
+
+
+def test_get_properties_probe_timeout(mocker):
+    limited_send = _limited_send(6)
+    timeouts = [20]
+
+    def _send(command, parameters=None, retry_count=3):
+        if command != "miIO.info" and len(parameters) in timeouts:
+            timeouts.remove(len(parameters))
+            raise DeviceException("No response from the device") from OSError()
+        return limited_send(command, parameters)
+
+    send = mocker.patch("miio.Device.send", side_effect=_send)
+    d = Device("127.0.0.1", "68ffffffffffffffffffffffffffffff")
+    d.probe_max_properties = True
+    d.max_properties_table = MaxPropertiesTable()
+
+    properties = [i for i in range(20)]
+    assert d.get_properties(properties, max_properties=5) == [
+        p * 2 for p in properties
+    ]
+    # miIO.info, the timed out probe, and the slices of the given size
+    assert send.call_count == 1 + 1 + 4
+    assert d.max_properties_table.get("dummy.model", "1.0.0") is None
+
+    d.get_properties(properties, max_properties=5)
+    assert d.max_properties_table.get("dummy.model", "1.0.0") == (5, True)
+
+
+def test_max_properties_table_persisted(tmp_path):
+    path = str(tmp_path / "cache" / "max_properties.json")
+    MaxPropertiesTable(path).set("dummy.model", "1.0.0", 8, False)
+    assert MaxPropertiesTable(path).get("dummy.model", "1.0.0") == (8, False)
+    assert MaxPropertiesTable(path).get("dummy.model", "2.0.0") is None
+
+
 def test_unavailable_device_info_raises(mocker):
     send = mocker.patch("miio.Device.send", side_effect=PayloadDecodeException)
     d = Device("127.0.0.1", "68ffffffffffffffffffffffffffffff")
@@ -27,3 +107,119 @@ def test_unavailable_device_info_raises(mocker):
         d.info()
 
     assert send.call_count == 1
+
+
+def _handler(method, params):
+    if method == "miIO.info":
+        return {"model": "dummy.model", "fw_ver": "1.0.0"}
+    if method == "get_prop":
+        return [prop.upper() for prop in params]
+    if method == "fail":
+        raise DeviceError({"code": -1, "message": "failed"})
+
+
+class SequencedDevice(Device):
+    """Device changing its state before sending, like Vacuum.manual_control."""
+
+    seqnum = 0
+
+    def move(self):
+        self.seqnum += 1
+        return self.send("get_prop", ["seq%s" % self.seqnum])
+
+
+@pytest.fixture
+def loopback_device():
+    with LoopbackDevice(bytes.fromhex(32 * "0"), _handler) as dev:
+        yield dev
+
+
+@pytest.fixture
+def async_device(loopback_device):
+    device = SequencedDevice("127.0.0.1", 32 * "0")
+    device._protocol.port = loopback_device.port
+    return AsyncDevice(device)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_async_device_methods(async_device):
+    async def _status():
+        async with async_device:
+            info = await async_device.info()
+            values = await async_device.get_properties(
+                ["a", "b", "c"], max_properties=1
+            )
+            return info, values
+
+    info, values = run(_status())
+    assert info.model == "dummy.model"
+    assert values == ["A", "B", "C"]
+
+
+def test_async_device_pipelined_properties(async_device):
+    async def _properties():
+        async with async_device:
+            return await async_device.get_properties(
+                ["a", "b", "c", "d"], max_properties=1, max_in_flight=3
+            )
+
+    assert run(_properties()) == ["A", "B", "C", "D"]
+
+
+class _NoExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        raise AssertionError("Executor used for %s" % fn)
+
+
+def test_async_device_native_methods(loopback_device):
+    device = Device("127.0.0.1", 32 * "0")
+    device._protocol.port = loopback_device.port
+    async_device = AsyncDevice(device, executor=_NoExecutor())
+
+    async def _calls():
+        async with async_device:
+            await async_device.send_handshake()
+            return await asyncio.gather(
+                async_device.info(),
+                async_device.raw_command("get_prop", ["a"]),
+                async_device.get_properties(["b", "c", "d"], max_properties=1),
+                *[async_device.send("get_prop", ["e%s" % i]) for i in range(10)]
+            )
+
+    info, raw, values, *results = run(_calls())
+    assert info.model == "dummy.model"
+    assert raw == ["A"]
+    assert values == ["B", "C", "D"]
+    assert results == [["E%s" % i] for i in range(10)]
+    assert loopback_device.hellos == 1
+
+
+def test_async_device_error(async_device):
+    async def _fail():
+        async with async_device:
+            return await async_device.raw_command("fail", [])
+
+    with pytest.raises(DeviceError):
+        run(_fail())
+
+
+def test_async_device_stateful_method(async_device, loopback_device):
+    async def _move():
+        async with async_device:
+            return [await async_device.move(), await async_device.move()]
+
+    assert run(_move()) == [["SEQ1"], ["SEQ2"]]
+    assert [r["params"] for r in loopback_device.received] == [["seq1"], ["seq2"]]
+    assert async_device.device.seqnum == 0
+
+
+def test_async_device_attributes(async_device):
+    assert async_device.ip == "127.0.0.1"
+    assert isinstance(async_device.device._protocol, MiIOProtocol)
@@ -0,0 +1,78 @@
+import pytest
+
+from miio.airpurifier import OperationMode
+from miio.diff import Change, ChangeDetector, crossing
+
+from .test_airpurifier import DummyAirPurifier
+
+
+def test_first_update_reports_all_fields():
+    detector = ChangeDetector()
+    changes = detector.update("dev", {"power": "on", "aqi": 10}, timestamp=1)
+    assert changes == [
+        Change("dev", "power", None, "on", 1),
+        Change("dev", "aqi", None, 10, 1),
+    ]
+    assert detector.update("dev", {"power": "on", "aqi": 10}) == []
+
+
+def test_changed_and_removed_fields():
+    detector = ChangeDetector()
+    detector.update("dev", {"power": "on", "aqi": 10, "led": "on"})
+    changes = detector.update("dev", {"power": "off", "aqi": 10}, timestamp=2)
+    assert changes == [
+        Change("dev", "power", "on", "off", 2),
+        Change("dev", "led", "on", None, 2),
+    ]
+    assert changes[0].__json__() == {
+        "field": "power",
+        "old": "on",
+        "new": "off",
+        "timestamp": 2,
+    }
+
+
+def test_deadband():
+    detector = ChangeDetector(deadbands={"aqi": 5})
+    detector.update("dev", {"aqi": 10})
+    assert detector.update("dev", {"aqi": 13}) == []
+    assert detector.update("dev", {"aqi": 7}) == []
+    # drifts are compared against the reported value
+    [change] = detector.update("dev", {"aqi": 15}, timestamp=3)
+    assert change == Change("dev", "aqi", 10, 15, 3)
+    assert [c.new for c in detector.update("dev", {"aqi": None})] == [None]
+
+
+def test_crossing_filter():
+    detector = ChangeDetector(filters={"aqi": crossing(50, 100)})
+    detector.update("dev", {"aqi": 10})
+    assert detector.update("dev", {"aqi": 49}) == []
+    assert [c.new for c in detector.update("dev", {"aqi": 120})] == [120]
+    assert detector.update("dev", {"aqi": 101}) == []
+
+
+def test_devices_are_tracked_separately():
+    detector = ChangeDetector()
+    detector.update("a", {"aqi": 10})
+    assert len(detector.update("b", {"aqi": 10})) == 1
+    detector.reset("a")
+    assert detector.snapshot("a") is None
+    assert detector.snapshot("b") == {"aqi": 10}
+    detector.reset()
+    assert detector.snapshot("b") is None
+
+
+def test_status_container():
+    purifier = DummyAirPurifier()
+    detector = ChangeDetector()
+    status = purifier.status()
+    assert len(detector.update("purifier", status)) == len(status.data)
+
+    purifier.set_mode(OperationMode.Silent)
+    changes = detector.update("purifier", purifier.status())
+    assert [(c.field, c.old, c.new) for c in changes] == [("mode", "auto", "silent")]
+
+
+def test_invalid_status():
+    with pytest.raises(TypeError):
+        ChangeDetector().update("dev", ["on"])
@@ -0,0 +1,91 @@
+import urllib.request
+
+import pytest
+
+from miio.exporter import CONTENT_TYPE, MetricsExporter, start_http_server
+from miio.poller import PollResult
+
+from .test_airpurifier import DummyAirPurifier
+
+
+@pytest.fixture
+def purifier() -> DummyAirPurifier:
+    purifier = DummyAirPurifier()
+    purifier.ip = "192.168.1.2"
+    purifier._protocol._device_id = b"\x00\x00\x01\x00"
+    purifier._protocol.stats = {"requests": 3, "retries": 1}
+    return purifier
+
+
+def metrics(exporter):
+    return exporter.render().decode().splitlines()
+
+
+def test_status_properties(purifier):
+    exporter = MetricsExporter()
+    exporter.update(purifier, purifier.status())
+    lines = metrics(exporter)
+    labels = 'model="",ip="192.168.1.2",device_id="256"'
+
+    assert lines[-1] == "# EOF"
+    assert "miio_air_purifier_aqi{%s} 10" % labels in lines
+    assert "miio_air_purifier_temperature{%s} 18.6" % labels in lines
+    assert "miio_air_purifier_is_on{%s} 1" % labels in lines
+    assert "# TYPE miio_air_purifier_aqi gauge" in lines
+    assert "# HELP miio_air_purifier_aqi Air quality index." in lines
+    # enums and strings are not exported
+    assert not any(line.startswith("miio_air_purifier_mode{") for line in lines)
+
+    assert "miio_up{%s} 1" % labels in lines
+    assert "# TYPE miio_protocol_retries counter" in lines
+    assert "miio_protocol_retries_total{%s} 1" % labels in lines
+    assert "miio_protocol_timeouts_total{%s} 0" % labels in lines
+
+
+def test_rendering_is_cached(purifier):
+    exporter = MetricsExporter()
+    exporter.update(purifier, purifier.status())
+    rendered = exporter.render()
+    assert exporter.render() is rendered
+
+    exporter.poll_callback(PollResult(purifier, None, Exception(), 0, 0, 0))
+    lines = metrics(exporter)
+    assert 'miio_up{model="",ip="192.168.1.2",device_id="256"} 0' in lines
+    assert not any(line.startswith("miio_air_purifier_aqi") for line in lines)
+
+    exporter.remove(purifier)
+    assert metrics(exporter) == ["# EOF"]
+
+
+def test_families_are_grouped(purifier):
+    other = DummyAirPurifier()
+    other.ip = "192.168.1.3"
+    exporter = MetricsExporter(namespace="home")
+    exporter.update(purifier, purifier.status())
+    exporter.update(other, {"power": "on", "aqi": 20})
+
+    lines = metrics(exporter)
+    assert lines.count("# TYPE home_up gauge") == 1
+    index = lines.index("# TYPE home_up gauge")
+    assert [line.split("{")[0] for line in lines[index + 1 : index + 3]] == [
+        "home_up",
+        "home_up",
+    ]
+    assert (
+        'home_dummy_air_purifier_aqi{model="",ip="192.168.1.3",device_id=""} 20'
+        in lines
+    )
+
+
+def test_http_server(purifier):
+    exporter = MetricsExporter()
+    exporter.update(purifier, purifier.status())
+    server = start_http_server(exporter, port=0, host="127.0.0.1")
+    try:
+        url = "http://127.0.0.1:%s/metrics" % server.server_port
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read() == exporter.render()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import miio
+
+HEAVY_MODULES = ["croniter", "miio.gateway", "miio.vacuum", "pytz", "zeroconf"]
+
+
+def run_python(code, *args):
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+
+
+def imported_modules(code):
+    code += "; import json, sys; print(json.dumps(sorted(sys.modules)))"
+    return set(json.loads(run_python(code).stdout))
+
+
+def import_time(code):
+    """Return the total import time in microseconds reported by -X importtime."""
+    stderr = run_python(code, "-X", "importtime").stderr
+    return sum(
+        int(line.split("|")[0].split(":")[1])
+        for line in stderr.splitlines()
+        if line.startswith("import time:") and "self [us]" not in line
+    )
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires PEP 562")
+def test_import_is_lazy():
+    modules = imported_modules("import miio")
+    assert not modules & {"miio.device", *HEAVY_MODULES}
+
+    modules = imported_modules("import miio; miio.AirPurifier")
+    assert "miio.airpurifier" in modules
+    assert not modules & set(HEAVY_MODULES)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires PEP 562")
+def test_import_time():
+    lazy = min(import_time("import miio; miio.Device") for _ in range(3))
+    eager = min(import_time("import miio; miio._load_all()") for _ in range(3))
+    assert lazy < eager
+
+
+def test_public_names():
+    for name in miio.__all__:
+        assert getattr(miio, name) is not None
+    assert set(miio.__all__) <= set(dir(miio))
+    assert miio.Device.__module__ == "miio.device"
+
+
+def test_submodule_access():
+    assert miio.vacuumcontainers.VacuumStatus is miio.VacuumStatus
+    with pytest.raises(AttributeError):
+        miio.NonExistingDevice
@@ -0,0 +1,193 @@
+import asyncio
+import itertools
+import json
+
+import pytest
+
+from miio.cli import print_stats
+from miio.exceptions import DeviceError, DeviceException
+from miio.instrumentation import HANDSHAKE, Collector, Histogram, Instrument, attach
+from miio.miioprotocol import AsyncMiIOProtocol, MiIOProtocol
+from miio.simulator import Impairments, SimulatedDevice
+
+TOKEN = "00112233445566778899aabbccddeeff"
+
+
+@pytest.fixture
+def collector():
+    collector = Collector()
+    attach(collector)
+    yield collector
+    attach(None)
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1.0))
+    assert histogram.percentile(0.5) is None
+
+    for value in [0.05, 0.05, 0.5, 2.0]:
+        histogram.add(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.mean == pytest.approx(0.65)
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.75) == 1.0
+    assert histogram.percentile(1) == 2.0
+
+    other = Histogram((0.1, 1.0))
+    other.add(0.01)
+    histogram.merge(other)
+    assert histogram.count == 5
+    assert histogram.min == 0.01
+    with pytest.raises(ValueError):
+        histogram.merge(Histogram((1.0,)))
+
+
+def test_not_attached_by_default():
+    assert MiIOProtocol.instrument is None
+    assert MiIOProtocol().instrument is None
+
+
+def test_collect(simulator, collector, connect):
+    address = simulator.add(SimulatedDevice(TOKEN, {"power": "on"}), port=0)
+    device = connect(address)
+    key = "%s:%s" % address
+
+    for _ in range(3):
+        assert device.send("get_prop", ["power"]) == ["on"]
+    with pytest.raises(DeviceError):
+        device.send("unknown")
+
+    assert collector.devices() == [key]
+    assert collector.methods(key) == ["get_prop", HANDSHAKE, "unknown"]
+
+    stats = collector.stats(key, "get_prop")
+    assert stats.requests == 3
+    assert stats.latency.count == 3
+    assert stats.bytes_sent > 3 * 32
+    assert stats.bytes_received > 3 * 32
+    assert stats.errors == stats.retries == 0
+
+    handshake = collector.stats(method=HANDSHAKE)
+    assert handshake.requests == 1
+    assert handshake.bytes_received == 32
+
+    unknown = collector.stats(key, "unknown")
+    assert unknown.errors == 1
+    assert unknown.error_types == {"DeviceError": 1}
+
+    assert collector.stats().requests == 5
+    assert collector.decode_latency(key).count == 4
+
+    collector.reset()
+    assert collector.devices() == []
+
+
+def test_retries_and_errors(simulator, collector, connect):
+    attempts = itertools.count()
+
+    def flaky(params):
+        if next(attempts) < 2:
+            raise DeviceError({"code": -30001, "message": "busy"})
+        return ["ok"]
+
+    address = simulator.add(SimulatedDevice(TOKEN, handlers={"flaky": flaky}), port=0)
+    device = connect(address)
+    assert device.send("flaky") == ["ok"]
+
+    stats = collector.stats(method="flaky")
+    assert stats.requests == 3
+    assert stats.retries == 2
+    assert stats.errors == 0
+
+    simulator.devices[address].impairments = Impairments(loss=1.0)
+    device._protocol._discovered = False
+    with pytest.raises(DeviceException):
+        device.send("flaky", retry_count=1)
+
+    stats = collector.stats(method="flaky")
+    assert stats.retries == 3
+    assert stats.errors == 1
+    assert collector.stats(method=HANDSHAKE).latency.count == 1
+
+
+def test_attach_to_device(simulator, connect):
+    collector = Collector()
+    device = connect(simulator.add(SimulatedDevice(TOKEN), port=0))
+    other = connect(simulator.add(SimulatedDevice(TOKEN), port=0))
+
+    attach(collector, device)
+    device.send("get_prop", ["power"])
+    other.send("get_prop", ["power"])
+    assert collector.devices() == ["%s:%s" % (device.ip, device._protocol.port)]
+
+    attach(None, device)
+    assert device._protocol.instrument is None
+
+
+def test_hook_order(simulator, connect):
+    calls = []
+
+    class Recorder(Instrument):
+        def handshake_start(self, protocol):
+            calls.append("handshake_start")
+
+        def handshake_end(self, protocol, duration, error):
+            calls.append("handshake_end")
+
+        def send(self, protocol, method, size):
+            calls.append("send %s" % method)
+
+        def receive(self, protocol, method, size, duration):
+            calls.append("receive %s" % method)
+
+        def decode(self, protocol, size, duration):
+            calls.append("decode")
+
+    device = connect(simulator.add(SimulatedDevice(TOKEN), port=0))
+    attach(Recorder(), device)
+    device.send("get_prop", ["power"])
+    assert calls == [
+        "handshake_start",
+        "handshake_end",
+        "send get_prop",
+        "decode",
+        "receive get_prop",
+    ]
+
+
+def test_async_protocol(simulator):
+    collector = Collector()
+    host, port = simulator.add(SimulatedDevice(TOKEN, {"power": "on"}), port=0)
+    proto = AsyncMiIOProtocol(host, TOKEN)
+    proto.port = port
+    proto.instrument = collector
+
+    async def _send():
+        try:
+            return await proto.send("get_prop", ["power"])
+        finally:
+            proto.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(_send()) == ["on"]
+    finally:
+        loop.close()
+
+    assert collector.stats(method="get_prop").latency.count == 1
+    assert collector.stats(method=HANDSHAKE).latency.count == 1
+
+
+def test_print_stats(simulator, collector, capsys, connect):
+    device = connect(simulator.add(SimulatedDevice(TOKEN), port=0))
+    device.send("get_prop", ["power"])
+
+    print_stats(collector, "default")
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[0].split()[:3] == ["device", "method", "requests"]
+    assert len(lines) == 3
+
+    print_stats(collector, "json")
+    data = json.loads(capsys.readouterr().err)
+    key = "%s:%s" % (device.ip, device._protocol.port)
+    assert data[key]["methods"]["get_prop"]["requests"] == 1
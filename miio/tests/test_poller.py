@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from miio.exceptions import DeviceException
+from miio.poller import Poller
+
+
+class PolledDevice:
+    def __init__(self, ip, delay=0.0, fail=False):
+        self.ip = ip
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def status(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise DeviceException("unreachable")
+        return {"ip": self.ip, "count": self.calls}
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_poller_polls_devices():
+    results = []
+    devices = [PolledDevice("192.168.1.%s" % i) for i in range(5)]
+    with Poller(results.append, jitter=0) as poller:
+        for device in devices:
+            poller.add(device, interval=0.05)
+        wait_for(lambda: all(device.calls >= 3 for device in devices))
+
+    assert {result.device for result in results} == set(devices)
+    assert all(result.error is None for result in results)
+    assert all(result.lag >= 0 for result in results)
+    stats = poller.stats()
+    assert stats["devices"] == 5
+    assert stats["polls"] == len(results)
+    assert stats["errors"] == 0
+
+
+def test_poller_records_errors():
+    results = []
+    device = PolledDevice("192.168.1.1", fail=True)
+    with Poller(results.append) as poller:
+        poller.add(device, interval=0.01)
+        wait_for(lambda: len(results) >= 2)
+
+    assert isinstance(results[0].error, DeviceException)
+    assert results[0].value is None
+    assert poller.stats()["errors"] >= 2
+
+
+def test_poller_bounds_concurrency_per_subnet():
+    lock = threading.Lock()
+    concurrent = {"current": 0, "max": 0}
+
+    class SlowDevice(PolledDevice):
+        def status(self):
+            with lock:
+                concurrent["current"] += 1
+                concurrent["max"] = max(concurrent["max"], concurrent["current"])
+            try:
+                return super().status()
+            finally:
+                with lock:
+                    concurrent["current"] -= 1
+
+    devices = [SlowDevice("10.0.0.%s" % i, delay=0.02) for i in range(10)]
+    with Poller(max_per_subnet=2) as poller:
+        for device in devices:
+            poller.add(device, interval=0.01)
+        wait_for(lambda: all(device.calls >= 2 for device in devices))
+
+    assert concurrent["max"] == 2
+
+
+def test_poller_remove():
+    device = PolledDevice("192.168.1.1")
+    with Poller() as poller:
+        poller.add(device, interval=0.01)
+        wait_for(lambda: device.calls >= 1)
+        poller.remove(device)
+        time.sleep(0.05)
+        calls = device.calls
+        time.sleep(0.05)
+
+    assert device.calls == calls
+    assert poller.devices == []
+
+
+def test_poller_restart():
+    devices = [PolledDevice("10.0.0.%s" % i, delay=0.1) for i in range(2)]
+    poller = Poller(max_per_subnet=1)
+    poller.start()
+    for device in devices:
+        poller.add(device, interval=0.01)
+    wait_for(lambda: poller.stats()["waiting"] == 1)
+    poller.stop()
+
+    stats = poller.stats()
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+
+    calls = [device.calls for device in devices]
+    with poller:
+        wait_for(lambda: all(d.calls > c for d, c in zip(devices, calls)))
+
+
+@pytest.mark.parametrize("ip", ["192.168.1.10", "example.com"])
+def test_poller_subnet(ip):
+    subnet = Poller(subnet_prefix=24)._subnet(ip)
+    assert subnet == ("192.168.1.0/24" if ip[0].isdigit() else ip)
+
+
+def test_poller_stream():
+    device = PolledDevice("192.168.1.1")
+
+    async def _collect(poller):
+        results = []
+        async for result in poller.stream():
+            results.append(result)
+            if len(results) == 3:
+                break
+        return results
+
+    loop = asyncio.new_event_loop()
+    try:
+        with Poller() as poller:
+            poller.add(device, interval=0.01)
+            results = loop.run_until_complete(_collect(poller))
+    finally:
+        loop.close()
+
+    assert [result.value["count"] for result in results] == [1, 2, 3]
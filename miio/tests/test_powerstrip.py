@@ -236,3 +236,8 @@ class TestPowerStripV2(TestCase):
         """The method is open-loop. The new state cannot be retrieved."""
         self.device.set_realtime_power(True)
         self.device.set_realtime_power(False)
+
+
+def test_payload_quirks():
+    device = PowerStrip("127.0.0.1", 32 * "0", model=MODEL_POWER_STRIP_V2)
+    assert device._protocol.quirks == ["powerstrip_otu_stat"]
@@ -1,12 +1,35 @@
+import asyncio
 import binascii
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 
+import construct
 import pytest
 
-from miio.exceptions import DeviceError, PayloadDecodeException, RecoverableError
-
-from .. import Utils
-from ..miioprotocol import MiIOProtocol
-from ..protocol import Message
+from miio.exceptions import (
+    DeviceError,
+    DeviceException,
+    DeviceUnavailableException,
+    PayloadDecodeException,
+    RecoverableError,
+)
+
+from .. import Device, Utils, miioprotocol, protocol
+from ..miioprotocol import (
+    AsyncMiIOProtocol,
+    CircuitBreaker,
+    CircuitState,
+    HandshakeCache,
+    MiIOProtocol,
+    RetryPolicy,
+    RttEstimator,
+    SharedEndpoint,
+)
+from ..protocol import FastMessage, Message
+from ..simulator import Impairments
+from .dummies import LoopbackDevice
 
 METHOD = "method"
 PARAMS = "params"
@@ -100,6 +123,21 @@ def test_encrypt(token):
     assert payload == decrypted
 
 
+def test_cipher_cache(token):
+    Utils.cipher.cache_clear()
+    payload = b"hello world"
+
+    Utils.decrypt(Utils.encrypt(payload, token), token)
+    info = Utils.cipher_cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 1
+    assert info["evictions"] == 0
+
+    other_token = bytes.fromhex(32 * "1")
+    assert Utils.encrypt(payload, token) != Utils.encrypt(payload, other_token)
+    assert Utils.cipher_cache_info()["size"] == 2
+
+
 def test_invalid_token():
     payload = b"hello world"
     wrong_type = 1234
@@ -151,6 +189,108 @@ def test_decode_json_quirk_cloud(token):
     assert parsed_msg.data.value["id"] == 123456
 
 
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"id": 1, "method": "get_prop", "params": []},
+        {"id": 9999, "method": "set_power", "params": ["on"]},
+        {"id": 2, "result": ["value%s" % i for i in range(100)]},
+    ],
+)
+def test_fast_message_build(token, payload):
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": b"\x01\x02\x03\x04",
+        "ts": datetime.datetime(2020, 1, 1),
+    }
+    msg = {"data": {"value": payload}, "header": {"value": header}, "checksum": 0}
+
+    built = FastMessage.build(msg, token=token)
+    assert built == Message.build(msg, token=token)
+
+    expected = Message.parse(built, token=token)
+    parsed = FastMessage.parse(built, token=token)
+    assert parsed.data.value == expected.data.value == payload
+    assert parsed.header.value == expected.header.value
+    assert parsed.header.data == expected.header.data
+    assert parsed.checksum == expected.checksum
+
+
+@pytest.mark.parametrize(
+    "data", [b'{"id": 123456}', b'{"id": 123456,,"otu_stat":0}', b'{"id": 1}\x00k']
+)
+def test_fast_message_parse(token, data):
+    serialized_msg = build_msg(data, token)
+    parsed = FastMessage.parse(serialized_msg, token=token)
+    assert parsed == Message.parse(serialized_msg, token=token)
+
+
+def test_fast_message_parse_hello():
+    hello = bytes.fromhex(
+        "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
+    )
+    assert FastMessage.parse(hello) == Message.parse(hello)
+
+
+def test_fast_message_invalid(token):
+    serialized_msg = build_msg(b'{"id": 123456}', token)
+    with pytest.raises(construct.ChecksumError):
+        FastMessage.parse(serialized_msg, token=bytes.fromhex(32 * "1"))
+
+    with pytest.raises(construct.ConstError):
+        FastMessage.parse(b"\x00" * 32)
+
+
+def test_decode_json_payload_parsed_once(token, mocker):
+    loads = mocker.spy(protocol.JSON_BACKEND, "loads")
+    for data in [b'{"id": 123456}', b'{"id": 123456,,"otu_stat":0}']:
+        Message.parse(build_msg(data, token), token=token)
+
+    assert loads.call_count == 2
+
+
+def test_decode_json_model_quirks(token):
+    serialized_msg = build_msg(b'{"id": 123456,,"otu_stat":0}', token)
+    quirks = Utils.quirks_for_model("qmi.powerstrip.v1")
+    parsed_msg = Message.parse(serialized_msg, token=token, quirks=quirks)
+    assert parsed_msg.data.value["otu_stat"] == 0
+
+    with pytest.raises(PayloadDecodeException):
+        Message.parse(serialized_msg, token=token, quirks=[])
+
+
+def test_quirks_default(token):
+    assert Utils.quirks_for_model("qmi.powerstrip.v1") == ["powerstrip_otu_stat"]
+    assert Utils.quirks_for_model("unknown.model") is None
+    assert Utils.quirks_for_model(None) is None
+
+    proto = MiIOProtocol(token=token.hex())
+    assert proto.quirks is None
+    m = proto._parse(build_msg(b'{"id": 123456,,"otu_stat":0}', token))
+    assert m.data.value["otu_stat"] == 0
+
+
+@pytest.mark.parametrize(
+    "backend", [protocol.StdlibJSONBackend, protocol.OrjsonBackend]
+)
+def test_json_backends(token, backend, monkeypatch):
+    if backend is protocol.OrjsonBackend:
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(protocol, "JSON_BACKEND", backend)
+
+    payload = {"id": 1, "method": "set_prop", "params": {"name": "\u00e4", 1: 1.5}}
+    encoded = protocol.EncryptionAdapter.encode(payload, token)
+    assert protocol.EncryptionAdapter.decode(encoded, token) == {
+        "id": 1,
+        "method": "set_prop",
+        "params": {"name": "\u00e4", "1": 1.5},
+    }
+
+    with pytest.raises(PayloadDecodeException):
+        protocol.EncryptionAdapter.decode(Utils.encrypt(b"{invalid", token), token)
+
+
 def test_decode_json_raises_for_invalid_json(token):
     ctx = {"token": token}
 
@@ -158,3 +298,467 @@ def test_decode_json_raises_for_invalid_json(token):
     serialized_msg = build_msg(b'{"id": 123456,,"otu_stat":0', token)
     with pytest.raises(PayloadDecodeException):
         Message.parse(serialized_msg, **ctx)
+
+
+@pytest.fixture
+def loopback_device(token):
+    with LoopbackDevice(token) as dev:
+        yield dev
+
+
+@pytest.fixture
+def loopback_proto(loopback_device, token) -> Iterator[MiIOProtocol]:
+    proto = MiIOProtocol("127.0.0.1", token.hex())
+    proto.port = loopback_device.port
+    proto._timeout = 0.5
+    yield proto
+    proto.close()
+
+
+def test_fast_message_codec(loopback_proto, loopback_device):
+    loopback_proto.codec = FastMessage
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_device.received[0]["method"] == "dummy"
+
+
+def test_socket_is_reused(loopback_proto, loopback_device):
+    assert loopback_proto.send("dummy") == ["ok"]
+    sock = loopback_proto._socket
+    assert sock is not None
+
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_proto._socket is sock
+    assert loopback_device.hellos == 1
+    assert len(loopback_device.received) == 2
+
+
+def test_socket_shared_between_threads(loopback_proto, loopback_device):
+    loopback_device.handler = lambda method, params: params
+    loopback_device.impairments = Impairments(latency=0.01)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(loopback_proto.send, "echo", [i]) for i in range(20)]
+        results = [future.result() for future in futures]
+
+    assert results == [[i] for i in range(20)]
+    assert loopback_device.hellos == 1
+    assert loopback_proto.stats["retries"] == 0
+    assert len({r["id"] for r in loopback_device.received}) == 20
+
+
+def test_close_socket(loopback_proto):
+    loopback_proto.send("dummy")
+    loopback_proto.close()
+    assert loopback_proto._socket is None
+
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_proto._socket is not None
+
+
+def test_socket_rebuilt_after_timeout(loopback_proto, loopback_device):
+    loopback_device.handler = lambda method, params: None
+    with pytest.raises(DeviceException):
+        loopback_proto.send("dummy", retry_count=0)
+    assert loopback_proto._socket is None
+
+    loopback_device.handler = lambda method, params: ["ok"]
+    assert loopback_proto.send("dummy") == ["ok"]
+
+
+def test_protocol_stats(loopback_proto, loopback_device):
+    responses = iter([None, ["ok"]])
+    loopback_device.handler = lambda method, params: next(responses)
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_proto.stats == {
+        "requests": 2,
+        "retries": 1,
+        "timeouts": 1,
+        "handshakes": 1,
+    }
+
+
+def test_late_response_is_ignored(loopback_proto, loopback_device, token):
+    loopback_device.handler = lambda method, params: [method]
+    loopback_proto.send_handshake()
+
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": loopback_proto._device_id,
+        "ts": loopback_proto._device_ts,
+    }
+    msg = {
+        "data": {"value": {"id": 9000, "method": "late", "params": []}},
+        "header": {"value": header},
+        "checksum": 0,
+    }
+    loopback_proto._get_socket().send(Message.build(msg, token=token))
+
+    assert loopback_proto.send("dummy") == ["dummy"]
+
+
+def test_handshake_cache_skips_hello(loopback_proto, loopback_device, token):
+    assert loopback_proto.send("dummy") == ["ok"]
+
+    other = MiIOProtocol("127.0.0.1", token.hex())
+    other.port = loopback_device.port
+    other._timeout = 0.5
+    try:
+        assert other.send("dummy") == ["ok"]
+    finally:
+        other.close()
+
+    assert loopback_device.hellos == 1
+    assert other._device_id == loopback_device.device_id.to_bytes(4, "big")
+
+
+def test_handshake_cache_extrapolates_clock(loopback_proto, monkeypatch):
+    loopback_proto.send_handshake()
+    device_ts = loopback_proto._device_ts
+
+    monotonic = miioprotocol.time.monotonic() + 60
+    monkeypatch.setattr(miioprotocol.time, "monotonic", lambda: monotonic)
+    extrapolated = loopback_proto._device_clock() - device_ts
+    assert 59 <= extrapolated.total_seconds() <= 61
+
+
+def test_handshake_cache_persisted(loopback_device, token, tmp_path):
+    path = str(tmp_path / "handshakes.json")
+    for _ in range(2):
+        proto = MiIOProtocol(
+            "127.0.0.1", token.hex(), handshake_cache=HandshakeCache(path)
+        )
+        proto.port = loopback_device.port
+        proto._timeout = 0.5
+        try:
+            assert proto.send("dummy") == ["ok"]
+        finally:
+            proto.close()
+
+    assert loopback_device.hellos == 1
+    offset = proto._device_clock() - datetime.datetime.utcnow()
+    assert abs(offset.total_seconds()) < 2
+
+
+def test_handshake_cache_invalid_file(tmp_path):
+    path = tmp_path / "handshakes.json"
+    path.write_text("garbage")
+    assert HandshakeCache(str(path)).get("127.0.0.1:54321") is None
+
+
+def test_handshake_invalidated_after_repeated_failure(
+    loopback_proto, loopback_device, handshake_cache
+):
+    responses = iter([["ok"], None, None, ["ok"]])
+    loopback_device.handler = lambda method, params: next(responses)
+
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_device.hellos == 2
+    assert handshake_cache.get(loopback_proto._handshake_key) is not None
+
+
+def test_rtt_estimator():
+    rtt = RttEstimator()
+    assert rtt.timeout(1.0) == 1.0
+
+    rtt.update(0.1)
+    assert rtt.srtt == 0.1
+    assert rtt.timeout(1.0) == pytest.approx(0.3)
+
+    for _ in range(50):
+        rtt.update(0.01)
+    assert rtt.srtt == pytest.approx(0.01, abs=1e-3)
+    assert rtt.timeout(1.0) < 0.05
+
+
+def test_retry_policy():
+    policy = RetryPolicy(initial_timeout=1.0, min_timeout=0.5, max_backoff=1.0)
+    rtt = RttEstimator()
+    assert [policy.timeout(rtt, attempt, 5) for attempt in range(4)] == [1, 2, 4, 5]
+
+    rtt.update(0.01)
+    assert policy.timeout(rtt, 0, 5) == 0.5
+    assert all(0 <= policy.delay(attempt) <= 1.0 for attempt in range(1, 20))
+
+
+def test_retry_policy_defaults():
+    policy = RetryPolicy()
+    assert policy.timeout(RttEstimator(), 0, 5) == 5
+    assert policy.total_time(5, 3) == 5 * 4 + 3 * policy.max_backoff
+    assert RetryPolicy(deadline=1).total_time(5, 3) == 1
+
+
+def test_send_updates_rtt(loopback_proto):
+    loopback_proto.send("dummy")
+    assert loopback_proto.rtt.srtt is not None
+    assert loopback_proto._attempt_timeout(0, float("inf")) == pytest.approx(
+        loopback_proto.retry_policy.min_timeout
+    )
+
+
+def test_send_respects_deadline(loopback_proto, loopback_device):
+    loopback_device.handler = lambda method, params: None
+    loopback_proto.retry_policy = RetryPolicy(deadline=0.5, min_timeout=0.1)
+    loopback_proto.send_handshake()
+    loopback_proto.rtt.update(0.01)
+
+    start = time.monotonic()
+    with pytest.raises(DeviceException):
+        loopback_proto.send("dummy", retry_count=100)
+
+    assert time.monotonic() - start < 1
+    assert 1 < len(loopback_device.received) < 10
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state is CircuitState.Closed
+    breaker.record_failure()
+    assert breaker.state is CircuitState.Open
+    assert not breaker.try_probe()
+
+    breaker.reset_timeout = 0
+    assert breaker.state is CircuitState.HalfOpen
+    assert breaker.try_probe()
+    assert not breaker.try_probe()
+    breaker.record_failure()
+    assert breaker._state is CircuitState.Open
+
+    assert breaker.state is CircuitState.HalfOpen
+    breaker.record_success()
+    assert breaker.state is CircuitState.Closed
+    assert breaker.as_dict() == {
+        "state": "closed",
+        "failures": 0,
+        "transitions": {
+            "closed->open": 1,
+            "open->half_open": 2,
+            "half_open->open": 1,
+            "half_open->closed": 1,
+        },
+    }
+
+
+def test_circuit_breaker_fails_fast(loopback_proto, loopback_device):
+    loopback_proto.circuit_breaker = CircuitBreaker(failure_threshold=2)
+    loopback_device.handler = lambda method, params: None
+    for _ in range(2):
+        with pytest.raises(DeviceException):
+            loopback_proto.send("dummy", retry_count=0)
+    assert loopback_proto.circuit_breaker.state is CircuitState.Open
+
+    requests = len(loopback_device.received)
+    with pytest.raises(DeviceUnavailableException):
+        loopback_proto.send("dummy")
+    assert len(loopback_device.received) == requests
+
+    hellos = loopback_device.hellos
+    loopback_proto.circuit_breaker.reset_timeout = 0
+    loopback_device.handler = lambda method, params: ["ok"]
+    assert loopback_proto.send("dummy") == ["ok"]
+    assert loopback_device.hellos == hellos + 1
+    assert loopback_proto.circuit_breaker.state is CircuitState.Closed
+
+
+def test_circuit_breaker_failed_probe(loopback_proto, loopback_device):
+    loopback_proto.circuit_breaker = CircuitBreaker(failure_threshold=1)
+    loopback_proto.circuit_breaker.record_failure()
+    loopback_proto.circuit_breaker.reset_timeout = 0
+    loopback_device.close()
+
+    with pytest.raises(DeviceUnavailableException):
+        loopback_proto.send("dummy")
+    assert loopback_proto.circuit_breaker._state is CircuitState.Open
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def async_proto(loopback_device, token) -> AsyncMiIOProtocol:
+    proto = AsyncMiIOProtocol("127.0.0.1", token.hex())
+    proto.port = loopback_device.port
+    proto._timeout = 0.5
+    return proto
+
+
+def test_async_send(async_proto, loopback_device):
+    async def _send():
+        try:
+            return await async_proto.send("dummy", ["param"])
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == ["ok"]
+    assert loopback_device.hellos == 1
+    assert loopback_device.received[0]["method"] == "dummy"
+    assert loopback_device.received[0]["params"] == ["param"]
+
+
+def test_async_concurrent_sends(async_proto, loopback_device):
+    loopback_device.handler = lambda method, params: [method]
+
+    async def _send():
+        try:
+            await async_proto.send_handshake()
+            commands = ["cmd%s" % i for i in range(10)]
+            return await asyncio.gather(*[async_proto.send(c) for c in commands])
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == [["cmd%s" % i] for i in range(10)]
+
+
+def test_async_concurrent_handshakes(async_proto, loopback_device):
+    loopback_device.handler = lambda method, params: [method]
+    loopback_device.impairments = Impairments(latency=0.02)
+
+    async def _send():
+        try:
+            commands = ["cmd%s" % i for i in range(10)]
+            return await asyncio.gather(*[async_proto.send(c) for c in commands])
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == [["cmd%s" % i] for i in range(10)]
+    assert loopback_device.hellos == 1
+    assert async_proto.stats["handshakes"] == 1
+    assert async_proto.stats["timeouts"] == 0
+
+
+def test_async_timeout_keeps_other_requests(async_proto, loopback_device):
+    loopback_device.handler = lambda method, params: None if method == "lost" else []
+    loopback_device.impairments = Impairments(latency=0.15)
+    async_proto._timeout = 0.2
+    async_proto.retry_policy.min_timeout = 0.1
+
+    async def _send():
+        try:
+            await async_proto.send_handshake()
+            lost = asyncio.ensure_future(async_proto.send("lost", retry_count=0))
+            await asyncio.sleep(0.1)
+            # still awaiting its response when the first request times out
+            slow = await async_proto.send("slow", retry_count=0)
+            with pytest.raises(DeviceException):
+                await lost
+            return slow
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == []
+    assert async_proto.stats["timeouts"] == 1
+
+
+def test_async_send_retries_on_timeout(async_proto, loopback_device):
+    responses = iter([None, ["ok"]])
+    loopback_device.handler = lambda method, params: next(responses)
+
+    async def _send():
+        try:
+            return await async_proto.send("dummy")
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == ["ok"]
+    assert loopback_device.hellos == 1
+    assert loopback_device.received[1]["id"] > loopback_device.received[0]["id"] + 100
+    assert async_proto.stats["retries"] == async_proto.stats["timeouts"] == 1
+
+
+def test_async_send_without_response(async_proto, loopback_device):
+    loopback_device.handler = lambda method, params: None
+
+    with pytest.raises(DeviceException):
+        run(async_proto.send("dummy", retry_count=0))
+
+
+def test_send_many(loopback_proto, loopback_device):
+    loopback_device.handler = lambda method, params: [p.upper() for p in params]
+    params = [[c] for c in "abcdefg"]
+
+    assert loopback_proto.send_many("get_prop", params, max_in_flight=3) == [
+        [c.upper()] for c in "abcdefg"
+    ]
+    assert loopback_device.hellos == 1
+    assert len(loopback_device.received) == 7
+
+
+def test_send_many_retries_lost_responses(loopback_proto, loopback_device):
+    dropped = set()
+
+    def _handler(method, params):
+        if params == ["c"] and "c" not in dropped:
+            dropped.add("c")
+            return None
+        return params
+
+    loopback_device.handler = _handler
+    params = [[c] for c in "abcde"]
+    assert loopback_proto.send_many("get_prop", params, max_in_flight=2) == params
+    assert len(loopback_device.received) == 6
+
+
+def test_get_properties_pipelined(loopback_device, token):
+    loopback_device.handler = lambda method, params: [p.upper() for p in params]
+    device = Device("127.0.0.1", token.hex())
+    device._protocol.port = loopback_device.port
+    with device:
+        properties = ["a", "b", "c", "d", "e"]
+        values = device.get_properties(properties, max_properties=2, max_in_flight=2)
+    assert values == ["A", "B", "C", "D", "E"]
+    assert [r["params"] for r in loopback_device.received] == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+
+
+def test_async_send_many(async_proto, loopback_device):
+    loopback_device.handler = lambda method, params: params
+    params = [[i] for i in range(10)]
+
+    async def _send():
+        try:
+            return await async_proto.send_many("get_prop", params, max_in_flight=4)
+        finally:
+            async_proto.close()
+
+    assert run(_send()) == params
+    assert loopback_device.hellos == 1
+
+
+def test_shared_endpoint(token):
+    with SharedEndpoint(("127.0.0.1", 0)) as endpoint:
+        with LoopbackDevice(token) as first, LoopbackDevice(token) as second:
+            first.handler = lambda method, params: ["first"]
+            second.handler = lambda method, params: ["second"]
+
+            devices = []
+            for dev in [first, second]:
+                device = Device("127.0.0.1", token.hex())
+                device._protocol.port = dev.port
+                endpoint.register(device)
+                device.send_handshake()
+                devices.append(device)
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [
+                    executor.submit(device.send, "dummy") for device in devices * 5
+                ]
+                results = [future.result() for future in futures]
+
+            assert results == [["first"], ["second"]] * 5
+            assert all(device._protocol._socket is None for device in devices)
+            assert first.hellos == 1
+
+            first.handler = lambda method, params: None
+            devices[0]._protocol._timeout = 0.1
+            with pytest.raises(DeviceException):
+                devices[0].send("dummy", retry_count=0)
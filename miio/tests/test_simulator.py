@@ -0,0 +1,110 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from miio import AirPurifier
+from miio.airpurifier import OperationMode
+from miio.exceptions import DeviceError, DeviceException
+from miio.protocol import Message
+from miio.simulator import Impairments, SimulatedDevice, Simulator
+
+from .test_airpurifier import DummyAirPurifier
+
+TOKEN = "00112233445566778899aabbccddeeff"
+
+
+def test_simulated_purifier(simulator, connect):
+    state = DummyAirPurifier().state
+    address = simulator.add(SimulatedDevice(TOKEN, state), port=0)
+    purifier = connect(address, AirPurifier)
+
+    status = purifier.status()
+    assert status.aqi == state["aqi"]
+    assert status.mode == OperationMode.Auto
+
+    purifier.set_mode(OperationMode.Silent)
+    assert purifier.status().mode == OperationMode.Silent
+    assert simulator.devices[address].hellos == 1
+
+
+def test_handlers_and_errors(simulator, connect):
+    simulated = SimulatedDevice(TOKEN, handlers={"echo": lambda params: params})
+    device = connect(simulator.add(simulated, port=0))
+
+    assert device.send("echo", [1, 2]) == [1, 2]
+    assert device.info().model == simulated.model
+    with pytest.raises(DeviceError):
+        device.send("unknown")
+
+
+def test_invalid_checksum(simulator, connect):
+    simulated = SimulatedDevice(TOKEN)
+    device = connect(simulator.add(simulated, port=0), token=32 * "0")
+    with pytest.raises(DeviceException):
+        device.send("get_prop", ["power"], retry_count=0)
+    assert simulated.checksum_errors == 1
+
+
+def test_packet_loss(simulator, connect):
+    simulated = SimulatedDevice(TOKEN, impairments=Impairments(loss=1.0))
+    device = connect(simulator.add(simulated, port=0))
+    with pytest.raises(DeviceException):
+        device.send("get_prop", ["power"], retry_count=0)
+    assert simulated.dropped == 1
+
+
+def test_latency_and_reordering(simulator, connect):
+    impairments = Impairments(latency=0.01, jitter=0.01, reorder=0.5)
+    simulated = SimulatedDevice(TOKEN, {"a": 1, "b": 2}, impairments=impairments)
+    device = connect(simulator.add(simulated, port=0))
+    params = [["a"], ["b"]] * 5
+    assert device._protocol.send_many("get_prop", params) == [[1], [2]] * 5
+
+
+def test_rate_limit():
+    simulated = SimulatedDevice(TOKEN)
+    header = {
+        "length": 0,
+        "unknown": 0,
+        "device_id": b"\0" * 4,
+        "ts": datetime.utcnow(),
+    }
+    request = {"id": 1, "method": "get_prop", "params": ["power"]}
+    msg = {"data": {"value": request}, "header": {"value": header}, "checksum": 0}
+    data = Message.build(msg, token=simulated.token)
+
+    responses = [simulated.respond(data, rate_limit=2) for _ in range(5)]
+    assert sum(response is not None for response in responses) == 2
+    assert simulated.dropped == 3
+
+
+def test_many_devices(simulator, connect):
+    devices = []
+    for i in range(20):
+        address = simulator.add(SimulatedDevice(TOKEN, {"index": i}), port=0)
+        devices.append(connect(address))
+
+    assert [d.send("get_prop", ["index"]) for d in devices] == [[i] for i in range(20)]
+    assert len({d._protocol._device_id for d in devices}) == 20
+
+
+def test_loopback_alias(simulator, connect):
+    try:
+        address = simulator.add(SimulatedDevice(TOKEN), host="127.0.0.2", port=0)
+    except OSError:
+        pytest.skip("127.0.0.2 is not available")
+    assert connect(address).send("set_power", ["on"]) == ["ok"]
+
+
+def test_close_releases_sockets():
+    try:
+        fds = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pytest.skip("/proc/self/fd is not available")
+
+    for _ in range(10):
+        with Simulator() as simulator:
+            simulator.add(SimulatedDevice(TOKEN), port=0)
+
+    assert len(os.listdir("/proc/self/fd")) == fds
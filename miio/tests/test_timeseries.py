@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+from miio import timeseries
+from miio.timeseries import TimeSeries
+
+from .test_airpurifier import DummyAirPurifier
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(timeseries, "numpy", None)
+    else:
+        pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def history(backend) -> TimeSeries:
+    history = TimeSeries(["aqi", "led"], capacity=5)
+    for t in range(8):
+        history.append({"aqi": t * 10, "led": t % 2 == 0}, timestamp=t)
+    return history
+
+
+def test_ring_buffer_keeps_last_samples(history):
+    assert len(history) == 5
+    timestamps, values = history.window("aqi")
+    assert list(timestamps) == [3, 4, 5, 6, 7]
+    assert list(values) == [30, 40, 50, 60, 70]
+    assert list(history.window("led")[1]) == [0, 1, 0, 1, 0]
+
+
+def test_window_queries(history):
+    assert list(history.window("aqi", start=4, end=6)[1]) == [40, 50, 60]
+    assert history.min("aqi", start=5) == 50
+    assert history.max("aqi", end=4) == 40
+    assert history.mean("aqi") == 50
+    assert history.aggregate("aqi", "median") == 50
+    assert history.percentile("aqi", 25) == 40
+    assert history.percentile("aqi", 90) == pytest.approx(66)
+    assert math.isnan(history.mean("aqi", start=10))
+
+
+def test_missing_values_are_skipped(backend):
+    history = TimeSeries(["aqi"], capacity=3)
+    history.append({"aqi": 10}, timestamp=1)
+    history.append({"aqi": None}, timestamp=2)
+    history.append({}, timestamp=3)
+    assert math.isnan(history.window("aqi")[1][1])
+    assert history.mean("aqi") == 10
+
+
+def test_downsample(history):
+    assert history.downsample("aqi", interval=2) == [
+        (2.0, 30.0),
+        (4.0, 45.0),
+        (6.0, 65.0),
+    ]
+    assert history.downsample("aqi", interval=4, how="max") == [
+        (0.0, 30.0),
+        (4.0, 70.0),
+    ]
+    assert history.downsample("aqi", interval=2, start=100) == []
+
+
+def test_invalid_queries(history):
+    with pytest.raises(KeyError):
+        history.window("humidity")
+    with pytest.raises(ValueError):
+        history.aggregate("aqi", "sum")
+    with pytest.raises(ValueError):
+        TimeSeries(["aqi"], capacity=0)
+
+
+def test_status_container():
+    purifier = DummyAirPurifier()
+    history = TimeSeries(["aqi", "temp_dec", "mode"], capacity=10)
+    history.append(purifier.status(), timestamp=1)
+    assert history.max("aqi") == 10
+    assert history.max("temp_dec") == 186
+    assert math.isnan(history.max("mode"))
+
+    history.clear()
+    assert len(history) == 0
@@ -0,0 +1,216 @@
+"""Compact history of numeric status fields.
+
+:class:`TimeSeries` keeps the last `capacity` values of the given fields of
+a device in a ring buffer of `array` columns, taking the values from the
+`data` dict wrapped by the status containers:
+
+.. code-block::
+    history = TimeSeries(["aqi", "humidity", "temp_dec"], capacity=2160)
+    history.append(purifier.status())
+    ...
+    history.mean("aqi", start=time.time() - 3600)
+    history.downsample("aqi", interval=600, how="max")
+
+Booleans are stored as 0 and 1, missing and non-numeric values as NaN, which
+are skipped by the queries. If numpy is installed, the queries are computed
+on views of the columns instead of in Python.
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, List, Sequence, Tuple  # noqa: F401
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore
+
+_LOGGER = logging.getLogger(__name__)
+
+NAN = float("nan")
+
+AGGREGATES = ("min", "max", "mean", "median")
+
+
+def _to_float(value: Any) -> float:
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    return NAN
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile with linear interpolation, like numpy."""
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def _reduce(values: Sequence[float], how: str, q: float = 50.0) -> float:
+    """Aggregate the values, ignoring NaNs.
+
+    :param how: One of :data:`AGGREGATES`, or `percentile`
+    """
+    if how == "median":
+        how, q = "percentile", 50.0
+    if how not in AGGREGATES and how != "percentile":
+        raise ValueError("Unknown aggregate: %s" % how)
+
+    if numpy is not None:
+        values = numpy.asarray(values, dtype=float)
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            return NAN
+        if how == "percentile":
+            return float(numpy.percentile(values, q))
+        return float(getattr(numpy, how)(values))
+
+    values = [v for v in values if not math.isnan(v)]
+    if not values:
+        return NAN
+    if how == "percentile":
+        return _percentile(values, q)
+    if how == "mean":
+        return math.fsum(values) / len(values)
+    return min(values) if how == "min" else max(values)
+
+
+class TimeSeries:
+    """Ring buffer of numeric status fields of a single device.
+
+    :param fields: Keys of the status data to store
+    :param capacity: Number of samples to keep
+    """
+
+    def __init__(self, fields: Iterable[str], capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be positive")
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._timestamps = array("d", [0.0]) * capacity
+        self._columns = {field: array("d", [NAN]) * capacity for field in self.fields}
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return "<TimeSeries %s/%s samples of %s>" % (
+            self._size,
+            self.capacity,
+            ", ".join(self.fields),
+        )
+
+    def append(self, status: Any, timestamp: float = None) -> None:
+        """Store the fields of a status container, or a dict.
+
+        The samples are expected to be appended in chronological order.
+
+        :param status: Status container with a `data` dict, or a dict
+        :param timestamp: Time of the status, defaults to the current time
+        """
+        data = getattr(status, "data", status)
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            index = self._next
+            self._timestamps[index] = timestamp
+            for field, column in self._columns.items():
+                column[index] = _to_float(data.get(field))
+            self._next = (index + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _ordered(self, column: array) -> array:
+        """Return the stored values of the column in chronological order."""
+        if self._size < self.capacity:
+            return column[: self._size]
+        return column[self._next :] + column[: self._next]
+
+    def window(
+        self, field: str, start: float = None, end: float = None
+    ) -> Tuple[array, array]:
+        """Return the timestamps and values of a field within the time range.
+
+        :param field: Name of the field
+        :param start: Start of the range (inclusive), defaults to the oldest sample
+        :param end: End of the range (inclusive), defaults to the newest sample
+        """
+        if field not in self._columns:
+            raise KeyError("Field %s is not stored" % field)
+
+        with self._lock:
+            timestamps = self._ordered(self._timestamps)
+            values = self._ordered(self._columns[field])
+
+        lower = 0 if start is None else bisect_left(timestamps, start)
+        upper = len(timestamps) if end is None else bisect_right(timestamps, end)
+        return timestamps[lower:upper], values[lower:upper]
+
+    def aggregate(
+        self, field: str, how: str = "mean", start: float = None, end: float = None
+    ) -> float:
+        """Aggregate a field within the time range, NaN if there are no values.
+
+        :param how: One of `min`, `max`, `mean` or `median`
+        """
+        return _reduce(self.window(field, start, end)[1], how)
+
+    def min(self, field: str, start: float = None, end: float = None) -> float:
+        return self.aggregate(field, "min", start, end)
+
+    def max(self, field: str, start: float = None, end: float = None) -> float:
+        return self.aggregate(field, "max", start, end)
+
+    def mean(self, field: str, start: float = None, end: float = None) -> float:
+        return self.aggregate(field, "mean", start, end)
+
+    def percentile(
+        self, field: str, q: float, start: float = None, end: float = None
+    ) -> float:
+        """Return the q-th percentile (0-100) of a field within the time range."""
+        return _reduce(self.window(field, start, end)[1], "percentile", q)
+
+    def downsample(
+        self,
+        field: str,
+        interval: float,
+        how: str = "mean",
+        start: float = None,
+        end: float = None,
+    ) -> List[Tuple[float, float]]:
+        """Aggregate a field in buckets of `interval` seconds.
+
+        The buckets are aligned to multiples of the interval, buckets without
+        samples are omitted.
+
+        :return: List of bucket start times and aggregated values
+        """
+        timestamps, values = self.window(field, start, end)
+        if not timestamps:
+            return []
+
+        if numpy is not None:
+            buckets = numpy.floor(numpy.asarray(timestamps) / interval)
+            bounds = (numpy.flatnonzero(numpy.diff(buckets)) + 1).tolist()
+        else:
+            buckets = [math.floor(t / interval) for t in timestamps]
+            bounds = [i for i in range(1, len(buckets)) if buckets[i] != buckets[i - 1]]
+
+        result = []
+        for lower, upper in zip([0] + bounds, bounds + [len(timestamps)]):
+            bucket = float(buckets[lower]) * interval
+            result.append((bucket, _reduce(values[lower:upper], how)))
+        return result
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        with self._lock:
+            self._next = 0
+            self._size = 0
@@ -4,6 +4,7 @@ from typing import Any, Dict, List
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 
@@ -116,6 +117,7 @@ class Toiletlid(Device):
             "Filter remaining time: {result.filter_remaining_time}\n",
         )
     )
+    @cached()
     def status(self) -> ToiletlidStatus:
         """Retrieve properties."""
         properties = AVAILABLE_PROPERTIES[self.model]
@@ -1,8 +1,13 @@
 import functools
 import inspect
+import json
+import logging
+import os
 import warnings
 from datetime import datetime, timedelta
-from typing import Tuple
+from typing import Any, Tuple
+
+_LOGGER = logging.getLogger(__name__)
 
 
 def deprecated(reason):
@@ -111,3 +116,23 @@ def int_to_brightness(x: int) -> int:
 
 def brightness_and_color_to_int(brightness: int, color: Tuple[int, int, int]) -> int:
     return int(brightness << 24 | color[0] << 16 | color[1] << 8 | color[2])
+
+
+def write_json(path: str, data: Any, **kwargs) -> bool:
+    """Write the data as JSON to the given file, replacing it atomically.
+
+    Missing directories are created, and failures are logged as warnings.
+    The keyword arguments are passed to :func:`json.dump`.
+
+    :return: True if the file was written"""
+    tmp = "%s.%s.tmp" % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(data, f, **kwargs)
+        os.replace(tmp, path)
+    except OSError as ex:
+        _LOGGER.warning("Unable to write %s: %s", path, ex)
+        return False
+
+    return True
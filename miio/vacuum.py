@@ -12,6 +12,7 @@ import click
 import pytz
 from appdirs import user_cache_dir
 
+from .cache import cached
 from .click_common import (
     DeviceGroup,
     EnumType,
@@ -216,6 +217,7 @@ class Vacuum(Device):
         self.send("app_rc_move", [params])
 
     @command()
+    @cached()
     def status(self) -> VacuumStatus:
         """Return status of the vacuum."""
         return VacuumStatus(self.send("get_status")[0])
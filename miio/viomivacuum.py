@@ -7,6 +7,7 @@ from typing import Dict, List, Optional
 
 import click
 
+from .cache import cached
 from .click_common import EnumType, command, format_output
 from .device import Device
 from .utils import pretty_seconds
@@ -300,6 +301,7 @@ class ViomiVacuum(Device):
             "Mop mode: {result.mop_mode}\n",
         )
     )
+    @cached()
     def status(self) -> ViomiVacuumStatus:
         """Retrieve properties."""
         properties = [
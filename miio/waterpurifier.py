@@ -1,6 +1,7 @@
 import logging
 from typing import Any, Dict
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 
@@ -159,6 +160,7 @@ class WaterPurifier(Device):
             "Valve: {result.valve}\n",
         )
     )
+    @cached()
     def status(self) -> WaterPurifierStatus:
         """Retrieve properties."""
 
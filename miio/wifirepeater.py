@@ -2,6 +2,7 @@ import logging
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -93,6 +94,7 @@ class WifiRepeater(Device):
             "Associated stations: {result.associated_stations}\n",
         )
     )
+    @cached()
     def status(self) -> WifiRepeaterStatus:
         """Return the associated stations."""
         return WifiRepeaterStatus(self.send("miIO.get_repeater_sta_info"))
@@ -4,6 +4,7 @@ import warnings
 
 import click
 
+from .cache import cached
 from .click_common import command, format_output
 from .device import Device
 
@@ -147,6 +148,7 @@ class WifiSpeaker(Device):
             "Hardware version: {result.hardware_version}\n",
         )
     )
+    @cached()
     def status(self) -> WifiSpeakerStatus:
         """Return device status."""
         return WifiSpeakerStatus(self.send("get_prop", ["umi"]))
@@ -4,6 +4,7 @@ from typing import Optional, Tuple
 
 import click
 
+from .cache import cached, updates
 from .click_common import command, format_output
 from .device import Device
 from .exceptions import DeviceException
@@ -130,6 +131,7 @@ class Yeelight(Device):
             "\n",
         )
     )
+    @cached()
     def status(self) -> YeelightStatus:
         """Retrieve properties."""
         properties = [
@@ -154,6 +156,7 @@ class Yeelight(Device):
         click.option("--mode", type=int, required=False, default=0),
         default_output=format_output("Powering on"),
     )
+    @updates(power="on")
     def on(self, transition=0, mode=0):
         """Power on."""
         """
@@ -174,6 +177,7 @@ class Yeelight(Device):
         click.option("--transition", type=int, required=False, default=0),
         default_output=format_output("Powering off"),
     )
+    @updates(power="off")
     def off(self, transition=0):
         """Power off."""
         if transition > 0:
@@ -185,6 +189,7 @@ class Yeelight(Device):
         click.option("--transition", type=int, required=False, default=0),
         default_output=format_output("Setting brightness to {level}"),
     )
+    @updates(bright=lambda level, transition=0: str(level))
     def set_brightness(self, level, transition=0):
         """Set brightness."""
         if level < 0 or level > 100:
@@ -198,6 +203,7 @@ class Yeelight(Device):
         click.option("--transition", type=int, required=False, default=0),
         default_output=format_output("Setting color temperature to {level}"),
     )
+    @updates(ct=lambda level, transition=500: str(level), color_mode="2")
     def set_color_temp(self, level, transition=500):
         """Set color temp in kelvin."""
         if level > 6500 or level < 1700:
@@ -212,6 +218,7 @@ class Yeelight(Device):
         click.argument("rgb", default=[255] * 3, type=click.Tuple([int, int, int])),
         default_output=format_output("Setting color to {rgb}"),
     )
+    @updates(rgb=lambda rgb: str(rgb_to_int(rgb)), color_mode="1")
     def set_rgb(self, rgb: Tuple[int, int, int]):
         """Set color in RGB."""
         for color in rgb:
@@ -228,6 +235,7 @@ class Yeelight(Device):
         click.argument("enable", type=bool),
         default_output=format_output("Setting developer mode to {enable}"),
     )
+    @updates(lan_ctrl=lambda enable: str(int(enable)))
     def set_developer_mode(self, enable: bool) -> bool:
         """Enable or disable the developer mode."""
         return self.send("set_ps", ["cfg_lan_ctrl", str(int(enable))])
@@ -236,6 +244,7 @@ class Yeelight(Device):
         click.argument("enable", type=bool),
         default_output=format_output("Setting save state on change {enable}"),
     )
+    @updates(save_state=lambda enable: str(int(enable)))
     def set_save_state_on_change(self, enable: bool) -> bool:
         """Enable or disable saving the state on changes."""
         return self.send("set_ps", ["cfg_save_state", str(int(enable))])
@@ -244,6 +253,7 @@ class Yeelight(Device):
         click.argument("name", type=str),
         default_output=format_output("Setting name to {name}"),
     )
+    @updates(name=lambda name: name)
     def set_name(self, name: str) -> bool:
         """Set an internal name for the bulb."""
         return self.send("set_name", [name])